@@ -12,13 +12,18 @@ class ArchTextureWorkbench (FreeCADGui.Workbench):
         
 
     def Initialize(self):
-        pass
+        import time
+        start = time.time()
+
         # Initialize the module
+        # Commands are registered as lightweight stubs. The modules implementing them are imported on first use
         import archtexture_toolbars
 
         for name,commands in archtexture_toolbars.toolbarManager.Toolbars.items():
             self.appendToolbar(name,[command.commandName for command in commands])
 
+        FreeCAD.Console.PrintLog('Arch Texture workbench initialized in %.1f ms\n' % ((time.time() - start) * 1000,))
+
 #    def Activated(self):
 
 #   def Deactivated(self):
@@ -0,0 +1,192 @@
+import FreeCADGui
+from pivy import coin
+
+from arch_texture_utils.qtutils import QtCore, QtWidgets
+
+def activeView():
+    '''Returns the active 3D view or None when there is no such view'''
+    guiDocument = FreeCADGui.ActiveDocument
+
+    if guiDocument is None:
+        return None
+
+    view = guiDocument.ActiveView
+
+    if not hasattr(view, 'getCameraNode'):
+        return None
+
+    return view
+
+def documentRoot(view):
+    '''The scene graph of the view without the shadow group wrapped around it'''
+    sceneGraph = view.getSceneGraph()
+
+    if hasattr(coin, 'SoShadowGroup') and sceneGraph.isOfType(coin.SoShadowGroup.getClassTypeId()):
+        return sceneGraph.getChild(0)
+
+    return sceneGraph
+
+def documentViews(guiDocument):
+    '''All 3D views of a document. Older FreeCAD versions only give access to the active view.'''
+    if hasattr(guiDocument, 'mdiViewsOfType'):
+        views = guiDocument.mdiViewsOfType('Gui::View3DInventor')
+    else:
+        views = [guiDocument.ActiveView]
+
+    return [view for view in views if hasattr(view, 'getSceneGraph')]
+
+def viewKey(view):
+    '''The python wrappers of a view change between calls, the address of its scene graph does not'''
+    return int(documentRoot(view).this)
+
+def getViewVolume(view):
+    camera = view.getCameraNode()
+    width, height = view.getSize()
+    aspectRatio = width / height if height > 0 else 1.0
+
+    return camera.getViewVolume(aspectRatio)
+
+def getCameraPosition(view):
+    return view.getCameraNode().position.getValue()
+
+def toCoinBox(boundBox):
+    return coin.SbBox3f(boundBox.XMin, boundBox.YMin, boundBox.ZMin, boundBox.XMax, boundBox.YMax, boundBox.ZMax)
+
+def isInViewVolume(viewVolume, boundBox):
+    '''Checks if the FreeCAD BoundBox intersects the view volume. When in doubt the box counts as visible.'''
+    if viewVolume is None or boundBox is None or not boundBox.isValid():
+        return True
+
+    try:
+        return viewVolume.intersect(toCoinBox(boundBox))
+    except (AttributeError, TypeError):
+        return True
+
+def distanceToBoundBox(position, boundBox):
+    '''Distance from the camera position to the closest point of the bounding box. Zero when inside.'''
+    x, y, z = position[0], position[1], position[2]
+
+    dx = max(boundBox.XMin - x, 0, x - boundBox.XMax)
+    dy = max(boundBox.YMin - y, 0, y - boundBox.YMax)
+    dz = max(boundBox.ZMin - z, 0, z - boundBox.ZMax)
+
+    return (dx * dx + dy * dy + dz * dz) ** 0.5
+
+class CameraWatcher():
+    '''
+    Calls the callback after the camera of the active view moved.
+    Camera changes are coalesced, the callback runs when the camera did not change for the given delay.
+    The optional startCallback is called on the first camera change after the camera was still.
+    '''
+    def __init__(self, callback, delay=150, startCallback=None):
+        self.callback = callback
+        self.startCallback = startCallback
+        self.view = None
+        self.camera = None
+
+        self.sensor = coin.SoNodeSensor(self.onCameraChanged, None)
+
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.notify)
+
+    def attach(self, view=None):
+        if view is None:
+            view = activeView()
+
+        if view is None:
+            return False
+
+        self.detach()
+
+        self.view = view
+        self.camera = view.getCameraNode()
+        self.sensor.attach(self.camera)
+
+        return True
+
+    def detach(self):
+        if self.camera is not None:
+            self.sensor.detach()
+
+        self.timer.stop()
+        self.view = None
+        self.camera = None
+
+    def onCameraChanged(self, data, sensor):
+        if self.startCallback is not None and not self.timer.isActive() and self.view is not None:
+            self.startCallback(self.view)
+
+        self.timer.start()
+
+    def notify(self):
+        if self.view is None:
+            return
+
+        # The camera node is replaced when switching between perspective and orthographic view
+        camera = self.view.getCameraNode()
+
+        if camera != self.camera:
+            self.attach(self.view)
+
+        self.callback(self.view)
+
+class DocumentCameraWatcher():
+    '''
+    Watches the cameras of all 3D views of a document, with one CameraWatcher per view.
+    Views opened later are picked up when they get activated.
+    '''
+    def __init__(self, callback, delay=150, startCallback=None):
+        self.callback = callback
+        self.delay = delay
+        self.startCallback = startCallback
+        self.guiDocument = None
+        self.watchers = {}
+        self.mdiArea = None
+
+    def attach(self, guiDocument):
+        self.guiDocument = guiDocument
+
+        self.watchViews()
+        self.updateWatchers()
+
+    def watchViews(self):
+        if self.mdiArea is not None:
+            return
+
+        mainWindow = FreeCADGui.getMainWindow()
+        self.mdiArea = mainWindow.findChild(QtWidgets.QMdiArea) if mainWindow is not None else None
+
+        if self.mdiArea is not None:
+            self.mdiArea.subWindowActivated.connect(self.onViewActivated)
+
+    def onViewActivated(self, subWindow):
+        if self.guiDocument is not None:
+            self.updateWatchers()
+
+    def updateWatchers(self):
+        '''Adds watchers to new views and drops the watchers of closed views'''
+        try:
+            views = dict((viewKey(view), view) for view in documentViews(self.guiDocument))
+        except Exception:
+            # The document was closed in the meantime
+            views = {}
+
+        for key in list(self.watchers.keys()):
+            if key not in views:
+                self.watchers.pop(key).detach()
+
+        for key, view in views.items():
+            if key not in self.watchers:
+                watcher = CameraWatcher(self.callback, self.delay, self.startCallback)
+                watcher.attach(view)
+
+                self.watchers[key] = watcher
+
+    def detach(self):
+        for watcher in self.watchers.values():
+            watcher.detach()
+
+        self.watchers = {}
+        self.guiDocument = None
@@ -0,0 +1,148 @@
+import hashlib
+import math
+import os
+
+import numpy
+
+from arch_texture_utils.qtutils import QtCore, QtGui
+from arch_texture_utils.resource_utils import cachePath
+
+DEFAULT_FACE_SIZE = 1024
+
+# name: (forward, right, up) as seen from inside the cube. North is the positive y axis, up is the positive z axis
+CUBE_FACES = [
+    ('north', (0, 1, 0), (1, 0, 0), (0, 0, 1)),
+    ('east', (1, 0, 0), (0, -1, 0), (0, 0, 1)),
+    ('south', (0, -1, 0), (-1, 0, 0), (0, 0, 1)),
+    ('west', (-1, 0, 0), (0, 1, 0), (0, 0, 1)),
+    ('top', (0, 0, 1), (1, 0, 0), (0, -1, 0)),
+    ('bottom', (0, 0, -1), (1, 0, 0), (0, 1, 0))
+]
+
+def fileHash(imagePath):
+    fileHash = hashlib.sha1()
+
+    with open(imagePath, 'rb') as imageFile:
+        for chunk in iter(lambda: imageFile.read(1024 * 1024), b''):
+            fileHash.update(chunk)
+
+    return fileHash.hexdigest()
+
+def cubeFaceFiles(imageHash, size):
+    '''The cache files of all faces, keyed by the hash of the image content and the face size'''
+    directory = cachePath('cubemaps')
+
+    return dict((name, os.path.join(directory, '%s_%s_%s.png' % (imageHash, size, name))) for name, forward, right, up in CUBE_FACES)
+
+def imageToArray(image):
+    '''Copies the pixels of a QImage into a (height, width, 4) array'''
+    image = image.convertToFormat(QtGui.QImage.Format_ARGB32)
+    width = image.width()
+    height = image.height()
+
+    data = numpy.frombuffer(image.constBits(), dtype=numpy.uint8, count=height * image.bytesPerLine())
+
+    return data.reshape(height, image.bytesPerLine())[:, :width * 4].reshape(height, width, 4).copy()
+
+def arrayToImage(array):
+    height, width = array.shape[:2]
+    data = numpy.ascontiguousarray(array, dtype=numpy.uint8).tobytes()
+
+    # copy, because the QImage does not own the data
+    return QtGui.QImage(data, width, height, width * 4, QtGui.QImage.Format_ARGB32).copy()
+
+def faceDirections(forward, right, up, size):
+    '''Direction of every pixel center of a cube face. Row 0 is the top of the face.'''
+    steps = (numpy.arange(size) + 0.5) / size * 2.0 - 1.0
+
+    a = steps[numpy.newaxis, :, numpy.newaxis]
+    b = -steps[:, numpy.newaxis, numpy.newaxis]
+
+    return numpy.asarray(forward, dtype=float) + a * numpy.asarray(right, dtype=float) + b * numpy.asarray(up, dtype=float)
+
+def sampleEquirectangular(pixels, directions):
+    '''
+    Bilinear sampling of an equirectangular image for the given directions.
+    North is at the left border of the image and the image continues clockwise, like the 360 panorama.
+    '''
+    height, width = pixels.shape[:2]
+
+    x = directions[..., 0]
+    y = directions[..., 1]
+    z = directions[..., 2]
+
+    longitude = numpy.arctan2(x, y)
+    latitude = numpy.arctan2(z, numpy.hypot(x, y))
+
+    u = (longitude / (2.0 * math.pi)) % 1.0 * width - 0.5
+    v = (0.5 - latitude / math.pi) * height - 0.5
+
+    u0 = numpy.floor(u).astype(int)
+    v0 = numpy.floor(v).astype(int)
+    du = (u - u0)[..., numpy.newaxis]
+    dv = (v - v0)[..., numpy.newaxis]
+
+    # wrap around horizontally, clamp vertically
+    u1 = (u0 + 1) % width
+    u0 = u0 % width
+    v1 = numpy.clip(v0 + 1, 0, height - 1)
+    v0 = numpy.clip(v0, 0, height - 1)
+
+    top = pixels[v0, u0] * (1 - du) + pixels[v0, u1] * du
+    bottom = pixels[v1, u0] * (1 - du) + pixels[v1, u1] * du
+
+    return numpy.rint(top * (1 - dv) + bottom * dv).astype(numpy.uint8)
+
+def loadEquirectangular(imagePath, size):
+    '''Loads the panorama. Images much larger than needed for the face size are scaled while decoding.'''
+    reader = QtGui.QImageReader(imagePath)
+    imageSize = reader.size()
+
+    if imageSize.isValid() and imageSize.width() > size * 4:
+        reader.setScaledSize(QtCore.QSize(size * 4, size * 2))
+
+    return reader.read()
+
+def createCubeFaces(imagePath, size=DEFAULT_FACE_SIZE):
+    '''
+    Reprojects an equirectangular panorama into six cube faces and returns the face files.
+    Cached faces are reused. Safe to call from a worker thread as it only uses QImage.
+    '''
+    faceFiles = cubeFaceFiles(fileHash(imagePath), size)
+
+    if all(os.path.exists(faceFile) for faceFile in faceFiles.values()):
+        return faceFiles
+
+    image = loadEquirectangular(imagePath, size)
+
+    if image.isNull():
+        return None
+
+    pixels = imageToArray(image).astype(numpy.float32)
+
+    for name, forward, right, up in CUBE_FACES:
+        face = sampleEquirectangular(pixels, faceDirections(forward, right, up, size))
+
+        arrayToImage(face).save(faceFiles[name], 'PNG')
+
+    return faceFiles
+
+class CubeMapSignals(QtCore.QObject):
+    # image path, face size, dict of face name -> file or None when the image could not be read
+    finished = QtCore.Signal(str, int, object)
+
+class CubeMapJob(QtCore.QRunnable):
+    def __init__(self, imagePath, size, signals):
+        super().__init__()
+
+        self.imagePath = imagePath
+        self.size = size
+        self.signals = signals
+
+    def run(self):
+        try:
+            faceFiles = createCubeFaces(self.imagePath, self.size)
+        except Exception:
+            faceFiles = None
+
+        self.signals.finished.emit(self.imagePath, self.size, faceFiles)
@@ -0,0 +1,237 @@
+import math
+import numpy
+
+# The panorama arc is centered between the negative x and the positive y axis
+ARC_CENTER = math.radians(135)
+# Number of rings between the top of the panorama and the top of the sky dome
+SKY_DOME_RINGS = 6
+# Height of the sky dome above the panorama relative to the sky radius
+SKY_DOME_RATIO = 0.5
+# The sky is 1 meter behind the panorama
+SKY_OFFSET = 1000
+# Number of segments of the ground detail disc
+DETAIL_SEGMENTS = 32
+
+
+def arcAngles(radius, length, segments):
+    '''
+    Angles of the segment borders of a panorama arc, ordered from the start (west) to the end (north) of the arc.
+    Every segment is a chord of length / segments on a circle with the given radius.
+    When the segments would overlap, the arc is closed to a full cylinder.
+    '''
+    chord = min(1.0, length / segments / (2.0 * radius))
+    segmentAngle = 2.0 * math.asin(chord)
+
+    if segmentAngle * segments >= 2.0 * math.pi:
+        segmentAngle = 2.0 * math.pi / segments
+
+    arc = segmentAngle * segments
+
+    return ARC_CENTER + arc / 2.0 - numpy.arange(segments + 1) * segmentAngle
+
+
+def gridQuads(points, textureCoordinates):
+    '''
+    Converts a grid of points (rows x columns x 3) and texture coordinates (rows x columns x 2)
+    into separate quads for a SoFaceSet. Returns (vertices, textureCoordinates, quadCount).
+    '''
+    quadPoints = numpy.stack((points[:-1, :-1], points[:-1, 1:], points[1:, 1:], points[1:, :-1]), axis=2)
+    quadTextureCoordinates = numpy.stack((textureCoordinates[:-1, :-1], textureCoordinates[:-1, 1:],
+                                          textureCoordinates[1:, 1:], textureCoordinates[1:, :-1]), axis=2)
+
+    quadCount = quadPoints.shape[0] * quadPoints.shape[1]
+
+    return (quadPoints.reshape(-1, 3), quadTextureCoordinates.reshape(-1, textureCoordinates.shape[-1]), quadCount)
+
+
+def panoramaTextureS(angles, panorama360):
+    '''
+    Thirds spreads the whole image across the arc.
+    360 maps the image to the full circle, starting with north at the positive y axis. Only the part behind the arc is visible.
+    '''
+    if panorama360:
+        return (math.pi / 2.0 - angles) / (2.0 * math.pi)
+
+    return numpy.linspace(0.0, 1.0, len(angles))
+
+
+def panoramaMesh(radius, length, height, segments, panorama360=False):
+    angles = arcAngles(radius, length, segments)
+
+    x = radius * numpy.cos(angles)
+    y = radius * numpy.sin(angles)
+    z = numpy.array([0.0, height])
+
+    points = numpy.empty((2, len(angles), 3))
+    points[:, :, 0] = x
+    points[:, :, 1] = y
+    points[:, :, 2] = z[:, numpy.newaxis]
+
+    textureCoordinates = numpy.empty((2, len(angles), 2))
+    textureCoordinates[:, :, 0] = panoramaTextureS(angles, panorama360)
+    textureCoordinates[:, :, 1] = numpy.array([0.0, 1.0])[:, numpy.newaxis]
+
+    return gridQuads(points, textureCoordinates)
+
+
+def skyMesh(radius, length, height, overlap, segments, skyOffset=SKY_OFFSET, rings=SKY_DOME_RINGS):
+    '''
+    The sky is skyOffset behind the panorama. It runs down behind the panorama by overlap and continues as a dome above it.
+    The lower rows of the texture are mapped to the overlapping part, the rest to the dome up to its top.
+    '''
+    angles = arcAngles(radius, length, segments)
+    profileRadius, profileZ, t = skyProfile(radius + skyOffset, height, overlap, rings)
+
+    points = numpy.empty((len(profileZ), len(angles), 3))
+    points[:, :, 0] = profileRadius[:, numpy.newaxis] * numpy.cos(angles)
+    points[:, :, 1] = profileRadius[:, numpy.newaxis] * numpy.sin(angles)
+    points[:, :, 2] = profileZ[:, numpy.newaxis]
+
+    textureCoordinates = numpy.empty((len(profileZ), len(angles), 2))
+    textureCoordinates[:, :, 0] = numpy.linspace(0.0, 1.0, len(angles))
+    textureCoordinates[:, :, 1] = t[:, numpy.newaxis]
+
+    if overlap <= 0:
+        # Skip the degenerated overlap row
+        points = points[1:]
+        textureCoordinates = textureCoordinates[1:]
+
+    return gridQuads(points, textureCoordinates)
+
+
+def skyProfile(radius, height, overlap, rings=SKY_DOME_RINGS):
+    '''
+    Profile of the sky from the bottom of the overlap to the top of the dome.
+    Returns (radii, z values, texture t) of the profile points. Index 1 is the top of the panorama, where the dome starts.
+    '''
+    top = radius * SKY_DOME_RATIO
+
+    elevations = numpy.linspace(0.0, math.pi / 2.0, rings + 1)
+    profileRadius = numpy.concatenate(([radius], radius * numpy.cos(elevations)))
+    profileZ = numpy.concatenate(([height - overlap], height + top * numpy.sin(elevations)))
+
+    # Texture coordinates along the profile by distance, so the image is not distorted at the dome
+    distances = numpy.concatenate(([0.0], numpy.cumsum(numpy.hypot(numpy.diff(profileRadius), numpy.diff(profileZ)))))
+    t = distances / distances[-1] if distances[-1] > 0 else numpy.linspace(0.0, 1.0, len(distances))
+
+    return (profileRadius, profileZ, t)
+
+
+def groundBounds(radius, length, segments):
+    '''Bounding rectangle (xMin, yMin, xMax, yMax) of the panorama arc and the origin'''
+    angles = arcAngles(radius, length, segments)
+
+    x = numpy.append(radius * numpy.cos(angles), 0.0)
+    y = numpy.append(radius * numpy.sin(angles), 0.0)
+
+    return (float(x.min()), float(y.min()), float(x.max()), float(y.max()))
+
+
+def groundMesh(radius, length, segments, realSize=0):
+    '''
+    Without a real size the image is stretched across the whole ground.
+    With a real size the image is repeated every realSize millimeters, like the realSize of materials.
+    '''
+    xMin, yMin, xMax, yMax = groundBounds(radius, length, segments)
+
+    points = numpy.array([[xMin, yMin, 0.0], [xMax, yMin, 0.0], [xMax, yMax, 0.0], [xMin, yMax, 0.0]])
+
+    if realSize > 0:
+        textureCoordinates = (points[:, :2] - numpy.array([xMin, yMin])) / realSize
+    else:
+        textureCoordinates = numpy.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+
+    return (points, textureCoordinates, 1)
+
+
+def groundDetailMesh(fadeDistance, realSize, segments=DETAIL_SEGMENTS):
+    '''
+    A disc around the origin showing the detail image every realSize millimeters.
+    The disc is opaque up to half of the fadeDistance and gets fully transparent at the fadeDistance.
+    Returns (vertices, textureCoordinates, quadCount, transparencies).
+    '''
+    angles = numpy.linspace(0.0, 2.0 * math.pi, segments + 1)
+    radii = numpy.array([0.0, fadeDistance / 2.0, fadeDistance])
+    transparency = numpy.array([0.0, 0.0, 1.0])
+
+    points = numpy.empty((len(radii), len(angles), 3))
+    points[:, :, 0] = radii[:, numpy.newaxis] * numpy.cos(angles)
+    points[:, :, 1] = radii[:, numpy.newaxis] * numpy.sin(angles)
+    points[:, :, 2] = 0.0
+
+    # texture coordinates and the transparency are converted to quads together
+    values = numpy.empty((len(radii), len(angles), 3))
+    values[:, :, 0] = points[:, :, 0] / realSize
+    values[:, :, 1] = points[:, :, 1] / realSize
+    values[:, :, 2] = transparency[:, numpy.newaxis]
+
+    vertices, quadValues, quadCount = gridQuads(points, values)
+
+    return (vertices, quadValues[:, :2], quadCount, quadValues[:, 2])
+
+
+def assignMesh(coordinates, textureCoordinates, faceset, mesh, verticesPerFace=4):
+    '''Writes a mesh into the coin nodes with a single assignment per field'''
+    points, uvs, faceCount = mesh
+
+    coordinates.point.setNum(len(points))
+    coordinates.point.setValues(0, len(points), points.tolist())
+
+    textureCoordinates.point.setNum(len(uvs))
+    textureCoordinates.point.setValues(0, len(uvs), uvs.tolist())
+
+    faceset.numVertices.setNum(faceCount)
+    faceset.numVertices.setValues(0, faceCount, [verticesPerFace] * faceCount)
+
+
+def tiledPanoramaMeshes(radius, length, height, segments, columns, rows, panorama360=False, shift=0.0):
+    '''
+    Splits the panorama into one mesh per image tile, so every tile can use its own texture.
+    Tiles are numbered (row, column) with row 0 at the top of the image.
+    The arc is cut where the texture coordinates cross a tile border. Texture coordinates of every mesh
+    go from 0 to 1 across its tile. shift moves the image along the arc, e.g. for the rotation of 360 panoramas.
+    '''
+    angles = arcAngles(radius, length, segments)
+    s = panoramaTextureS(angles, panorama360) + shift
+    x = radius * numpy.cos(angles)
+    y = radius * numpy.sin(angles)
+
+    meshes = {}
+
+    for column in range(columns):
+        # 360 panoramas repeat the image, so a tile might be visible multiple times
+        for repeat in range(int(math.floor(s[0])), int(math.ceil(s[-1])) + 1):
+            start = repeat + float(column) / columns
+            end = start + 1.0 / columns
+
+            low = max(start, s[0])
+            high = min(end, s[-1])
+
+            if high <= low:
+                continue
+
+            samples = numpy.concatenate(([low], s[(s > low) & (s < high)], [high]))
+            u = (samples - start) * columns
+
+            for row in range(rows):
+                bottom = 1.0 - (row + 1.0) / rows
+                top = 1.0 - float(row) / rows
+
+                points = numpy.empty((2, len(samples), 3))
+                points[:, :, 0] = numpy.interp(samples, s, x)
+                points[:, :, 1] = numpy.interp(samples, s, y)
+                points[:, :, 2] = (numpy.array([bottom, top]) * height)[:, numpy.newaxis]
+
+                textureCoordinates = numpy.empty((2, len(samples), 2))
+                textureCoordinates[:, :, 0] = u
+                textureCoordinates[:, :, 1] = numpy.array([0.0, 1.0])[:, numpy.newaxis]
+
+                mesh = gridQuads(points, textureCoordinates)
+
+                if (row, column) in meshes:
+                    existing = meshes[(row, column)]
+                    mesh = (numpy.concatenate((existing[0], mesh[0])), numpy.concatenate((existing[1], mesh[1])), existing[2] + mesh[2])
+
+                meshes[(row, column)] = mesh
+
+    return meshes
@@ -1,5 +1,6 @@
-import FreeCAD, Part
+import FreeCAD
 import math
+import hashlib
 from functools import cmp_to_key
 from pivy import coin
 from itertools import groupby
@@ -14,6 +15,9 @@ def toFreeCADVector(vector):
     return FreeCAD.Vector(vector[0], vector[1], vector[2])
 
 def buildTriangle(vertices):
+    # Part is only needed here. Importing it lazily keeps the workbench startup fast
+    import Part
+
     v1 = vertices[0]['vector']
     v2 = vertices[1]['vector']
     v3 = vertices[2]['vector']
@@ -67,6 +71,20 @@ def extractOverrides(overrides):
 
     return tuple(extractedOverrides)
 
+def sizeNormalizedRealSize(realSize):
+    '''
+    Texture coordinates calculated with this realSize are in millimeters for every axis with a real size set.
+    The real size itself is applied later on by a texture transform. Axes without a real size are
+    still stretched across the face.
+    '''
+    if realSize is None:
+        return None
+
+    return {
+        's': 1 if realSize['s'] > 0 else 0,
+        't': 1 if realSize['t'] > 0 else 0
+    }
+
 def vectorListEquals(vectors1, vectors2):
     if len(vectors1) != len(vectors2):
         return False
@@ -84,6 +102,61 @@ def vectorListEquals(vectors1, vectors2):
     
     return True
 
+# Vertices are equal within this distance, see vectorListEquals
+VECTOR_TOLERANCE = 0.01
+
+def vectorListCell(vectors, cellSize=VECTOR_TOLERANCE):
+    '''Grid cell of the center of the vectors. Order independent, used to index face overrides.'''
+    if len(vectors) == 0:
+        return (0, 0, 0, 0)
+
+    count = float(len(vectors))
+    x = sum(v.x for v in vectors) / count
+    y = sum(v.y for v in vectors) / count
+    z = sum(v.z for v in vectors) / count
+
+    return (len(vectors), int(math.floor(x / cellSize)), int(math.floor(y / cellSize)), int(math.floor(z / cellSize)))
+
+class FaceOverrideIndex():
+    '''
+    Indexes the face overrides of a single object by the grid cell of the center of their vertices.
+    When all vertices are equal within the tolerance, the centers are as well. So a matching override
+    is either in the cell of the face or in one of its neighbours, and a lookup only checks these 27 cells.
+    '''
+    def __init__(self, faceOverrides=None):
+        self.byCell = {}
+        self.count = 0
+
+        if faceOverrides is not None:
+            for faceOverride in faceOverrides:
+                self.add(faceOverride)
+
+    def add(self, faceOverride):
+        self.byCell.setdefault(vectorListCell(faceOverride['vertices']), []).append(faceOverride)
+        self.count += 1
+
+    def remove(self, faceOverride):
+        bucket = self.byCell.get(vectorListCell(faceOverride['vertices']))
+
+        if bucket is not None and any(existing is faceOverride for existing in bucket):
+            bucket[:] = [existing for existing in bucket if existing is not faceOverride]
+            self.count -= 1
+
+    def find(self, vectors):
+        count, x, y, z = vectorListCell(vectors)
+
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for faceOverride in self.byCell.get((count, x + dx, y + dy, z + dz), []):
+                        if vectorListEquals(faceOverride['vertices'], vectors):
+                            return faceOverride
+
+        return None
+
+    def __len__(self):
+        return self.count
+
 class Face():
     def __init__(self):
         self.indices = []
@@ -118,9 +191,13 @@ class Face():
 
         return vectorListEquals(ownVectors, vectors)
 
-    def appendTextureCoordinates(self, textureCoords, realSize):
+    def appendTextureCoordinates(self, textureCoords, realSize, sizeNormalized=False):
         axisSwapped = self.shouldSwapAxis(realSize)
-        scaleFactor = self.calculateScaleFactor(realSize, axisSwapped)
+
+        if sizeNormalized:
+            scaleFactor = self.calculateScaleFactor(sizeNormalizedRealSize(realSize), axisSwapped)
+        else:
+            scaleFactor = self.calculateScaleFactor(realSize, axisSwapped)
 
         for vertex in self.vertices:
             s, t = calculateTextureCoordinate(vertex['vector'], self.boundingBox, scaleFactor, axisSwapped)
@@ -386,11 +463,20 @@ class FaceSet():
 
         self.faces.append(face)
     
-    def calculateTextureCoordinates(self, realSize):
+    def calculateTextureCoordinates(self, realSize, sizeNormalized=False):
         textureCoords = coin.SoTextureCoordinate2()
 
         for face in self.faces:
-            face.appendTextureCoordinates(textureCoords, realSize)
+            face.appendTextureCoordinates(textureCoords, realSize, sizeNormalized)
+
+        return textureCoords
+
+    def calculateTextureCoordinatesPerFace(self, realSizes, sizeNormalized=False):
+        '''Like calculateTextureCoordinates but with a separate realSize for every face'''
+        textureCoords = coin.SoTextureCoordinate2()
+
+        for face, realSize in zip(self.faces, realSizes):
+            face.appendTextureCoordinates(textureCoords, realSize, sizeNormalized)
 
         return textureCoords
     
@@ -467,9 +553,47 @@ def buildFaceCoordinates(brep):
 
     return faces
 
+def tessellationFingerprint(brep, vertexCoordinates, precision=3):
+    '''
+    Hash of the local tessellation of an object. The scene graph stores the vertices without the placement,
+    so geometrically identical objects (e.g. array elements) get the same fingerprint wherever they are placed.
+    '''
+    fingerprint = hashlib.sha1()
+
+    fingerprint.update(repr(tuple(brep.coordIndex.getValues())).encode('utf-8'))
+    fingerprint.update(repr(tuple(brep.partIndex.getValues())).encode('utf-8'))
+
+    for point in vertexCoordinates.point.getValues():
+        x, y, z = point.getValue()
+
+        fingerprint.update(repr((round(x, precision), round(y, precision), round(z, precision))).encode('utf-8'))
+
+    return fingerprint.hexdigest()
+
+def buildIndexedFaceSet(faceCoordinateList, faceIndices):
+    '''Builds a IndexedFaceSet that only contains the given faces. Texture coordinates use the same indices as the vertices.'''
+    coordinateIndex = []
+
+    for faceIndex in faceIndices:
+        if faceIndex >= len(faceCoordinateList):
+            continue
+
+        for triangle in faceCoordinateList[faceIndex]:
+            coordinateIndex.extend(triangle)
+            coordinateIndex.append(-1)
+
+    faceSet = coin.SoIndexedFaceSet()
+    faceSet.coordIndex.setValues(0, len(coordinateIndex), coordinateIndex)
+    faceSet.textureCoordIndex.setValues(0, len(coordinateIndex), coordinateIndex)
+
+    return faceSet
+
 def findOverridesForFace(face, faceOverrides=None):
     if faceOverrides is None:
         return  None
+
+    if isinstance(faceOverrides, FaceOverrideIndex):
+        return faceOverrides.find([vertex['vector'] for vertex in face.originalVertices])
     
     for faceOverride in faceOverrides:
         if face.matches(faceOverride['vertices']):
@@ -0,0 +1,333 @@
+from collections import OrderedDict
+
+import FreeCAD
+import FreeCADGui
+from pivy import coin
+
+import arch_texture_utils.camera_utils as camera_utils
+from arch_texture_utils.camera_utils import documentRoot, documentViews, viewKey
+from arch_texture_utils.qtutils import QtCore, QtWidgets
+
+PARAMETER_PATH = 'User parameter:BaseApp/Preferences/Mod/ArchTextures'
+# Fixed function OpenGL guarantees 8 lights. One of them is taken by the headlight of the view
+DEFAULT_LIGHT_BUDGET = 7
+
+# Settings of the SoShadowGroup. Quality defines the size of the shadow maps, smoothBorder blurs the shadow edges
+SHADOW_QUALITY = OrderedDict([
+    ('Low', {'quality': 0.25, 'precision': 0.25, 'smoothBorder': 0.0}),
+    ('Medium', {'quality': 0.5, 'precision': 0.5, 'smoothBorder': 0.3}),
+    ('High', {'quality': 1.0, 'precision': 0.75, 'smoothBorder': 0.6})
+])
+DEFAULT_SHADOW_QUALITY = 'Medium'
+
+def lightBudget():
+    '''The maximum number of lights enabled at the same time in a view, stored in the FreeCAD parameters'''
+    return max(1, FreeCAD.ParamGet(PARAMETER_PATH).GetInt('LightBudget', DEFAULT_LIGHT_BUDGET))
+
+def shadowsSupported():
+    return hasattr(coin, 'SoShadowGroup')
+
+def shadowsEnabled():
+    return shadowsSupported() and FreeCAD.ParamGet(PARAMETER_PATH).GetBool('Shadows', False)
+
+def shadowQuality():
+    quality = FreeCAD.ParamGet(PARAMETER_PATH).GetString('ShadowQuality', DEFAULT_SHADOW_QUALITY)
+
+    return SHADOW_QUALITY.get(quality, SHADOW_QUALITY[DEFAULT_SHADOW_QUALITY])
+
+def shadowsWhileNavigating():
+    return FreeCAD.ParamGet(PARAMETER_PATH).GetBool('ShadowsWhileNavigating', False)
+
+def noShadowStyle():
+    '''A node that excludes the following nodes from casting and receiving shadows or None when coin has no shadow support'''
+    if not shadowsSupported():
+        return None
+
+    style = coin.SoShadowStyle()
+    style.style = coin.SoShadowStyle.NO_SHADOWING
+
+    return style
+
+def lightScore(viewProvider, cameraPosition, viewVolume):
+    '''
+    Importance of a light for a view. Directional lights reach everything and always come first.
+    Point lights lose importance with the square of their distance to the camera.
+    Returns None when the light does not contribute to the view at all.
+    '''
+    lightObject = viewProvider.Object
+
+    if not viewProvider.ViewObject.Visibility or lightObject.Intensity <= 0:
+        return None
+
+    if not hasattr(lightObject, 'Location'):
+        return (1, lightObject.Intensity)
+
+    location = lightObject.Location
+    lightRange = getattr(lightObject, 'Range', None)
+
+    if lightRange is not None and lightRange.Value > 0:
+        reach = FreeCAD.BoundBox(location, location)
+        reach.enlarge(lightRange.Value)
+
+        # Lights that can not reach anything inside the view volume are culled
+        if not camera_utils.isInViewVolume(viewVolume, reach):
+            return None
+
+    distance = (location - FreeCAD.Vector(cameraPosition[0], cameraPosition[1], cameraPosition[2])).Length
+
+    return (0, lightObject.Intensity / max(distance, 1.0) ** 2)
+
+class LightGroup():
+    '''
+    The lights of a single view. Every light is wrapped into a switch, so only the most important
+    lights are enabled. The light nodes themselves are shared between all views.
+    With shadows enabled, the scene graph of the view is wrapped into a SoShadowGroup.
+    '''
+    def __init__(self, view):
+        self.view = view
+        self.sceneGraph = documentRoot(view)
+        self.group = coin.SoGroup()
+        self.switches = {}
+        self.shadowGroup = None
+        self.cameraWatcher = camera_utils.CameraWatcher(self.onCameraMoved, delay=100, startCallback=self.onNavigationStarted)
+
+        self.sceneGraph.insertChild(self.group, 1)
+        self.cameraWatcher.attach(view)
+
+    def addLight(self, viewProvider):
+        if viewProvider in self.switches:
+            return
+
+        switch = coin.SoSwitch()
+        switch.whichChild.setValue(coin.SO_SWITCH_NONE)
+        switch.addChild(viewProvider.coinLight)
+
+        self.group.addChild(switch)
+        self.switches[viewProvider] = switch
+
+    def removeLight(self, viewProvider):
+        switch = self.switches.pop(viewProvider, None)
+
+        if switch is not None:
+            self.group.removeChild(switch)
+
+    def replaceLight(self, viewProvider):
+        switch = self.switches.get(viewProvider, None)
+
+        if switch is not None:
+            switch.replaceChild(0, viewProvider.coinLight)
+
+    def onNavigationStarted(self, view):
+        if self.shadowGroup is not None and not shadowsWhileNavigating():
+            self.shadowGroup.isActive = False
+
+    def onCameraMoved(self, view):
+        if self.shadowGroup is not None:
+            self.shadowGroup.isActive = True
+
+        self.update()
+
+    def setSceneGraph(self, sceneGraph):
+        '''Replaces the scene graph of the viewer, keeping the camera'''
+        camera = self.view.getCamera()
+
+        self.view.getViewer().setSceneGraph(sceneGraph)
+        self.view.setCamera(camera)
+
+        # The viewer might have created a new camera node
+        self.cameraWatcher.attach(self.view)
+
+    def updateShadows(self):
+        enabled = shadowsEnabled()
+
+        try:
+            if enabled and self.shadowGroup is None:
+                self.shadowGroup = coin.SoShadowGroup()
+                self.shadowGroup.addChild(self.sceneGraph)
+
+                self.setSceneGraph(self.shadowGroup)
+            elif not enabled and self.shadowGroup is not None:
+                self.shadowGroup = None
+
+                self.setSceneGraph(self.sceneGraph)
+        except Exception as e:
+            # The view was closed in the meantime
+            FreeCAD.Console.PrintLog('Could not update the shadows of a view: %s\n' % (e,))
+            return
+
+        if self.shadowGroup is not None:
+            quality = shadowQuality()
+
+            self.shadowGroup.quality = quality['quality']
+            self.shadowGroup.precision = quality['precision']
+            self.shadowGroup.smoothBorder = quality['smoothBorder']
+
+    def update(self):
+        '''Enables the top lights of the budget and disables all others'''
+        try:
+            cameraPosition = camera_utils.getCameraPosition(self.view)
+            viewVolume = camera_utils.getViewVolume(self.view)
+        except Exception:
+            # The view was closed in the meantime
+            return
+
+        ranked = []
+
+        for viewProvider in self.switches:
+            score = lightScore(viewProvider, cameraPosition, viewVolume)
+
+            if score is not None:
+                ranked.append((score, viewProvider))
+
+        ranked.sort(key=lambda rankedLight: rankedLight[0], reverse=True)
+        enabled = set(viewProvider for score, viewProvider in ranked[:lightBudget()])
+
+        for viewProvider, switch in self.switches.items():
+            whichChild = 0 if viewProvider in enabled else coin.SO_SWITCH_NONE
+
+            if switch.whichChild.getValue() != whichChild:
+                switch.whichChild.setValue(whichChild)
+
+    def dispose(self):
+        if self.shadowGroup is not None:
+            self.shadowGroup = None
+
+            try:
+                self.setSceneGraph(self.sceneGraph)
+            except Exception:
+                pass
+
+        self.cameraWatcher.detach()
+
+        try:
+            self.sceneGraph.removeChild(self.group)
+        except Exception:
+            pass
+
+        self.switches = {}
+
+class LightManager():
+    '''
+    Owns one light group in every 3D view of the documents containing lights.
+    Changes are coalesced, so changing lots of lights at once ranks them only once.
+    '''
+    def __init__(self):
+        self.lights = []
+        self.groups = {}
+        self.mdiArea = None
+
+        self.updateTimer = QtCore.QTimer()
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(0)
+        self.updateTimer.timeout.connect(self.update)
+
+    def watchViews(self):
+        '''Views opened later are picked up when they get activated'''
+        if self.mdiArea is not None:
+            return
+
+        mainWindow = FreeCADGui.getMainWindow()
+        self.mdiArea = mainWindow.findChild(QtWidgets.QMdiArea) if mainWindow is not None else None
+
+        if self.mdiArea is not None:
+            self.mdiArea.subWindowActivated.connect(self.onViewActivated)
+
+    def addLight(self, viewProvider):
+        if viewProvider not in self.lights:
+            self.lights.append(viewProvider)
+
+        self.watchViews()
+        self.scheduleUpdate()
+
+    def removeLight(self, viewProvider):
+        if viewProvider in self.lights:
+            self.lights.remove(viewProvider)
+
+        for group in self.groups.values():
+            group.removeLight(viewProvider)
+
+        self.scheduleUpdate()
+
+    def replaceLight(self, viewProvider):
+        '''Called after the light node of the view provider was recreated'''
+        for group in self.groups.values():
+            group.replaceLight(viewProvider)
+
+    def setShadows(self, enabled):
+        '''Switches all lights to their shadow casting variants and wraps all views into a shadow group'''
+        if enabled and not shadowsSupported():
+            FreeCAD.Console.PrintWarning('Shadows are not supported by the coin version of this FreeCAD\n')
+            return
+
+        FreeCAD.ParamGet(PARAMETER_PATH).SetBool('Shadows', enabled)
+
+        for viewProvider in list(self.lights):
+            viewProvider.updateLightInstance()
+
+        self.scheduleUpdate()
+
+    def onViewActivated(self, subWindow):
+        if len(self.lights) > 0:
+            self.scheduleUpdate()
+
+    def scheduleUpdate(self):
+        self.updateTimer.start()
+
+    def lightDocumentName(self, viewProvider):
+        try:
+            return viewProvider.Object.Document.Name
+        except Exception:
+            # The object or its document was deleted
+            return None
+
+    def updateGroups(self):
+        '''Adds groups to new views and drops the groups of closed views'''
+        views = {}
+        lightsByDocument = {}
+
+        for viewProvider in list(self.lights):
+            documentName = self.lightDocumentName(viewProvider)
+
+            if documentName is None:
+                self.lights.remove(viewProvider)
+                continue
+
+            lightsByDocument.setdefault(documentName, []).append(viewProvider)
+
+        for documentName, documentLights in lightsByDocument.items():
+            for view in documentViews(FreeCADGui.getDocument(documentName)):
+                views[viewKey(view)] = (view, documentLights)
+
+        for key in list(self.groups.keys()):
+            if key not in views:
+                self.groups.pop(key).dispose()
+
+        for key, (view, documentLights) in views.items():
+            if key not in self.groups:
+                self.groups[key] = LightGroup(view)
+
+            group = self.groups[key]
+
+            for viewProvider in list(group.switches.keys()):
+                if viewProvider not in documentLights:
+                    group.removeLight(viewProvider)
+
+            for viewProvider in documentLights:
+                group.addLight(viewProvider)
+
+    def update(self):
+        self.updateGroups()
+
+        for group in self.groups.values():
+            group.updateShadows()
+            group.update()
+
+lightManager = None
+
+def getLightManager():
+    global lightManager
+
+    if lightManager is None:
+        lightManager = LightManager()
+
+    return lightManager
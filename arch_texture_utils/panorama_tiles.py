@@ -0,0 +1,171 @@
+import hashlib
+import math
+import os
+
+from arch_texture_utils.qtutils import QtCore, QtGui
+from arch_texture_utils.resource_utils import cachePath
+
+# Tiles stay well below the maximum texture size of most graphic cards
+TILE_SIZE = 4096
+DEFAULT_MEMORY_BUDGET = 256
+
+def tileGrid(imagePath):
+    '''(columns, rows, width, height) of the tiles of an image. Only the image header is read.'''
+    size = QtGui.QImageReader(imagePath).size()
+
+    if not size.isValid():
+        return None
+
+    columns = max(1, int(math.ceil(size.width() / float(TILE_SIZE))))
+    rows = max(1, int(math.ceil(size.height() / float(TILE_SIZE))))
+
+    return (columns, rows, size.width(), size.height())
+
+def tileRect(grid, row, column):
+    columns, rows, width, height = grid
+
+    left = column * width // columns
+    top = row * height // rows
+    right = (column + 1) * width // columns
+    bottom = (row + 1) * height // rows
+
+    return QtCore.QRect(left, top, right - left, bottom - top)
+
+def tileFiles(imagePath, grid):
+    '''The cache files of all tiles keyed by (row, column). Keyed by path, modification time and file size of the image.'''
+    stat = os.stat(imagePath)
+    key = hashlib.sha1(('%s|%s|%s|%s' % (imagePath, stat.st_mtime, stat.st_size, TILE_SIZE)).encode('utf-8')).hexdigest()
+    directory = cachePath('panorama_tiles')
+    columns, rows = grid[:2]
+
+    return dict(((row, column), os.path.join(directory, '%s_%s_%s.png' % (key, row, column)))
+                for row in range(rows) for column in range(columns))
+
+def canDecodeTiles(imagePath):
+    '''True when the image format can decode a part of the image, like JPEG. PNG and TIFF always decode the whole image.'''
+    return QtGui.QImageReader(imagePath).supportsOption(QtGui.QImageIOHandler.ClipRect)
+
+def readWholeImage(imagePath):
+    '''
+    Reads the whole image. Qt 6 refuses to decode images above its allocation limit of 128 MB,
+    which large panoramas exceed. So the limit is lifted while reading.
+    '''
+    reader = QtGui.QImageReader(imagePath)
+
+    if not hasattr(QtGui.QImageReader, 'setAllocationLimit'):
+        return reader.read()
+
+    allocationLimit = QtGui.QImageReader.allocationLimit()
+    QtGui.QImageReader.setAllocationLimit(0)
+
+    try:
+        return reader.read()
+    finally:
+        QtGui.QImageReader.setAllocationLimit(allocationLimit)
+
+def createTiles(imagePath):
+    '''
+    Splits the image into tiles once. Later calls return the cached tiles.
+    Formats that can decode a part of the image (e.g. JPEG) decode every tile on its own, so the whole image
+    never has to be in memory at once. All other formats (e.g. PNG and TIFF) are decoded once and cut into tiles,
+    which needs the memory of the whole image for a moment.
+    Safe to call from a worker thread as it only uses QImage.
+    Returns (grid, tile files) or None when the image could not be read.
+    '''
+    grid = tileGrid(imagePath)
+
+    if grid is None:
+        return None
+
+    files = tileFiles(imagePath, grid)
+    missingTiles = [(key, tileFile) for key, tileFile in files.items() if not os.path.exists(tileFile)]
+
+    if len(missingTiles) == 0:
+        return (grid, files)
+
+    if canDecodeTiles(imagePath):
+        for (row, column), tileFile in missingTiles:
+            reader = QtGui.QImageReader(imagePath)
+            reader.setClipRect(tileRect(grid, row, column))
+
+            tile = reader.read()
+
+            if tile.isNull():
+                return None
+
+            tile.save(tileFile, 'PNG')
+    else:
+        image = readWholeImage(imagePath)
+
+        if image.isNull():
+            return None
+
+        for (row, column), tileFile in missingTiles:
+            image.copy(tileRect(grid, row, column)).save(tileFile, 'PNG')
+
+    return (grid, files)
+
+class TileSignals(QtCore.QObject):
+    # image path, (grid, tile files) or None
+    finished = QtCore.Signal(str, object)
+
+class TileJob(QtCore.QRunnable):
+    def __init__(self, imagePath, signals):
+        super().__init__()
+
+        self.imagePath = imagePath
+        self.signals = signals
+
+    def run(self):
+        try:
+            tiles = createTiles(self.imagePath)
+        except Exception:
+            tiles = None
+
+        self.signals.finished.emit(self.imagePath, tiles)
+
+class TileBudget():
+    '''
+    Keeps track of the loaded tiles. Tiles that are not visible are released in least recently used order
+    as soon as the loaded tiles exceed the memory budget.
+    '''
+    def __init__(self, budgetBytes):
+        self.budgetBytes = budgetBytes
+        self.loaded = []
+        self.sizes = {}
+
+    def loadedBytes(self):
+        return sum(self.sizes.values())
+
+    def use(self, key, size):
+        '''Marks a tile as used. Returns True when the tile has to be loaded.'''
+        newTile = key not in self.sizes
+
+        if not newTile:
+            self.loaded.remove(key)
+
+        self.loaded.append(key)
+        self.sizes[key] = size
+
+        return newTile
+
+    def release(self, visibleKeys):
+        '''Returns the keys of the tiles to release to stay within the budget. Visible tiles are never released.'''
+        released = []
+
+        for key in list(self.loaded):
+            if self.loadedBytes() <= self.budgetBytes:
+                break
+
+            if key in visibleKeys:
+                continue
+
+            self.loaded.remove(key)
+            del self.sizes[key]
+            released.append(key)
+
+        return released
+
+    def clear(self):
+        self.loaded = []
+        self.sizes = {}
@@ -35,4 +35,12 @@ def userSelectedFile(title, filePattern, mustExist=True):
     if fileName == '':
         return None
 
-    return fileName
\ No newline at end of file
+    return fileName
+
+def userSelectedDirectory(title):
+    directory = QtWidgets.QFileDialog.getExistingDirectory(activeWindow(), title)
+
+    if directory == '':
+        return None
+
+    return directory
\ No newline at end of file
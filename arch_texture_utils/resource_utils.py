@@ -1,3 +1,5 @@
+import os
+import tempfile
 from os import path
 
 resources_path = path.join(path.dirname(path.realpath(__file__)), '..', 'Resources')
@@ -12,4 +14,20 @@ def iconPath(name):
 def uiPath(name):
     f = path.join(ui_path, name)
 
-    return f
\ No newline at end of file
+    return f
+
+def cachePath(name):
+    '''Returns a directory inside the users cache to store generated files. The directory is created when missing.'''
+    import FreeCAD
+
+    if hasattr(FreeCAD, 'getUserCachePath'):
+        base = FreeCAD.getUserCachePath()
+    else:
+        base = tempfile.gettempdir()
+
+    directory = path.join(base, 'ArchTextures', name)
+
+    if not path.isdir(directory):
+        os.makedirs(directory)
+
+    return directory
@@ -0,0 +1,80 @@
+import hashlib
+import math
+import os
+
+import numpy
+
+from arch_texture_utils.resource_utils import cachePath
+
+DEFAULT_RESOLUTION = 256
+SUN_COLOR = (1.0, 0.95, 0.85)
+
+# '<parameter_key>': (width, height, pixels) of the recently generated skies
+skyCache = {}
+
+def skyCacheKey(parameters):
+    return hashlib.sha1(repr(parameters).encode('utf-8')).hexdigest()
+
+def skyGradient(width, height, zenithColor, horizonColor, sunDirection, haze, startAngle, endAngle, horizonT):
+    '''
+    Generates a sky with a gradient from the horizon to the zenith and a sun glow in the direction of the sun.
+    The columns follow the sky arc from startAngle to endAngle, the rows the texture t of the sky from bottom to top.
+    Everything below horizonT is behind the panorama and gets the horizon color.
+    sunDirection points towards the sun or is None. haze from 0 to 1 spreads the horizon color and the sun glow.
+    Returns a (height, width, 3) array of uint8 with row 0 at the bottom, like the image field of a SoTexture2.
+    '''
+    s = (numpy.arange(width) + 0.5) / width
+    t = (numpy.arange(height) + 0.5) / height
+
+    azimuth = startAngle + s * (endAngle - startAngle)
+    elevation = numpy.clip((t - horizonT) / max(1.0 - horizonT, 1e-6), 0.0, 1.0) * math.pi / 2.0
+
+    # direction of every pixel, shape (height, width)
+    x = numpy.cos(elevation)[:, numpy.newaxis] * numpy.cos(azimuth)[numpy.newaxis, :]
+    y = numpy.cos(elevation)[:, numpy.newaxis] * numpy.sin(azimuth)[numpy.newaxis, :]
+    z = numpy.repeat(numpy.sin(elevation)[:, numpy.newaxis], width, axis=1)
+
+    # More haze pushes the horizon color further up
+    gradient = (z ** (0.5 + 2.0 * haze))[..., numpy.newaxis]
+
+    horizon = numpy.asarray(horizonColor, dtype=float)
+    zenith = numpy.asarray(zenithColor, dtype=float)
+    colors = horizon + (zenith - horizon) * gradient
+
+    if sunDirection is not None:
+        cosine = numpy.clip(x * sunDirection[0] + y * sunDirection[1] + z * sunDirection[2], 0.0, 1.0)
+
+        disc = cosine ** (64.0 + 960.0 * (1.0 - haze))
+        glow = cosine ** 8.0 * (0.2 + 0.5 * haze)
+        amount = numpy.clip(disc + glow, 0.0, 1.0)[..., numpy.newaxis]
+
+        colors = colors + (numpy.asarray(SUN_COLOR) - colors) * amount
+
+    return numpy.rint(numpy.clip(colors, 0.0, 1.0) * 255).astype(numpy.uint8)
+
+def proceduralSky(width, height, zenithColor, horizonColor, sunDirection, haze, startAngle, endAngle, horizonT):
+    '''Like skyGradient, but cached in memory and on disk by the parameters'''
+    parameters = (width, height, tuple(round(c, 4) for c in zenithColor), tuple(round(c, 4) for c in horizonColor),
+                  tuple(round(c, 4) for c in sunDirection) if sunDirection is not None else None,
+                  round(haze, 4), round(startAngle, 6), round(endAngle, 6), round(horizonT, 6))
+
+    key = skyCacheKey(parameters)
+
+    if key in skyCache:
+        return skyCache[key]
+
+    cacheFile = os.path.join(cachePath('sky'), key + '.npy')
+
+    if os.path.exists(cacheFile):
+        pixels = numpy.load(cacheFile)
+    else:
+        pixels = skyGradient(*parameters)
+        numpy.save(cacheFile, pixels)
+
+    # Only keep the recent skies, while tweaking parameters lots of skies are generated
+    if len(skyCache) > 16:
+        skyCache.clear()
+
+    skyCache[key] = pixels
+
+    return pixels
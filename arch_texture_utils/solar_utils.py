@@ -0,0 +1,144 @@
+import calendar
+import datetime
+import hashlib
+import math
+import os
+
+import numpy
+
+from arch_texture_utils.qtutils import QtCore
+from arch_texture_utils.resource_utils import cachePath
+
+MINUTES_PER_DAY = 24 * 60
+
+# '<table_key>': table of recently used locations
+sunPathCache = {}
+
+def sunPathKey(latitude, longitude, timezone, year):
+    parameters = (round(latitude, 4), round(longitude, 4), round(timezone, 2), year)
+
+    return hashlib.sha1(repr(parameters).encode('utf-8')).hexdigest()
+
+def calculateSunPath(latitude, longitude, timezone, year):
+    '''
+    Sun positions of a whole year at minute resolution, using the NOAA solar position equations.
+    Longitude is positive to the east, timezone is the offset to UTC in hours.
+    Returns a (days, 1440, 2) float32 array of (azimuth, elevation) in degrees.
+    The azimuth is measured clockwise from north.
+    '''
+    days = 366 if calendar.isleap(year) else 365
+
+    dayOfYear = numpy.arange(days, dtype=float)[:, numpy.newaxis]
+    minute = numpy.arange(MINUTES_PER_DAY, dtype=float)[numpy.newaxis, :]
+
+    # fractional year in radians, shape (days, minutes)
+    gamma = 2.0 * math.pi / days * (dayOfYear + (minute / 60.0 - timezone - 12.0) / 24.0)
+
+    equationOfTime = 229.18 * (0.000075 + 0.001868 * numpy.cos(gamma) - 0.032077 * numpy.sin(gamma)
+                               - 0.014615 * numpy.cos(2 * gamma) - 0.040849 * numpy.sin(2 * gamma))
+
+    declination = (0.006918 - 0.399912 * numpy.cos(gamma) + 0.070257 * numpy.sin(gamma)
+                   - 0.006758 * numpy.cos(2 * gamma) + 0.000907 * numpy.sin(2 * gamma)
+                   - 0.002697 * numpy.cos(3 * gamma) + 0.00148 * numpy.sin(3 * gamma))
+
+    trueSolarTime = minute + equationOfTime + 4.0 * longitude - 60.0 * timezone
+    hourAngle = numpy.radians(trueSolarTime / 4.0 - 180.0)
+
+    latitudeRadians = math.radians(latitude)
+
+    cosZenith = (math.sin(latitudeRadians) * numpy.sin(declination)
+                 + math.cos(latitudeRadians) * numpy.cos(declination) * numpy.cos(hourAngle))
+    elevation = 90.0 - numpy.degrees(numpy.arccos(numpy.clip(cosZenith, -1.0, 1.0)))
+
+    # measured from south, positive to the west
+    azimuth = numpy.degrees(numpy.arctan2(numpy.sin(hourAngle),
+                                          numpy.cos(hourAngle) * math.sin(latitudeRadians)
+                                          - numpy.tan(declination) * math.cos(latitudeRadians)))
+
+    return numpy.stack(((azimuth + 180.0) % 360.0, elevation), axis=-1).astype(numpy.float32)
+
+def sunPath(latitude, longitude, timezone, year):
+    '''Like calculateSunPath, but cached in memory and on disk by location and year'''
+    key = sunPathKey(latitude, longitude, timezone, year)
+
+    if key in sunPathCache:
+        return sunPathCache[key]
+
+    cacheFile = os.path.join(cachePath('sun_path'), key + '.npy')
+
+    if os.path.exists(cacheFile):
+        table = numpy.load(cacheFile)
+    else:
+        table = calculateSunPath(latitude, longitude, timezone, year)
+        numpy.save(cacheFile, table)
+
+    # A year takes a few megabytes, only keep the tables of some locations
+    if len(sunPathCache) > 4:
+        sunPathCache.clear()
+
+    sunPathCache[key] = table
+
+    return table
+
+def parseDateTime(date, time):
+    '''Parses a date like 2021-06-21 and a time like 14:30. Raises ValueError for invalid values.'''
+    return datetime.datetime.strptime('%s %s' % (date.strip(), time.strip()), '%Y-%m-%d %H:%M')
+
+def tableIndex(dateTime):
+    '''(day of the year, minute of the day) of a date in the sun path table'''
+    return (dateTime.timetuple().tm_yday - 1, dateTime.hour * 60 + dateTime.minute)
+
+def lightRotations(azimuth, elevation):
+    '''
+    Converts a sun position into the HorizontalRotation and VerticalRotation of a DirectionalLight.
+    The light turns around the Z axis first and is tilted around the X axis afterwards, see light.lightDirection.
+    A sun in the south gives a horizontal rotation of zero and a vertical rotation equal to the elevation.
+    '''
+    azimuthRadians = math.radians(azimuth)
+    elevationRadians = math.radians(elevation)
+
+    # The direction the light points to, from the sun to the ground
+    x = -math.sin(azimuthRadians) * math.cos(elevationRadians)
+    y = -math.cos(azimuthRadians) * math.cos(elevationRadians)
+    z = -math.sin(elevationRadians)
+
+    horizontalRotation = math.degrees(math.asin(max(-1.0, min(1.0, x))))
+    verticalRotation = math.degrees(math.atan2(-z, y))
+
+    return (horizontalRotation, verticalRotation)
+
+class SunStudy():
+    '''
+    Steps through the sun positions of a day and calls the callback with (horizontalRotation, verticalRotation, minute).
+    The positions are read from the sun path table, so no solar calculation is done while animating.
+    Only daylight positions are shown. The study starts again at sunrise after sunset.
+    '''
+    def __init__(self, table, dayOfYear, callback, stepMinutes=10, interval=100):
+        day = table[dayOfYear]
+        minutes = numpy.arange(0, MINUTES_PER_DAY, max(1, int(stepMinutes)))
+        minutes = minutes[day[minutes, 1] > 0]
+
+        self.positions = [(int(m),) + lightRotations(float(day[m, 0]), float(day[m, 1])) for m in minutes]
+        self.callback = callback
+        self.step = 0
+
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        if len(self.positions) > 0:
+            self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def isRunning(self):
+        return self.timer.isActive()
+
+    def tick(self):
+        minute, horizontalRotation, verticalRotation = self.positions[self.step]
+
+        self.step = (self.step + 1) % len(self.positions)
+
+        self.callback(horizontalRotation, verticalRotation, minute)
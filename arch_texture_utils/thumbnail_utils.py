@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+from arch_texture_utils.qtutils import QtCore, QtGui
+from arch_texture_utils.resource_utils import cachePath
+
+THUMBNAIL_SIZE = 48
+
+def thumbnailCacheFile(imagePath, size=THUMBNAIL_SIZE):
+    '''The cache file is keyed by path, modification time and file size. So a changed image gets a new thumbnail.'''
+    stat = os.stat(imagePath)
+    key = '%s|%s|%s|%s' % (imagePath, stat.st_mtime, stat.st_size, size)
+
+    return os.path.join(cachePath('thumbnails'), hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+
+def createThumbnail(imagePath, size=THUMBNAIL_SIZE):
+    '''Loads the thumbnail from the disk cache or creates it. Safe to call from a worker thread as it only uses QImage.'''
+    cacheFile = thumbnailCacheFile(imagePath, size)
+
+    if os.path.exists(cacheFile):
+        image = QtGui.QImage(cacheFile)
+
+        if not image.isNull():
+            return image
+
+    reader = QtGui.QImageReader(imagePath)
+    imageSize = reader.size()
+
+    if imageSize.isValid():
+        # Let the reader scale while decoding. This is much faster than decoding the full image for some formats
+        reader.setScaledSize(imageSize.scaled(size, size, QtCore.Qt.KeepAspectRatio))
+
+    image = reader.read()
+
+    if image.isNull():
+        return image
+
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    image.save(cacheFile, 'PNG')
+
+    return image
+
+def reducedImageFile(imagePath, size):
+    '''Returns a cached, downscaled copy of the image. Used for texture level of detail.'''
+    image = createThumbnail(imagePath, size)
+
+    if image.isNull():
+        return None
+
+    return thumbnailCacheFile(imagePath, size)
+
+def averageColor(imagePath, size=THUMBNAIL_SIZE):
+    '''The average color of the image as (r, g, b) tuple with values between 0 and 1'''
+    image = createThumbnail(imagePath, size)
+
+    if image.isNull():
+        return (1.0, 1.0, 1.0)
+
+    color = QtGui.QColor(image.scaled(1, 1, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation).pixel(0, 0))
+
+    return (color.redF(), color.greenF(), color.blueF())
+
+class ThumbnailSignals(QtCore.QObject):
+    finished = QtCore.Signal(str, QtGui.QImage)
+
+class ThumbnailJob(QtCore.QRunnable):
+    def __init__(self, imagePath, signals):
+        super().__init__()
+
+        self.imagePath = imagePath
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = createThumbnail(self.imagePath)
+        except Exception:
+            image = QtGui.QImage()
+
+        self.signals.finished.emit(self.imagePath, image)
+
+class ThumbnailCache(QtCore.QObject):
+    '''
+    Provides thumbnails for texture files. Thumbnails are created in a background thread.
+    thumbnail() returns None until the thumbnail is ready, then thumbnailLoaded is emitted with the image path.
+    '''
+    thumbnailLoaded = QtCore.Signal(str)
+
+    def __init__(self):
+        super().__init__()
+
+        self.thumbnails = {
+            # '<image_path>': QPixmap or None when the image could not be read
+        }
+        self.pending = set()
+
+        self.signals = ThumbnailSignals()
+        self.signals.finished.connect(self.onThumbnailCreated)
+
+    def thumbnail(self, imagePath):
+        if imagePath is None or imagePath == '':
+            return None
+
+        if imagePath in self.thumbnails:
+            return self.thumbnails[imagePath]
+
+        if imagePath not in self.pending and os.path.isfile(imagePath):
+            self.pending.add(imagePath)
+            QtCore.QThreadPool.globalInstance().start(ThumbnailJob(imagePath, self.signals))
+
+        return None
+
+    def onThumbnailCreated(self, imagePath, image):
+        self.pending.discard(imagePath)
+
+        if image.isNull():
+            self.thumbnails[imagePath] = None
+        else:
+            self.thumbnails[imagePath] = QtGui.QPixmap.fromImage(image)
+
+        self.thumbnailLoaded.emit(imagePath)
@@ -0,0 +1,49 @@
+import FreeCAD, FreeCADGui
+
+from arch_texture_utils.resource_utils import uiPath
+from arch_texture_utils.qtutils import QtWidgets
+
+# '<ui_file_name>': form class created from the ui file, or None when the ui file has to be parsed on every load
+formClasses = {}
+
+def findFormClass(name):
+    '''
+    Returns the form class for the given ui file. The class is created once per FreeCAD session by
+    FreeCADGui.PySideUic.loadUiType, so it uses the same Qt binding as FreeCAD itself.
+    Returns None when FreeCAD can't create form classes.
+    '''
+    if name in formClasses:
+        return formClasses[name]
+
+    formClass = None
+
+    try:
+        if hasattr(FreeCADGui.PySideUic, 'loadUiType'):
+            formClass = FreeCADGui.PySideUic.loadUiType(uiPath(name))[0]
+    except Exception as e:
+        FreeCAD.Console.PrintLog('Could not create a form class for %s: %s\n' % (name, e))
+
+    # Remember failures as well, so they are not retried on every open
+    formClasses[name] = formClass
+
+    return formClass
+
+def loadUi(name):
+    '''
+    Drop in replacement for FreeCADGui.PySideUic.loadUi.
+    Uses the cached form class when available and falls back to parsing the ui file otherwise.
+    '''
+    formClass = findFormClass(name)
+
+    if formClass is None:
+        return FreeCADGui.PySideUic.loadUi(uiPath(name))
+
+    form = formClass()
+    widget = QtWidgets.QDialog()
+    form.setupUi(widget)
+
+    # loadUi makes the child widgets available as attributes of the widget. Do the same here
+    for attributeName, value in vars(form).items():
+        setattr(widget, attributeName, value)
+
+    return widget
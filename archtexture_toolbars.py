@@ -1,6 +1,48 @@
 from collections import OrderedDict
+import importlib
+import sys
 import FreeCAD, FreeCADGui
 
+from arch_texture_utils.resource_utils import iconPath
+
+class LazyCommand:
+    '''
+    Lightweight stand in for a command that is registered with FreeCAD on workbench initialization.
+    The module implementing the command is only imported when the command is activated.
+    Until then IsActive uses the default check shared by all our commands, which needs an open document
+    unless needsDocument is False.
+    '''
+    def __init__(self, toolbarName, commandName, moduleName, className, resources, needsDocument=True):
+        self.toolbarName = toolbarName
+        self.commandName = commandName
+        self.moduleName = moduleName
+        self.className = className
+        self.resources = resources
+        self.needsDocument = needsDocument
+        self.command = None
+
+    def GetResources(self):
+        resources = dict(self.resources)
+        resources['Pixmap'] = iconPath(resources['Pixmap'])
+
+        return resources
+
+    def Activated(self):
+        self.loadCommand().Activated()
+
+    def IsActive(self):
+        if self.command is None and self.moduleName not in sys.modules:
+            return not self.needsDocument or not FreeCAD.ActiveDocument is None
+
+        return self.loadCommand().IsActive()
+
+    def loadCommand(self):
+        if self.command is None:
+            module = importlib.import_module(self.moduleName)
+            self.command = getattr(module, self.className)()
+
+        return self.command
+
 class ArchTextureToolbarManager:
     Toolbars =  OrderedDict()
 
@@ -8,12 +50,59 @@ class ArchTextureToolbarManager:
         FreeCADGui.addCommand(command.commandName, command)
         self.Toolbars.setdefault(command.toolbarName, []).append(command)
 
+    def registerLazyCommand(self, toolbarName, commandName, moduleName, className, resources, needsDocument=True):
+        self.registerCommand(LazyCommand(toolbarName, commandName, moduleName, className, resources, needsDocument))
+
 toolbarManager = ArchTextureToolbarManager()
 
-# import commands here
-import create_config
-import at_export_config
-import at_import_config
-import at_configure_faces
-import at_create_environment_config
-import create_light
\ No newline at end of file
+# register commands here
+toolbarManager.registerLazyCommand('ArchTexture_Tools', 'Create_Config', 'create_config', 'CreateTextureConfigCommand', {
+    'MenuText': "Create Texture Config",
+    'ToolTip' : "Create a new TextureConfig object to store Textures",
+    'Pixmap': 'CreateConfig.svg'
+})
+toolbarManager.registerLazyCommand('ArchTexture_Tools', 'Export_Config', 'at_export_config', 'ExportTextureConfigCommand', {
+    'MenuText': "Export Texture Config",
+    'ToolTip' : "Exports the configuration stored inside a TextureConfig object to a file",
+    'Pixmap': 'ExportConfig.svg'
+})
+toolbarManager.registerLazyCommand('ArchTexture_Tools', 'Import_Config', 'at_import_config', 'ImportTextureConfigCommand', {
+    'MenuText': "Import Texture Config",
+    'ToolTip' : "Import a new TextureConfig object from a JSOn File",
+    'Pixmap': 'ImportConfig.svg'
+})
+toolbarManager.registerLazyCommand('ArchTexture_Tools', 'Configure_Faces', 'at_configure_faces', 'ConfigureFacesCommand', {
+    'MenuText': "Configure Faces",
+    'ToolTip' : "Override default mapping parameters for individual faces",
+    'Pixmap': 'ConfigureFaces.svg'
+})
+toolbarManager.registerLazyCommand('ArchTexture_Tools', 'Add_Texture_Library_Directory', 'at_texture_library', 'AddTextureLibraryDirectoryCommand', {
+    'MenuText': "Add Texture Library Directory",
+    'ToolTip' : "Add a directory containing textures to the texture library and scan it",
+    'Pixmap': 'AddTextureLibraryDirectory.svg'
+}, needsDocument=False)
+toolbarManager.registerLazyCommand('ArchTexture_Tools', 'Rescan_Texture_Library', 'at_texture_library', 'RescanTextureLibraryCommand', {
+    'MenuText': "Rescan Texture Library",
+    'ToolTip' : "Scan the texture library directories for new, changed and removed textures",
+    'Pixmap': 'RescanTextureLibrary.svg'
+}, needsDocument=False)
+toolbarManager.registerLazyCommand('ArchTexture_Environment_Tools', 'Create_Environment_Config', 'at_create_environment_config', 'CreateEnvironmentConfigCommand', {
+    'MenuText': "Create Environment Config",
+    'ToolTip' : "Create a new EnvironmentConfig object to store environment textures",
+    'Pixmap': 'CreateEnvironmentConfig.svg'
+})
+toolbarManager.registerLazyCommand('Light_Tools', 'Create_PointLight', 'create_light', 'CreatePointLightCommand', {
+    'MenuText': "Create Pointlight",
+    'ToolTip' : "Create a new point light in the scene",
+    'Pixmap': 'CreatePointLight.svg'
+})
+toolbarManager.registerLazyCommand('Light_Tools', 'Create_DirectionalLight', 'create_light', 'CreateDirectionalLightCommand', {
+    'MenuText': "Create Directionallight",
+    'ToolTip' : "Create a new Directional light in the scene",
+    'Pixmap': 'CreateDirectionalLight.svg'
+})
+toolbarManager.registerLazyCommand('Light_Tools', 'Toggle_Shadows', 'create_light', 'ToggleShadowsCommand', {
+    'MenuText': "Toggle Shadows",
+    'ToolTip' : "Switch the shadows of all lights on or off",
+    'Pixmap': 'ToggleShadows.svg'
+})
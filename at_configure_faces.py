@@ -1,69 +1,62 @@
 import FreeCAD, FreeCADGui
 
-from arch_texture_utils.resource_utils import iconPath, uiPath
+from arch_texture_utils.ui_utils import loadUi
 import arch_texture_utils.qtutils as qtutils
 from arch_texture_utils.selection_utils import findSelectedTextureConfig, findSelectedFacesAsVectors
-from arch_texture_utils.faceset_utils import vectorListEquals
 
 class FaceConfigPanel():
     def __init__(self, textureConfig, freecadObject):
         self.textureConfig = textureConfig
         self.freecadObject = freecadObject
-        self.faceOverrides = textureConfig.textureManager.ensureFaceOverrides()
+        self.textureManager = textureConfig.textureManager
 
-        self.form = FreeCADGui.PySideUic.loadUi(uiPath('face_config.ui'))
+        self.form = loadUi('face_config.ui')
         self.rotationBox = self.form.RotationBox
+        self.offsetBox = self.form.OffsetBox
 
         self.form.ApplyButton.clicked.connect(self.apply)
+        self.form.ClearButton.clicked.connect(self.clear)
 
     def apply(self):
+        selectedFaces = self.findSelectedFaces()
+
+        if selectedFaces is None:
+            return
+
+        if self.offsetBox.isChecked():
+            objectNames = self.textureManager.updateFaceOverrides(selectedFaces, rotationOffset=self.rotationBox.value())
+        else:
+            objectNames = self.textureManager.updateFaceOverrides(selectedFaces, rotation=self.rotationBox.value())
+
+        self.textureConfig.retextureObjects(objectNames)
+
+    def clear(self):
+        selectedFaces = self.findSelectedFaces()
+
+        if selectedFaces is None:
+            return
+
+        objectNames = self.textureManager.clearFaceOverrides(selectedFaces)
+
+        self.textureConfig.retextureObjects(objectNames)
+
+    def findSelectedFaces(self):
         selectedFaces = findSelectedFacesAsVectors()
 
         if len(selectedFaces) == 0:
             qtutils.showInfo("No Face selected", "Select at least one face to apply the configuration")
-        else:
-            for objectName, vectors in selectedFaces:
-                faceOverride = self.ensureOverrideForFace(objectName, vectors)
-                
-                faceOverride['rotation'] = self.rotationBox.value()
-        
-        self.textureConfig.execute(self.freecadObject)
+
+            return None
+
+        return selectedFaces
     
     def reject(self):
         FreeCADGui.Control.closeDialog()
     
     def getStandardButtons(self):
         return int(qtutils.QDialogButtonBox.Close)
-    
-    def ensureOverrideForFace(self, objectName, vectors):
-        existingOverride = None
-
-        for override in self.faceOverrides:
-            if override['objectName'] == objectName and vectorListEquals(override['vertices'], vectors):
-                existingOverride = override
-
-                break
-        
-        if existingOverride is None:
-            existingOverride = {
-                'vertices': vectors,
-                'objectName': objectName
-            }
-
-            self.faceOverrides.append(existingOverride)
-        
-        return existingOverride
 
 class ConfigureFacesCommand:
-    toolbarName = 'ArchTexture_Tools'
-    commandName = 'Configure_Faces'
-
-    def GetResources(self):
-        return {'MenuText': "Configure Faces",
-                'ToolTip' : "Override default mapping parameters for individual faces",
-                'Pixmap': iconPath('ConfigureFaces.svg')
-                }
-
     def Activated(self):
         textureConfig = findSelectedTextureConfig(returnFreeCadObject=True)
 
@@ -85,7 +78,4 @@ if __name__ == "__main__":
     if command.IsActive():
         command.Activated()
     else:
-        qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(ConfigureFacesCommand()) 
\ No newline at end of file
+        qtutils.showInfo("No open Document", "There is no open document")
\ No newline at end of file
@@ -1,19 +1,9 @@
 import FreeCAD, FreeCADGui
 
-from arch_texture_utils.resource_utils import iconPath
 import arch_texture_utils.qtutils as qtutils
 from arch_texture_utils.selection_utils import findSelectedTextureConfig
 
 class ExportTextureConfigCommand:
-    toolbarName = 'ArchTexture_Tools'
-    commandName = 'Export_Config'
-
-    def GetResources(self):
-        return {'MenuText': "Export Texture Config",
-                'ToolTip' : "Exports the configuration stored inside a TextureConfig object to a file",
-                'Pixmap': iconPath('ExportConfig.svg')
-                }
-
     def Activated(self):
         textureConfig = findSelectedTextureConfig()
 
@@ -41,7 +31,4 @@ if __name__ == "__main__":
     if command.IsActive():
         command.Activated()
     else:
-        qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(ExportTextureConfigCommand()) 
\ No newline at end of file
+        qtutils.showInfo("No open Document", "There is no open document")
\ No newline at end of file
@@ -0,0 +1,50 @@
+import FreeCAD
+
+import arch_texture_utils.qtutils as qtutils
+from arch_texture_utils.qtutils import QtCore, QtWidgets
+import texture_library
+
+def rescan():
+    QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+
+    try:
+        summary = texture_library.rescanLibrary()
+    finally:
+        QtWidgets.QApplication.restoreOverrideCursor()
+
+    FreeCAD.Console.PrintMessage(summary + '\n')
+    qtutils.showInfo("Texture Library", summary)
+
+def addDirectory():
+    '''Lets the user pick a new library root. Returns False when the dialog was cancelled.'''
+    directory = qtutils.userSelectedDirectory('Texture Library Directory')
+
+    if directory is None:
+        return False
+
+    texture_library.addConfiguredRoot(directory)
+
+    return True
+
+class AddTextureLibraryDirectoryCommand:
+    def Activated(self):
+        if addDirectory():
+            rescan()
+
+    def IsActive(self):
+        """The library does not depend on a document."""
+        return True
+
+class RescanTextureLibraryCommand:
+    def Activated(self):
+        if len(texture_library.configuredRoots()) == 0 and not addDirectory():
+            return
+
+        rescan()
+
+    def IsActive(self):
+        """The library does not depend on a document."""
+        return True
+
+if __name__ == "__main__":
+    RescanTextureLibraryCommand().Activated()
@@ -1,21 +1,10 @@
 import FreeCAD, FreeCADGui
 
-import texture_config
-from arch_texture_utils.resource_utils import iconPath
-
 import point_light
 import directional_light
+from arch_texture_utils.light_manager import getLightManager, shadowsEnabled, shadowsSupported
 
 class CreatePointLightCommand:
-    toolbarName = 'Light_Tools'
-    commandName = 'Create_PointLight'
-
-    def GetResources(self):
-        return {'MenuText': "Create Pointlight",
-                'ToolTip' : "Create a new point light in the scene",
-                'Pixmap': iconPath('CreatePointLight.svg')
-                }
-
     def Activated(self):
         point_light.createPointLight()
 
@@ -24,15 +13,6 @@ class CreatePointLightCommand:
         return not FreeCAD.ActiveDocument is None
 
 class CreateDirectionalLightCommand:
-    toolbarName = 'Light_Tools'
-    commandName = 'Create_DirectionalLight'
-
-    def GetResources(self):
-        return {'MenuText': "Create Directionallight",
-                'ToolTip' : "Create a new Directional light in the scene",
-                'Pixmap': iconPath('CreateDirectionalLight.svg')
-                }
-
     def Activated(self):
         directional_light.createDirectionalLight()
 
@@ -40,6 +20,14 @@ class CreateDirectionalLightCommand:
         """If there is no active document we can't do anything."""
         return not FreeCAD.ActiveDocument is None
 
+class ToggleShadowsCommand:
+    def Activated(self):
+        getLightManager().setShadows(not shadowsEnabled())
+
+    def IsActive(self):
+        """Shadows need a document and a coin version with shadow support."""
+        return not FreeCAD.ActiveDocument is None and shadowsSupported()
+
 
 if __name__ == "__main__":
     command = CreatePointLightCommand();
@@ -48,8 +36,4 @@ if __name__ == "__main__":
         command.Activated()
     else:
         import arch_texture_utils.qtutils as qtutils
-        qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(CreatePointLightCommand())
-    archtexture_toolbars.toolbarManager.registerCommand(CreateDirectionalLightCommand())
\ No newline at end of file
+        qtutils.showInfo("No open Document", "There is no open document")
\ No newline at end of file
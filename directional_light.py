@@ -1,8 +1,11 @@
+import datetime
+
 import FreeCAD
 import FreeCADGui
 from pivy import coin
 
 import light
+import arch_texture_utils.solar_utils as solar_utils
 from arch_texture_utils.resource_utils import iconPath
 
 class DirectionalLight(light.Light):
@@ -21,14 +24,136 @@ class DirectionalLight(light.Light):
         if not 'VerticalRotation' in pl:
             obj.addProperty("App::PropertyAngle", "VerticalRotation", "Light", 
                             "The up and downward rotation").VerticalRotation = 45
-                            
+
+        if not 'SolarPosition' in pl:
+            obj.addProperty("App::PropertyBool", "SolarPosition", "Sun",
+                            "Calculate the rotations from the position of the sun at the given location, date and time").SolarPosition = False
+
+        if not 'Latitude' in pl:
+            obj.addProperty("App::PropertyFloatConstraint", "Latitude", "Sun",
+                            "The latitude of the site in degrees, positive to the north").Latitude = (0.0, -90.0, 90.0, 0.1)
+
+        if not 'Longitude' in pl:
+            obj.addProperty("App::PropertyFloatConstraint", "Longitude", "Sun",
+                            "The longitude of the site in degrees, positive to the east").Longitude = (0.0, -180.0, 180.0, 0.1)
+
+        if not 'TimeZone' in pl:
+            obj.addProperty("App::PropertyFloatConstraint", "TimeZone", "Sun",
+                            "The offset of the local time to UTC in hours").TimeZone = (0.0, -12.0, 14.0, 0.5)
+
+        if not 'Date' in pl:
+            obj.addProperty("App::PropertyString", "Date", "Sun",
+                            "The date as YYYY-MM-DD").Date = '%s-06-21' % (datetime.date.today().year,)
+
+        if not 'Time' in pl:
+            obj.addProperty("App::PropertyString", "Time", "Sun",
+                            "The local time as HH:MM").Time = '12:00'
+
         self.type = 'DirectionalLight'
+
+    def execute(self, obj):
+        if getattr(obj, 'SolarPosition', False):
+            self.updateSolarPosition(obj)
+
+    def updateSolarPosition(self, obj):
+        '''Sets the rotations from the precalculated sun path of the location'''
+        try:
+            dateTime = solar_utils.parseDateTime(obj.Date, obj.Time)
+        except ValueError:
+            FreeCAD.Console.PrintWarning('%s: Invalid date "%s" or time "%s"\n' % (obj.Label, obj.Date, obj.Time))
+            return
+
+        table = solar_utils.sunPath(obj.Latitude, obj.Longitude, obj.TimeZone, dateTime.year)
+        dayOfYear, minute = solar_utils.tableIndex(dateTime)
+        azimuth, elevation = table[dayOfYear, minute]
+
+        if elevation < 0:
+            FreeCAD.Console.PrintLog('%s: The sun is below the horizon at %s\n' % (obj.Label, dateTime))
+
+        horizontalRotation, verticalRotation = solar_utils.lightRotations(float(azimuth), float(elevation))
+
+        # Only touch the properties when the position changed, every change updates the 3D view
+        if abs(obj.HorizontalRotation.Value - horizontalRotation) > 1e-4:
+            obj.HorizontalRotation = horizontalRotation
+
+        if abs(obj.VerticalRotation.Value - verticalRotation) > 1e-4:
+            obj.VerticalRotation = verticalRotation
     
 class ViewProviderDirectionalLight(light.ViewProviderLight):
     def __init__(self, vobj):
         super().__init__(vobj)
 
-    def createLightInstance(self):
+        self.sunStudy = None
+
+    def setProperties(self, vobj):
+        super().setProperties(vobj)
+
+        pl = vobj.PropertiesList
+
+        if not 'SunStudy' in pl:
+            vobj.addProperty("App::PropertyBool", "SunStudy", "Sun",
+                            "Animates the light through the day of the Date. Needs SolarPosition").SunStudy = False
+
+        if not 'SunStudyStep' in pl:
+            vobj.addProperty("App::PropertyIntegerConstraint", "SunStudyStep", "Sun",
+                            "The minutes between two frames of the sun study").SunStudyStep = (10, 1, 120, 1)
+
+    def onChanged(self, vp, prop):
+        super().onChanged(vp, prop)
+
+        if prop in ['SunStudy', 'SunStudyStep']:
+            self.updateSunStudy()
+
+    def updateData(self, fp, prop):
+        super().updateData(fp, prop)
+
+        if prop in ['SolarPosition', 'Latitude', 'Longitude', 'TimeZone', 'Date']:
+            self.updateSunStudy()
+
+    def updateSunStudy(self):
+        '''Starts or stops the sun study. The study only changes the 3D view, the rotations of the object are left as they are.'''
+        if not hasattr(self, 'Object'):
+            # not attached yet
+            return
+
+        self.stopSunStudy()
+
+        if not getattr(self.ViewObject, 'SunStudy', False) or not getattr(self.Object, 'SolarPosition', False):
+            return
+
+        try:
+            dateTime = solar_utils.parseDateTime(self.Object.Date, self.Object.Time)
+        except ValueError:
+            return
+
+        table = solar_utils.sunPath(self.Object.Latitude, self.Object.Longitude, self.Object.TimeZone, dateTime.year)
+        dayOfYear = solar_utils.tableIndex(dateTime)[0]
+
+        self.sunStudy = solar_utils.SunStudy(table, dayOfYear, self.onSunStudyStep, self.ViewObject.SunStudyStep)
+        self.sunStudy.start()
+
+    def stopSunStudy(self):
+        if getattr(self, 'sunStudy', None) is not None:
+            self.sunStudy.stop()
+            self.sunStudy = None
+
+            # back to the rotations of the object
+            self.updateDirection()
+
+    def onSunStudyStep(self, horizontalRotation, verticalRotation, minute):
+        self.updateDirection(horizontalRotation, verticalRotation)
+
+        FreeCADGui.getMainWindow().statusBar().showMessage('%s: %02d:%02d' % (self.Object.Label, minute // 60, minute % 60), 1000)
+
+    def onDelete(self, vobj, subelements):
+        self.stopSunStudy()
+
+        return super().onDelete(vobj, subelements)
+
+    def createLightInstance(self, shadows=False):
+        if shadows:
+            return coin.SoShadowDirectionalLight()
+
         return coin.SoDirectionalLight()
     
     def createGeometry(self):
@@ -3,13 +3,37 @@ import FreeCADGui
 from pivy import coin
 import math
 import arch_texture_utils.py2_utils as py2_utils
-
-GEOMETRY_COORDINATES = ['Radius', 'Length', 'Height']
-TRANSFORM_PARAMETERS = ['ZOffset', 'Rotation']
+import arch_texture_utils.environment_geometry as environment_geometry
+import arch_texture_utils.cubemap_utils as cubemap_utils
+import arch_texture_utils.panorama_tiles as panorama_tiles
+import arch_texture_utils.sky_utils as sky_utils
+from arch_texture_utils.light_manager import noShadowStyle
+import light
+import arch_texture_utils.camera_utils as camera_utils
+from arch_texture_utils.qtutils import QtCore
+
+GEOMETRY_COORDINATES = ['Radius', 'Length', 'Height', 'PanoramaType', 'PanoramaSegments']
+GROUND_PARAMETERS = ['GroundRealSize', 'GroundDetailRealSize', 'GroundDetailDistance']
+SKY_PARAMETERS = ['SkyType', 'ZenithColor', 'HorizonColor', 'Haze', 'SunDirection', 'SkyResolution']
+TRANSFORM_PARAMETERS = ['ZOffset', 'Rotation', 'PanoramaType']
 ROTATION_VECTOR = coin.SbVec3f(0, 0, -1)
 
 PANORAMA_TYPE_THIRDS = 'Thirds'
 PANORAMA_TYPE_360 = '360'
+PANORAMA_TYPE_CUBEMAP = 'CubeMap'
+PANORAMA_TYPES = [PANORAMA_TYPE_THIRDS, PANORAMA_TYPE_360, PANORAMA_TYPE_CUBEMAP]
+
+SKY_TYPE_IMAGE = 'Image'
+SKY_TYPE_PROCEDURAL = 'Procedural'
+
+PANORAMA_PRESETS = {
+    # Every segment shows one third of the image
+    PANORAMA_TYPE_THIRDS: {'segments': 3, '360': False},
+    # Segments along the visible part of a 360 degrees image
+    PANORAMA_TYPE_360: {'segments': 24, '360': True},
+    # The 360 degrees image is reprojected onto a box around the camera. The segments are unused
+    PANORAMA_TYPE_CUBEMAP: {'segments': 24, '360': True}
+}
 
 
 def noTexture(image):
@@ -35,6 +59,12 @@ def removeNode(parent, node):
         parent.removeChild(node)
 
 
+def clearTexture(texture):
+    '''Releases the image data of the texture'''
+    texture.filename = ''
+    texture.image.setValue(coin.SbVec2s(0, 0), 0, None)
+
+
 class EnvironmentConfig():
     def __init__(self, obj):
         obj.Proxy = self
@@ -70,18 +100,103 @@ class EnvironmentConfig():
         if not 'PanoramaType' in pl:
             obj.addProperty("App::PropertyEnumeration", "PanoramaType",
                             "Geometry", "The type of panorama to display")
-            obj.PanoramaType = [PANORAMA_TYPE_THIRDS, PANORAMA_TYPE_360]
+            obj.PanoramaType = PANORAMA_TYPES
             obj.PanoramaType = PANORAMA_TYPE_THIRDS
+        elif PANORAMA_TYPE_CUBEMAP not in obj.getEnumerationsOfProperty('PanoramaType'):
+            # Documents created before the cube map was available
+            panoramaType = obj.PanoramaType
+            obj.PanoramaType = PANORAMA_TYPES
+            obj.PanoramaType = panoramaType
+
+        if not 'CubeMapSize' in pl:
+            obj.addProperty("App::PropertyInteger", "CubeMapSize", "Texture",
+                            "The size in pixels of every face of the cube map").CubeMapSize = cubemap_utils.DEFAULT_FACE_SIZE
+
+        if not 'PanoramaSegments' in pl:
+            obj.addProperty("App::PropertyInteger", "PanoramaSegments", "Geometry",
+                            "The number of segments of the panorama and sky. 0 uses the default of the panorama type").PanoramaSegments = 0
+
+        if not 'TiledPanorama' in pl:
+            obj.addProperty("App::PropertyBool", "TiledPanorama", "Performance",
+                            "Split large panorama images into tiles and only load the tiles facing the camera").TiledPanorama = False
+
+        if not 'TileMemoryBudget' in pl:
+            obj.addProperty("App::PropertyInteger", "TileMemoryBudget", "Performance",
+                            "Megabytes of panorama tiles to keep loaded when they are not facing the camera").TileMemoryBudget = panorama_tiles.DEFAULT_MEMORY_BUDGET
+
+        if not 'GroundRealSize' in pl:
+            obj.addProperty("App::PropertyLength", "GroundRealSize", "Texture",
+                            "The size of the ground image in reality. The image is repeated across the ground. 0 stretches the image across the whole ground").GroundRealSize = 0
+
+        if not 'GroundDetailImage' in pl:
+            obj.addProperty("App::PropertyFile", "GroundDetailImage", "Texture",
+                            "A tileable image shown on the ground near the origin, fading out with the distance").GroundDetailImage = ''
+
+        if not 'GroundDetailRealSize' in pl:
+            obj.addProperty("App::PropertyLength", "GroundDetailRealSize", "Texture",
+                            "The size of the ground detail image in reality").GroundDetailRealSize = 1000
+
+        if not 'GroundDetailDistance' in pl:
+            obj.addProperty("App::PropertyLength", "GroundDetailDistance", "Texture",
+                            "The distance from the origin where the ground detail image is faded out").GroundDetailDistance = 20000
+
+        if not 'ReleaseDelay' in pl:
+            obj.addProperty("App::PropertyInteger", "ReleaseDelay", "Performance",
+                            "Seconds after hiding the environment until its images are released from memory").ReleaseDelay = 30
 
         if not 'SkyImage' in pl:
             obj.addProperty("App::PropertyFile", "SkyImage", "Texture",
                             "The image of the sky to show as environment texture").SkyImage = ''
+
+        if not 'SkyType' in pl:
+            obj.addProperty("App::PropertyEnumeration", "SkyType", "Sky",
+                            "Show the SkyImage or generate the sky from the colors below")
+            obj.SkyType = [SKY_TYPE_IMAGE, SKY_TYPE_PROCEDURAL]
+            obj.SkyType = SKY_TYPE_IMAGE
+
+        if not 'ZenithColor' in pl:
+            obj.addProperty("App::PropertyColor", "ZenithColor", "Sky",
+                            "The color of the procedural sky straight above").ZenithColor = (0.17, 0.38, 0.75)
+
+        if not 'HorizonColor' in pl:
+            obj.addProperty("App::PropertyColor", "HorizonColor", "Sky",
+                            "The color of the procedural sky at the horizon").HorizonColor = (0.75, 0.85, 0.95)
+
+        if not 'Haze' in pl:
+            obj.addProperty("App::PropertyFloatConstraint", "Haze", "Sky",
+                            "Spreads the horizon color and the sun glow of the procedural sky").Haze = (0.3, 0.0, 1.0, 0.05)
+
+        if not 'SunLight' in pl:
+            obj.addProperty("App::PropertyLink", "SunLight", "Sky",
+                            "A DirectionalLight that defines the position of the sun in the procedural sky")
+
+        if not 'SkyResolution' in pl:
+            obj.addProperty("App::PropertyInteger", "SkyResolution", "Sky",
+                            "The height in pixels of the procedural sky. The width is twice the height").SkyResolution = sky_utils.DEFAULT_RESOLUTION
+
+        if not 'SunDirection' in pl:
+            obj.addProperty("App::PropertyVector", "SunDirection", "Sky",
+                            "The direction towards the sun, calculated from the SunLight")
+            obj.setEditorMode('SunDirection', 2)
         if not 'GroundImage' in pl:
             obj.addProperty("App::PropertyFile", "GroundImage", "Texture",
                             "The image of the ground to show as environment texture").GroundImage = ''
 
     def execute(self, fp):
-        pass
+        self.updateSunDirection(fp)
+
+    def updateSunDirection(self, fp):
+        '''The sun sits opposite of the direction the light points to. Recomputed whenever the linked light changes.'''
+        sunLight = getattr(fp, 'SunLight', None)
+
+        if sunLight is not None and hasattr(sunLight, 'HorizontalRotation') and hasattr(sunLight, 'VerticalRotation'):
+            direction, rotation = light.lightDirection(sunLight.HorizontalRotation, sunLight.VerticalRotation)
+            sunDirection = direction.negative()
+        else:
+            sunDirection = FreeCAD.Vector(0, 0, 0)
+
+        if not fp.SunDirection.isEqual(sunDirection, 1e-6):
+            fp.SunDirection = sunDirection
 
     def onDocumentRestored(self, obj):
         self.setProperties(obj)
@@ -97,39 +212,226 @@ class ViewProviderEnvironmentConfig():
 
         self.transformNode = coin.SoTransform()
 
+        # Meshes that have to be rebuilt on the next event loop iteration. See scheduleUpdate
+        self.pendingUpdates = set()
+        self.updateTimer = QtCore.QTimer()
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(0)
+        self.updateTimer.timeout.connect(self.flushUpdates)
+
         self.coinNode = coin.SoSeparator()
+
+        # The environment is far away and would only waste the resolution of the shadow maps
+        shadowStyle = noShadowStyle()
+
+        if shadowStyle is not None:
+            self.coinNode.addChild(shadowStyle)
+
         self.coinNode.addChild(self.transformNode)
 
         self.panoramaNode = self.setupPanoramaNode()
         self.skyNode = self.setupSkyNode()
         self.groundNode = self.setupGroundNode()
+        self.groundDetailNode = self.setupGroundDetailNode()
+        self.cubeMapNode = self.setupCubeMapNode()
+        self.panoramaTilesNode = coin.SoSeparator()
+
+        # (image, size) of the cube map that is shown or currently created
+        self.cubeMapKey = None
+        self.cubeMapSignals = cubemap_utils.CubeMapSignals()
+        self.cubeMapSignals.finished.connect(self.onCubeMapCreated)
+
+        # image of the tiles that are shown or currently created
+        self.tilesImage = None
+        # (grid, tile files) of the tiled panorama image
+        self.panoramaTiles = None
+        # (row, column) -> (texture, bound box, size in bytes, tile file) of the tiles in the scene graph
+        self.tileNodes = {}
+        self.tileBudget = panorama_tiles.TileBudget(0)
+        self.tileSignals = panorama_tiles.TileSignals()
+        self.tileSignals.finished.connect(self.onTilesCreated)
+        self.tileCameraWatcher = camera_utils.CameraWatcher(self.updateVisibleTiles)
 
         self.updatePanoramaCoordinates()
-        self.updatePanoramaTextureCoordinates()
         self.updateSkyCoordinates()
         self.updateGroundCoordinates()
+        self.updateGroundDetailCoordinates()
+        self.updateCubeMapCoordinates()
+
+        # Images are only loaded while the environment is visible. See loadImages and releaseImages
+        self.imagesLoaded = False
+        self.releaseTimer = QtCore.QTimer()
+        self.releaseTimer.setSingleShot(True)
+        self.releaseTimer.timeout.connect(self.releaseImages)
 
         self.updateTransformNode()
         self.updateNodeVisibility()
 
+        # The visibility of restored documents is not known yet. Decide on the next event loop iteration
+        self.scheduleUpdate('images')
+
         vobj.addDisplayMode(self.coinNode, "Standard")
 
+    def isCubeMap(self):
+        return self.Object.PanoramaType == PANORAMA_TYPE_CUBEMAP
+
+    def updatePanoramaTexture(self):
+        '''Cube maps and tiled panoramas never show the full image, so it is not loaded at all'''
+        if self.isCubeMap() or self.isTiled():
+            clearTexture(self.panoramaTexture)
+        else:
+            self.updateTexture(self.panoramaTexture, self.Object.PanoramaImage)
+
+    def isProceduralSky(self):
+        return getattr(self.Object, 'SkyType', SKY_TYPE_IMAGE) == SKY_TYPE_PROCEDURAL
+
+    def updateSkyTexture(self):
+        if self.isProceduralSky():
+            self.updateProceduralSky()
+        else:
+            self.updateTexture(self.skyTexture, self.Object.SkyImage)
+
+    def updateProceduralSky(self):
+        '''
+        Generates the sky for the full circle around the origin and writes it directly into the image field of the sky texture.
+        The image does not depend on the rotation and the arc of the environment, see updateSkyTextureTransform.
+        '''
+        if not self.imagesLoaded or not self.isProceduralSky():
+            return
+
+        profileRadius, profileZ, t = environment_geometry.skyProfile(
+            self.Object.Radius.Value + environment_geometry.SKY_OFFSET, self.Object.Height.Value, self.Object.SkyOverlap.Value)
+
+        sun = self.Object.SunDirection
+        sunDirection = (sun.x, sun.y, sun.z) if sun.Length > 0 else None
+
+        height = max(2, self.Object.SkyResolution)
+        width = height * 4
+
+        pixels = sky_utils.proceduralSky(width, height, self.Object.ZenithColor[:3], self.Object.HorizonColor[:3],
+                                         sunDirection, self.Object.Haze, 0.0, 2.0 * math.pi, float(t[1]))
+
+        self.skyTexture.filename = ''
+        self.skyTexture.image.setValue(coin.SbVec2s(width, height), 3, pixels.tobytes())
+
+    def updateSkyTextureTransform(self):
+        '''
+        The procedural sky covers the full circle in global directions. The transform maps the arc of the sky to its part
+        of the image, so rotating the environment moves the sky along the image instead of generating a new image.
+        '''
+        if not self.isProceduralSky():
+            self.skyTextureTransform.scaleFactor.setValue(1, 1)
+            self.skyTextureTransform.translation.setValue(0, 0)
+
+            return
+
+        angles = environment_geometry.arcAngles(self.Object.Radius.Value, self.Object.Length.Value, self.segmentCount())
+        # The transform node rotates around the negative z axis
+        rotation = math.radians(self.Object.Rotation.Value)
+
+        self.skyTextureTransform.scaleFactor.setValue(float(angles[-1] - angles[0]) / (2.0 * math.pi), 1)
+        self.skyTextureTransform.translation.setValue(float(angles[0] - rotation) / (2.0 * math.pi), 0)
+
+    def updateTexture(self, texture, image):
+        if self.imagesLoaded:
+            texture.filename = py2_utils.textureFileString(image)
+
+    def loadImages(self):
+        self.releaseTimer.stop()
+
+        if self.imagesLoaded:
+            return
+
+        self.imagesLoaded = True
+
+        self.updatePanoramaTexture()
+        self.updateSkyTexture()
+        self.updateTexture(self.groundTexture, self.Object.GroundImage)
+        self.updateTexture(self.groundDetailTexture, getattr(self.Object, 'GroundDetailImage', ''))
+        self.updateNodeVisibility()
+
+    def releaseImages(self):
+        self.imagesLoaded = False
+
+        for texture in [self.panoramaTexture, self.skyTexture, self.groundTexture, self.groundDetailTexture] + [face[1] for face in self.cubeMapFaces.values()]:
+            clearTexture(texture)
+
+        # Cube maps and tiles are read from the disk cache the next time
+        self.cubeMapKey = None
+        self.tilesImage = None
+        self.panoramaTiles = None
+        self.updatePanoramaTiles()
+
+        self.updateNodeVisibility()
+
+    def updateImageLoading(self):
+        '''Loads the images when the environment gets visible. Hidden environments release them after the ReleaseDelay.'''
+        if self.ViewObject.Visibility:
+            self.loadImages()
+        elif self.imagesLoaded and not self.releaseTimer.isActive():
+            self.releaseTimer.start(max(0, getattr(self.Object, 'ReleaseDelay', 30)) * 1000)
+
     def updateNodeVisibility(self):
+        if not self.imagesLoaded:
+            for node in (self.panoramaNode, self.skyNode, self.groundNode, self.groundDetailNode, self.cubeMapNode, self.panoramaTilesNode):
+                removeNode(self.coinNode, node)
+
+            self.releaseTiles()
+
+            return
+
+        if self.isCubeMap():
+            # The cube map contains the sky and the ground as well
+            removeNode(self.coinNode, self.panoramaNode)
+            removeNode(self.coinNode, self.skyNode)
+            removeNode(self.coinNode, self.groundNode)
+            removeNode(self.coinNode, self.groundDetailNode)
+
+            if noTexture(self.Object.PanoramaImage):
+                removeNode(self.coinNode, self.cubeMapNode)
+            else:
+                self.requestCubeMap()
+
+                if not containsNode(self.coinNode, self.cubeMapNode):
+                    # Before the transform node, as the box is centered at the camera and not at the origin.
+                    # After the shadow style, so the box never blocks the lights
+                    self.coinNode.insertChild(self.cubeMapNode, self.coinNode.findChild(self.transformNode))
+
+            return
+
+        removeNode(self.coinNode, self.cubeMapNode)
+
         if noTexture(self.Object.PanoramaImage):
             removeNode(self.coinNode, self.panoramaNode)
+            removeNode(self.coinNode, self.panoramaTilesNode)
+            self.releaseTiles()
+        elif self.isTiled():
+            removeNode(self.coinNode, self.panoramaNode)
+            addNode(self.coinNode, self.panoramaTilesNode)
+            self.requestTiles()
+            self.tileCameraWatcher.attach()
+            self.updateVisibleTiles(camera_utils.activeView())
         else:
+            removeNode(self.coinNode, self.panoramaTilesNode)
             addNode(self.coinNode, self.panoramaNode)
+            self.releaseTiles()
 
-        if noTexture(self.Object.SkyImage):
+        if noTexture(self.Object.SkyImage) and not self.isProceduralSky():
             removeNode(self.coinNode, self.skyNode)
         else:
             addNode(self.coinNode, self.skyNode)
 
+        # The detail has to be after the ground, so it is drawn on top of it
+        removeNode(self.coinNode, self.groundDetailNode)
+
         if noTexture(self.Object.GroundImage):
             removeNode(self.coinNode, self.groundNode)
         else:
             addNode(self.coinNode, self.groundNode)
 
+        if not noTexture(getattr(self.Object, 'GroundDetailImage', '')):
+            addNode(self.coinNode, self.groundDetailNode)
+
     def updateTransformNode(self):
         rotation = math.radians(self.Object.Rotation.Value)
         translation = coin.SoSFVec3f()
@@ -138,27 +440,35 @@ class ViewProviderEnvironmentConfig():
         self.transformNode.rotation.setValue(ROTATION_VECTOR, rotation)
         self.transformNode.translation.setValue(translation)
 
+        if PANORAMA_PRESETS[self.Object.PanoramaType]['360']:
+            # The image stays fixed to north while the visible part rotates with the environment
+            self.panoramaTextureTransform.translation.setValue(self.Object.Rotation.Value / 360, 0)
+        else:
+            self.panoramaTextureTransform.translation.setValue(0, 0)
+
+        self.cubeMapRotation.rotation.setValue(ROTATION_VECTOR, rotation)
+
+        # The procedural sky stays in place while the environment rotates
+        self.updateSkyTextureTransform()
+
     def setupPanoramaNode(self):
         panoramaNode = coin.SoSeparator()
 
         self.panoramaCoordinates = coin.SoCoordinate3()
 
         self.panoramaTextureCoordinates = coin.SoTextureCoordinate2()
+        self.panoramaTextureTransform = coin.SoTexture2Transform()
 
         self.panoramaTexture = coin.SoTexture2()
-        self.panoramaTexture.filename = py2_utils.textureFileString(
-            self.Object.PanoramaImage)
         self.panoramaTexture.model = coin.SoMultiTextureImageElement.REPLACE
 
-        faceset = coin.SoFaceSet()
-        faceset.numVertices.set1Value(0, 4)
-        faceset.numVertices.set1Value(1, 4)
-        faceset.numVertices.set1Value(2, 4)
+        self.panoramaFaceset = coin.SoFaceSet()
 
         panoramaNode.addChild(self.panoramaCoordinates)
         panoramaNode.addChild(self.panoramaTextureCoordinates)
+        panoramaNode.addChild(self.panoramaTextureTransform)
         panoramaNode.addChild(self.panoramaTexture)
-        panoramaNode.addChild(faceset)
+        panoramaNode.addChild(self.panoramaFaceset)
 
         return panoramaNode
 
@@ -168,24 +478,18 @@ class ViewProviderEnvironmentConfig():
         self.skyCoordinates = coin.SoCoordinate3()
 
         self.skyTexture = coin.SoTexture2()
-        self.skyTexture.filename = py2_utils.textureFileString(
-            self.Object.SkyImage)
         self.skyTexture.model = coin.SoMultiTextureImageElement.REPLACE
 
         self.skyTextureCoordinates = coin.SoTextureCoordinate2()
+        self.skyTextureTransform = coin.SoTexture2Transform()
 
-        faceset = coin.SoFaceSet()
-        faceset.numVertices.set1Value(0, 4)
-        faceset.numVertices.set1Value(1, 4)
-        faceset.numVertices.set1Value(2, 4)
-        faceset.numVertices.set1Value(3, 4)
-        faceset.numVertices.set1Value(4, 3)
-        faceset.numVertices.set1Value(5, 4)
+        self.skyFaceset = coin.SoFaceSet()
 
         skyNode.addChild(self.skyCoordinates)
         skyNode.addChild(self.skyTextureCoordinates)
+        skyNode.addChild(self.skyTextureTransform)
         skyNode.addChild(self.skyTexture)
-        skyNode.addChild(faceset)
+        skyNode.addChild(self.skyFaceset)
 
         return skyNode
 
@@ -195,332 +499,321 @@ class ViewProviderEnvironmentConfig():
         self.groundCoordinates = coin.SoCoordinate3()
 
         self.groundTexture = coin.SoTexture2()
-        self.groundTexture.filename = py2_utils.textureFileString(
-            self.Object.GroundImage)
         self.groundTexture.model = coin.SoMultiTextureImageElement.REPLACE
 
-        groundTextureCoordinates = coin.SoTextureCoordinate2()
-        groundTextureCoordinates.point.set1Value(0, 0, 0)
-        groundTextureCoordinates.point.set1Value(1, 1, 0)
-        groundTextureCoordinates.point.set1Value(2, 1, 1)
-        groundTextureCoordinates.point.set1Value(3, 0, 1)
+        self.groundTextureCoordinates = coin.SoTextureCoordinate2()
+
+        self.groundFaceset = coin.SoFaceSet()
 
-        faceset = coin.SoFaceSet()
-        faceset.numVertices.set1Value(0, 4)
+        # The ground detail is drawn on the same plane. Push the ground back to avoid z-fighting
+        polygonOffset = coin.SoPolygonOffset()
 
+        groundNode.addChild(polygonOffset)
         groundNode.addChild(self.groundCoordinates)
-        groundNode.addChild(groundTextureCoordinates)
+        groundNode.addChild(self.groundTextureCoordinates)
         groundNode.addChild(self.groundTexture)
-        groundNode.addChild(faceset)
+        groundNode.addChild(self.groundFaceset)
 
         return groundNode
 
-    def calculateCoordinateBounds(self, radius, length):
-        lengthThirds = length / 3  # the panorama consists of 3 planes
+    def setupGroundDetailNode(self):
+        groundDetailNode = coin.SoSeparator()
+
+        self.groundDetailMaterial = coin.SoMaterial()
+
+        materialBinding = coin.SoMaterialBinding()
+        materialBinding.value = coin.SoMaterialBinding.PER_VERTEX
+
+        self.groundDetailCoordinates = coin.SoCoordinate3()
+        self.groundDetailTextureCoordinates = coin.SoTextureCoordinate2()
+
+        self.groundDetailTexture = coin.SoTexture2()
+        # Replace keeps the transparency of the material, so the detail fades out
+        self.groundDetailTexture.model = coin.SoMultiTextureImageElement.REPLACE
+
+        self.groundDetailFaceset = coin.SoFaceSet()
+
+        groundDetailNode.addChild(materialBinding)
+        groundDetailNode.addChild(self.groundDetailMaterial)
+        groundDetailNode.addChild(self.groundDetailCoordinates)
+        groundDetailNode.addChild(self.groundDetailTextureCoordinates)
+        groundDetailNode.addChild(self.groundDetailTexture)
+        groundDetailNode.addChild(self.groundDetailFaceset)
+
+        return groundDetailNode
+
+    def setupCubeMapNode(self):
+        '''
+        A box around the camera showing the six faces of the cube map.
+        The box moves with the camera, so the environment looks infinitely far away.
+        '''
+        cubeMapNode = coin.SoSeparator()
+
+        self.cubeMapCenter = coin.SoCallback()
+        self.cubeMapCenter.setCallback(self.centerOnCamera)
+        self.cubeMapRotation = coin.SoRotation()
+
+        cubeMapNode.addChild(self.cubeMapCenter)
+        cubeMapNode.addChild(self.cubeMapRotation)
+
+        self.cubeMapFaces = {}
+
+        for name, forward, right, up in cubemap_utils.CUBE_FACES:
+            faceNode = coin.SoSeparator()
+
+            coordinates = coin.SoCoordinate3()
+
+            textureCoordinates = coin.SoTextureCoordinate2()
+            textureCoordinates.point.setValues(0, 4, [[0, 0], [1, 0], [1, 1], [0, 1]])
+
+            texture = coin.SoTexture2()
+            texture.model = coin.SoMultiTextureImageElement.REPLACE
 
-        alpha = self.calculateAlpha(radius, lengthThirds)
-        connectionPointX = math.sin(alpha) * radius
-        connectionPointY = math.cos(alpha) * radius
+            faceset = coin.SoFaceSet()
+            faceset.numVertices.set1Value(0, 4)
 
-        leftX = -connectionPointX
-        middleX = -connectionPointY
-        rightX = middleX + lengthThirds
+            faceNode.addChild(coordinates)
+            faceNode.addChild(textureCoordinates)
+            faceNode.addChild(texture)
+            faceNode.addChild(faceset)
 
-        backY = connectionPointX
-        middleY = connectionPointY
-        frontY = middleY - lengthThirds
+            cubeMapNode.addChild(faceNode)
 
-        return (leftX, middleX, rightX, backY, middleY, frontY)
+            self.cubeMapFaces[name] = (coordinates, texture)
+
+        return cubeMapNode
+
+    def updateCubeMapCoordinates(self):
+        halfSize = self.Object.Radius.Value
+
+        for name, forward, right, up in cubemap_utils.CUBE_FACES:
+            coordinates = self.cubeMapFaces[name][0]
+            corners = []
+
+            for a, b in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+                corners.append([(forward[i] + a * right[i] + b * up[i]) * halfSize for i in range(3)])
+
+            coordinates.point.setValues(0, 4, corners)
+
+    def centerOnCamera(self, userData, action):
+        '''
+        Moves the box to the camera while rendering. The camera is read from the traversal state, so the box
+        follows the camera of every view, also after the camera node was replaced, e.g. by switching to orthographic.
+        '''
+        if not action.isOfType(coin.SoGLRenderAction.getClassTypeId()):
+            return
+
+        state = action.getState()
+
+        # The position depends on the camera, so the box must never end up in a render cache
+        coin.SoCacheElement.invalidate(state)
+
+        cameraPosition = coin.SoViewVolumeElement.get(state).getProjectionPoint()
+        localPosition = coin.SoModelMatrixElement.get(state).inverse().multVecMatrix(cameraPosition)
+
+        coin.SoModelMatrixElement.translateBy(state, self.cubeMapCenter, localPosition)
+
+    def requestCubeMap(self):
+        '''Creates the cube map faces in a background thread. Faces created before are read from the cache.'''
+        key = (self.Object.PanoramaImage, self.Object.CubeMapSize)
+
+        if key == self.cubeMapKey:
+            return
+
+        self.cubeMapKey = key
+
+        for coordinates, texture in self.cubeMapFaces.values():
+            clearTexture(texture)
+
+        imagePath = py2_utils.textureFileString(self.Object.PanoramaImage)
+        QtCore.QThreadPool.globalInstance().start(cubemap_utils.CubeMapJob(imagePath, self.Object.CubeMapSize, self.cubeMapSignals))
+
+    def onCubeMapCreated(self, imagePath, size, faceFiles):
+        if self.cubeMapKey is None or (imagePath, size) != (py2_utils.textureFileString(self.Object.PanoramaImage), self.Object.CubeMapSize):
+            # The image changed or was released in the meantime
+            return
+
+        if faceFiles is None:
+            FreeCAD.Console.PrintWarning('Could not create the cube map for %s\n' % (imagePath,))
+
+            return
+
+        for name, faceFile in faceFiles.items():
+            self.cubeMapFaces[name][1].filename = faceFile
+
+    def isTiled(self):
+        return getattr(self.Object, 'TiledPanorama', False)
+
+    def requestTiles(self):
+        '''Splits the panorama image into tiles in a background thread. Tiles created before are read from the cache.'''
+        imagePath = py2_utils.textureFileString(self.Object.PanoramaImage)
+
+        if imagePath == self.tilesImage:
+            return
+
+        self.tilesImage = imagePath
+        self.panoramaTiles = None
+        self.updatePanoramaTiles()
+
+        QtCore.QThreadPool.globalInstance().start(panorama_tiles.TileJob(imagePath, self.tileSignals))
+
+    def onTilesCreated(self, imagePath, tiles):
+        if imagePath != self.tilesImage:
+            # The image changed in the meantime
+            return
+
+        if tiles is None:
+            FreeCAD.Console.PrintWarning('Could not split %s into tiles\n' % (imagePath,))
+
+            return
+
+        self.panoramaTiles = tiles
+        self.updatePanoramaTiles()
+
+    def updatePanoramaTiles(self):
+        '''Builds one mesh per tile. The textures are loaded by updateVisibleTiles.'''
+        self.panoramaTilesNode.removeAllChildren()
+        self.tileNodes = {}
+        self.tileBudget.clear()
+
+        if self.panoramaTiles is None:
+            return
+
+        grid, files = self.panoramaTiles
+        columns, rows, width, height = grid
+
+        panoramaType = self.Object.PanoramaType
+        is360 = PANORAMA_PRESETS[panoramaType]['360']
+        # Tiles are cut along the texture coordinates, so the rotation can't be applied by a texture transform
+        shift = self.Object.Rotation.Value / 360 if is360 else 0
+
+        meshes = environment_geometry.tiledPanoramaMeshes(
+            self.Object.Radius.Value, self.Object.Length.Value, self.Object.Height.Value,
+            self.segmentCount(), columns, rows, is360, shift)
+
+        tileSize = (width // columns) * (height // rows) * 4
+
+        for key, mesh in meshes.items():
+            tileNode = coin.SoSeparator()
+
+            coordinates = coin.SoCoordinate3()
+            textureCoordinates = coin.SoTextureCoordinate2()
+            faceset = coin.SoFaceSet()
+
+            texture = coin.SoTexture2()
+            texture.model = coin.SoMultiTextureImageElement.REPLACE
+
+            environment_geometry.assignMesh(coordinates, textureCoordinates, faceset, mesh)
+
+            tileNode.addChild(coordinates)
+            tileNode.addChild(textureCoordinates)
+            tileNode.addChild(texture)
+            tileNode.addChild(faceset)
+
+            self.panoramaTilesNode.addChild(tileNode)
+
+            self.tileNodes[key] = (texture, self.tileBoundBox(mesh[0]), tileSize, files[key])
+
+        self.updateVisibleTiles(camera_utils.activeView())
+
+    def tileBoundBox(self, points):
+        '''Bound box of the tile in global coordinates, so it can be checked against the view volume'''
+        # The transform node rotates around the negative z axis
+        rotation = -math.radians(self.Object.Rotation.Value)
+
+        x = points[:, 0] * math.cos(rotation) - points[:, 1] * math.sin(rotation)
+        y = points[:, 0] * math.sin(rotation) + points[:, 1] * math.cos(rotation)
+        z = points[:, 2] + self.Object.ZOffset.Value
+
+        return FreeCAD.BoundBox(float(x.min()), float(y.min()), float(z.min()), float(x.max()), float(y.max()), float(z.max()))
+
+    def updateVisibleTiles(self, view):
+        '''Loads the tiles facing the camera and releases other tiles when the memory budget is exceeded'''
+        if len(self.tileNodes) == 0:
+            return
+
+        viewVolume = camera_utils.getViewVolume(view) if view is not None else None
+        visibleKeys = set()
+
+        for key, (texture, boundBox, tileSize, tileFile) in self.tileNodes.items():
+            if not camera_utils.isInViewVolume(viewVolume, boundBox):
+                continue
+
+            visibleKeys.add(key)
+
+            if self.tileBudget.use(key, tileSize):
+                texture.filename = tileFile
+
+        self.tileBudget.budgetBytes = self.Object.TileMemoryBudget * 1024 * 1024
+
+        for key in self.tileBudget.release(visibleKeys):
+            clearTexture(self.tileNodes[key][0])
+
+    def releaseTiles(self):
+        self.tileCameraWatcher.detach()
+
+        for texture, boundBox, tileSize, tileFile in self.tileNodes.values():
+            clearTexture(texture)
+
+        self.tileBudget.clear()
+
+    def segmentCount(self):
+        '''The configured number of panorama segments or the default of the panorama type'''
+        segments = getattr(self.Object, 'PanoramaSegments', 0)
+
+        if segments > 0:
+            return segments
+
+        return PANORAMA_PRESETS[self.Object.PanoramaType]['segments']
 
     def updatePanoramaCoordinates(self):
-        radius = self.Object.Radius.Value
-        length = self.Object.Length.Value
-        height = self.Object.Height.Value
-
-        panoramaCoordinates = self.panoramaCoordinates
-
-        leftX, middleX, rightX, backY, middleY, frontY = self.calculateCoordinateBounds(
-            radius, length)
-
-        # left face of panorama
-        panoramaCoordinates.point.set1Value(0, leftX, frontY, 0)
-        panoramaCoordinates.point.set1Value(1, leftX, middleY, 0)
-        panoramaCoordinates.point.set1Value(2, leftX, middleY, height)
-        panoramaCoordinates.point.set1Value(3, leftX, frontY, height)
-
-        # Center face of panorama
-        panoramaCoordinates.point.set1Value(4, leftX, middleY, 0)
-        panoramaCoordinates.point.set1Value(5, middleX, backY, 0)
-        panoramaCoordinates.point.set1Value(6, middleX, backY, height)
-        panoramaCoordinates.point.set1Value(7, leftX, middleY, height)
-
-        # back face of panorama
-        panoramaCoordinates.point.set1Value(8, middleX, backY, 0)
-        panoramaCoordinates.point.set1Value(9, rightX, backY, 0)
-        panoramaCoordinates.point.set1Value(10, rightX, backY, height)
-        panoramaCoordinates.point.set1Value(11, middleX, backY, height)
-
-    def updatePanoramaTextureCoordinates(self):
         panoramaType = self.Object.PanoramaType
 
-        if panoramaType == PANORAMA_TYPE_THIRDS:
-            self.updateThirdsPanoramaTextureCoordinates()
-        elif panoramaType == PANORAMA_TYPE_360:
-            self.update360PanoramaTextureCoordinates()
-        else:
+        if panoramaType not in PANORAMA_PRESETS:
             raise ValueError('Unkown panorama type ' + panoramaType)
 
-    def update360PanoramaTextureCoordinates(self):
-        radius = self.Object.Radius.Value
-        length = self.Object.Length.Value
-        singlePlaneLength = length / 3
-
-        rotation = self.Object.Rotation.Value
-
-        if rotation >= 0:
-            rotation = rotation - 360
-
-        rotation = rotation * -1
-
-        leftX, middleX, rightX, backY, middleY, frontY = self.calculateCoordinateBounds(
-            radius, length)
-
-        displayAmount = 1 / 4
-        # We want to display 1/4 of the panorama between negative x and positive y axis
-        # So that north of panorama is positive y, south is negative y, east is positive x and west is negative x
-        #
-        # Default case is that the geometry start of geometry is exactly at the x asis and end is
-        # exactly at the y axis
-        # Then exactly 1 / 4 of the image is shown and every plane has 1 / 3 of the visilbe image
-
-        startOffset = displayAmount
-        secondOffset = displayAmount / 3
-        thirdOffset = secondOffset
-        endOffset = secondOffset
-
-        if rightX > 0:
-            # When the geometry overshoots the axis we have to display more of the image, so that the
-            # north, south, east and west are still touching the axis
-            # One fourth of the panorama image should be displayed between the axis
-            # to the right and bottom we overshoot by rightX so subtract this
-            oneFourthOfImageLength = length - rightX * 2
-            overshootRatio = rightX / oneFourthOfImageLength
-
-            # The length of the partial plane that is between the middle plane and the axis
-            shortPlaneLength = middleX * -1
-
-            # Ratios of the middle plane and the short planes between the axis
-            middlePlaneRatio = singlePlaneLength / oneFourthOfImageLength * displayAmount
-            shortPlaneRatio = shortPlaneLength / oneFourthOfImageLength * displayAmount
-
-            # Ratio of the panorama outside of the axis
-            displayAmountOvershootRatio = overshootRatio * displayAmount
-
-            startOffset = displayAmount + displayAmountOvershootRatio
-            secondOffset = displayAmountOvershootRatio + shortPlaneRatio
-            thirdOffset = middlePlaneRatio
-            endOffset = secondOffset
-        elif rightX < 0:
-            # When the geometry does not touch the axis we have to display less of the image, so that the
-            # north, south, east and west are still touching the axis
-            # One fourth of the panorama image should be displayed between the axis
-            # but we don't touch the axis so we have to add the missing bits
-            oneFourthOfImageLength = length + rightX * -2
-
-            # as rightX is negative multiply with -1
-            # overshootRatio = rightX / oneFourthOfImageLength * -1
-
-            realDisplayAmount = (displayAmount * length) / \
-                oneFourthOfImageLength
-            realThirds = realDisplayAmount / 3
-            missingRatio = (displayAmount - realDisplayAmount) / 2
-
-            # We display less of the image at once. overshoot ratio is negative so this works
-            startOffset = missingRatio + realDisplayAmount
-            secondOffset = realThirds
-            thirdOffset = realThirds
-            endOffset = realThirds - missingRatio
-
-        start = 0 - startOffset - (rotation / 360)
-        second = start + secondOffset
-        third = second + thirdOffset
-        end = third + endOffset
-
-        # # left face
-        self.panoramaTextureCoordinates.point.set1Value(0, start, 0)
-        self.panoramaTextureCoordinates.point.set1Value(1, second, 0)
-        self.panoramaTextureCoordinates.point.set1Value(2, second, 1)
-        self.panoramaTextureCoordinates.point.set1Value(3, start, 1)
-
-        # # middle face
-        self.panoramaTextureCoordinates.point.set1Value(4, second, 0)
-        self.panoramaTextureCoordinates.point.set1Value(5, third, 0)
-        self.panoramaTextureCoordinates.point.set1Value(6, third, 1)
-        self.panoramaTextureCoordinates.point.set1Value(7, second, 1)
-
-        # right face
-        self.panoramaTextureCoordinates.point.set1Value(8, third, 0)
-        self.panoramaTextureCoordinates.point.set1Value(9, end, 0)
-        self.panoramaTextureCoordinates.point.set1Value(10, end, 1)
-        self.panoramaTextureCoordinates.point.set1Value(11, third, 1)
-
-    def updateThirdsPanoramaTextureCoordinates(self):
-        oneThird = 1 / 3
-        twoThirds = 2 * oneThird
-
-        # left face
-        self.panoramaTextureCoordinates.point.set1Value(0, 0, 0)
-        self.panoramaTextureCoordinates.point.set1Value(1, oneThird, 0)
-        self.panoramaTextureCoordinates.point.set1Value(2, oneThird, 1)
-        self.panoramaTextureCoordinates.point.set1Value(3, 0, 1)
-
-        self.panoramaTextureCoordinates.point.set1Value(4, oneThird, 0)
-        self.panoramaTextureCoordinates.point.set1Value(5, twoThirds, 0)
-        self.panoramaTextureCoordinates.point.set1Value(6, twoThirds, 1)
-        self.panoramaTextureCoordinates.point.set1Value(7, oneThird, 1)
-
-        self.panoramaTextureCoordinates.point.set1Value(8, twoThirds, 0)
-        self.panoramaTextureCoordinates.point.set1Value(9, 1, 0)
-        self.panoramaTextureCoordinates.point.set1Value(10, 1, 1)
-        self.panoramaTextureCoordinates.point.set1Value(11, twoThirds, 1)
+        mesh = environment_geometry.panoramaMesh(
+            self.Object.Radius.Value, self.Object.Length.Value, self.Object.Height.Value,
+            self.segmentCount(), PANORAMA_PRESETS[panoramaType]['360'])
+
+        environment_geometry.assignMesh(self.panoramaCoordinates, self.panoramaTextureCoordinates, self.panoramaFaceset, mesh)
 
     def updateSkyCoordinates(self):
-        radius = self.Object.Radius.Value
-        length = self.Object.Length.Value
-        height = self.Object.Height.Value
-        skyOverlap = self.Object.SkyOverlap.Value
-        skyOffset = 1000  # sky is 1 meter behind the panorama
-
-        skyCoordinates = self.skyCoordinates
-
-        leftX, middleX, rightX, backY, middleY, frontY = self.calculateCoordinateBounds(
-            radius + skyOffset, length + skyOffset)
-
-        alpha = math.radians(45)
-        a = leftX if leftX >= 0 else leftX * -1
-        c = a / math.sin(alpha)
-        topZOffset = a / math.tan(alpha)
-        topZ = height + topZOffset
-
-        self.fullSkyLength = skyOverlap + c
-
-        # left face of sky
-        skyCoordinates.point.set1Value(0, leftX, frontY, height - skyOverlap)
-        skyCoordinates.point.set1Value(1, leftX, middleY, height - skyOverlap)
-        skyCoordinates.point.set1Value(2, leftX, middleY, height)
-        skyCoordinates.point.set1Value(3, leftX, frontY, height)
-
-        # Center face of sky
-        skyCoordinates.point.set1Value(4, leftX, middleY, height - skyOverlap)
-        skyCoordinates.point.set1Value(5, middleX, backY, height - skyOverlap)
-        skyCoordinates.point.set1Value(6, middleX, backY, height)
-        skyCoordinates.point.set1Value(7, leftX, middleY, height)
-
-        # back face of sky
-        skyCoordinates.point.set1Value(8, middleX, backY, height - skyOverlap)
-        skyCoordinates.point.set1Value(9, rightX, backY, height - skyOverlap)
-        skyCoordinates.point.set1Value(10, rightX, backY, height)
-        skyCoordinates.point.set1Value(11, middleX, backY, height)
-
-        # left top face
-        skyCoordinates.point.set1Value(12, leftX, frontY, height)
-        skyCoordinates.point.set1Value(13, leftX, middleY, height)
-        skyCoordinates.point.set1Value(14, 0, 0, topZ)
-        skyCoordinates.point.set1Value(15, 0, frontY, topZ)
-
-        # middle top face
-        skyCoordinates.point.set1Value(16, leftX, middleY, height)
-        skyCoordinates.point.set1Value(17, middleX, backY, height)
-        skyCoordinates.point.set1Value(18, 0, 0, topZ)
-
-        # back top face
-        skyCoordinates.point.set1Value(19, middleX, backY, height)
-        skyCoordinates.point.set1Value(20, rightX, backY, height)
-        skyCoordinates.point.set1Value(21, rightX, 0, topZ)
-        skyCoordinates.point.set1Value(22, 0, 0, topZ)
-
-        self.updateSkyTextureCoordinates()
+        mesh = environment_geometry.skyMesh(
+            self.Object.Radius.Value, self.Object.Length.Value, self.Object.Height.Value,
+            self.Object.SkyOverlap.Value, self.segmentCount())
+
+        environment_geometry.assignMesh(self.skyCoordinates, self.skyTextureCoordinates, self.skyFaceset, mesh)
 
     def updateGroundCoordinates(self):
-        radius = self.Object.Radius.Value
-        length = self.Object.Length.Value
-
-        groundCoordinates = self.groundCoordinates
-
-        leftX, middleX, rightX, backY, middleY, frontY = self.calculateCoordinateBounds(
-            radius, length)
-
-        groundCoordinates.point.set1Value(0, leftX, frontY, 0)
-        groundCoordinates.point.set1Value(1, rightX, frontY, 0)
-        groundCoordinates.point.set1Value(2, rightX, backY, 0)
-        groundCoordinates.point.set1Value(3, leftX, backY, 0)
-
-    def calculateAlpha(self, radius, lengthThirds):
-        # lets calculate alpha1. Then we only have to subtract it from 135 degrees and have our final alpha
-
-        halfLength = lengthThirds / 2
-        alpha1 = math.acos(halfLength / radius)
-        alpha = math.radians(135) - alpha1
-
-        return alpha
-
-    def updateSkyTextureCoordinates(self):
-        textureOverlapRatio = self.calculateSkyOverlapRatio()
-
-        oneThird = 1 / 3
-        twoThirds = oneThird * 2
-
-        # left face
-        self.skyTextureCoordinates.point.set1Value(0, 0, 0)
-        self.skyTextureCoordinates.point.set1Value(1, oneThird, 0)
-        self.skyTextureCoordinates.point.set1Value(
-            2, oneThird, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(3, 0, textureOverlapRatio)
-
-        # middle face
-        self.skyTextureCoordinates.point.set1Value(4, oneThird, 0)
-        self.skyTextureCoordinates.point.set1Value(5, twoThirds, 0)
-        self.skyTextureCoordinates.point.set1Value(
-            6, twoThirds, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(
-            7, oneThird, textureOverlapRatio)
-
-        # back face
-        self.skyTextureCoordinates.point.set1Value(8, twoThirds, 0)
-        self.skyTextureCoordinates.point.set1Value(9, 1, 0)
-        self.skyTextureCoordinates.point.set1Value(10, 1, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(
-            11, twoThirds, textureOverlapRatio)
-
-        # left top face
-        self.skyTextureCoordinates.point.set1Value(12, 0, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(
-            13, oneThird, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(14, 0.5, 1)
-        self.skyTextureCoordinates.point.set1Value(15, 0, 1)
-
-        # middle top face
-        self.skyTextureCoordinates.point.set1Value(
-            16, oneThird, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(
-            17, twoThirds, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(18, 0.5, 1)
-
-        # # back top face
-        self.skyTextureCoordinates.point.set1Value(
-            19, twoThirds, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(20, 1, textureOverlapRatio)
-        self.skyTextureCoordinates.point.set1Value(21, 1, 1)
-        self.skyTextureCoordinates.point.set1Value(22, 0.5, 1)
-
-    def calculateSkyOverlapRatio(self):
-        if self.Object.SkyOverlap.Value == 0:
-            return 0
-
-        return 1 / (self.fullSkyLength / self.Object.SkyOverlap.Value)
+        mesh = environment_geometry.groundMesh(self.Object.Radius.Value, self.Object.Length.Value, self.segmentCount(),
+                                               getattr(self.Object, 'GroundRealSize', FreeCAD.Units.Quantity(0)).Value)
+
+        environment_geometry.assignMesh(self.groundCoordinates, self.groundTextureCoordinates, self.groundFaceset, mesh)
+
+    def updateGroundDetailCoordinates(self):
+        if not hasattr(self.Object, 'GroundDetailDistance'):
+            return
+
+        realSize = self.Object.GroundDetailRealSize.Value
+        fadeDistance = self.Object.GroundDetailDistance.Value
+
+        if realSize <= 0 or fadeDistance <= 0:
+            return
+
+        points, textureCoordinates, faceCount, transparencies = environment_geometry.groundDetailMesh(fadeDistance, realSize)
+
+        environment_geometry.assignMesh(self.groundDetailCoordinates, self.groundDetailTextureCoordinates,
+                                        self.groundDetailFaceset, (points, textureCoordinates, faceCount))
+
+        self.groundDetailMaterial.diffuseColor.setNum(len(transparencies))
+        self.groundDetailMaterial.diffuseColor.setValues(0, len(transparencies), [[1, 1, 1]] * len(transparencies))
+        self.groundDetailMaterial.transparency.setNum(len(transparencies))
+        self.groundDetailMaterial.transparency.setValues(0, len(transparencies), transparencies.tolist())
 
     def onChanged(self, vp, prop):
-        pass
+        if prop == 'Visibility' and hasattr(self, 'releaseTimer'):
+            self.updateImageLoading()
 
     def doubleClicked(self, vobj):
         pass
@@ -531,32 +824,90 @@ class ViewProviderEnvironmentConfig():
     def getDefaultDisplayMode(self):
         return "Standard"
 
-    def updateData(self, fp, prop):
-        if prop in GEOMETRY_COORDINATES:
+    def scheduleUpdate(self, *meshes):
+        '''
+        Rebuilds the given meshes on the next event loop iteration.
+        Changing several properties at once, e.g. from a script or expressions, results in a single rebuild.
+        '''
+        self.pendingUpdates.update(meshes)
+        self.updateTimer.start()
+
+    def flushUpdates(self):
+        pendingUpdates = self.pendingUpdates
+        self.pendingUpdates = set()
+
+        if 'panorama' in pendingUpdates:
             self.updatePanoramaCoordinates()
+
+            if self.isTiled():
+                self.updatePanoramaTiles()
+
+        if 'sky' in pendingUpdates:
             self.updateSkyCoordinates()
+            self.updateSkyTextureTransform()
+            self.updateProceduralSky()
+        elif 'skyImage' in pendingUpdates:
+            self.updateProceduralSky()
+
+        if 'ground' in pendingUpdates:
             self.updateGroundCoordinates()
-            self.updatePanoramaTextureCoordinates()
-        elif prop == 'SkyOverlap':
-            self.updateSkyCoordinates()
-        elif prop == 'PanoramaType':
-            self.updatePanoramaTextureCoordinates()
-        elif prop in TRANSFORM_PARAMETERS:
+
+        if 'groundDetail' in pendingUpdates:
+            self.updateGroundDetailCoordinates()
+
+        if 'cubeMap' in pendingUpdates:
+            self.updateCubeMapCoordinates()
+
+        if 'images' in pendingUpdates:
+            self.updateImageLoading()
+
+    def updateData(self, fp, prop):
+        if prop in TRANSFORM_PARAMETERS:
+            # Only changes transform nodes, so this is cheap enough to follow every change of the value
             self.updateTransformNode()
-            self.updatePanoramaTextureCoordinates()
-        elif prop == 'PanoramaImage':
-            self.panoramaTexture.filename = py2_utils.textureFileString(
-                self.Object.PanoramaImage)
+
+            if self.isTiled():
+                # The tiles are cut along the rotated image and their bound boxes depend on the placement
+                self.scheduleUpdate('panorama')
+
+        if prop in GEOMETRY_COORDINATES:
+            self.scheduleUpdate('panorama', 'sky', 'ground', 'cubeMap')
+
+            if prop == 'PanoramaType':
+                self.updatePanoramaTexture()
+                self.updateNodeVisibility()
+        elif prop == 'SkyOverlap':
+            self.scheduleUpdate('sky')
+        elif prop in GROUND_PARAMETERS:
+            self.scheduleUpdate('ground', 'groundDetail')
+        elif prop in ('PanoramaImage', 'TiledPanorama'):
+            self.updatePanoramaTexture()
+            self.updateNodeVisibility()
+        elif prop == 'CubeMapSize':
             self.updateNodeVisibility()
         elif prop == 'SkyImage':
-            self.skyTexture.filename = py2_utils.textureFileString(
-                self.Object.SkyImage)
+            self.updateSkyTexture()
             self.updateNodeVisibility()
+        elif prop == 'SkyType':
+            clearTexture(self.skyTexture)
+            self.updateSkyTextureTransform()
+            self.updateSkyTexture()
+            self.updateNodeVisibility()
+        elif prop in SKY_PARAMETERS:
+            self.scheduleUpdate('skyImage')
         elif prop == 'GroundImage':
-            self.groundTexture.filename = py2_utils.textureFileString(
-                self.Object.GroundImage)
+            self.updateTexture(self.groundTexture, self.Object.GroundImage)
+            self.updateNodeVisibility()
+        elif prop == 'GroundDetailImage':
+            self.updateTexture(self.groundDetailTexture, self.Object.GroundDetailImage)
             self.updateNodeVisibility()
 
+    def onDelete(self, vobj, subelements):
+        self.tileCameraWatcher.detach()
+        self.releaseTimer.stop()
+
+        return True
+
     def __getstate__(self):
         return None
 
@@ -3,6 +3,24 @@ import FreeCADGui
 from pivy import coin
 
 import arch_texture_utils.faceset_utils as faceset_utils
+from arch_texture_utils.light_manager import getLightManager, noShadowStyle, shadowsEnabled
+
+def lightDirection(horizontalRotation, verticalRotation):
+    '''
+    The direction a directional light is pointing to. Zero horizontal rotation points from south to north.
+    Negative Z because we want the light to follow the real sun path from East to west.
+    Negative X because a positive vertical rotation should let the light point downwards.
+    Returns (direction, rotation)
+    '''
+    rotateZ = FreeCAD.Rotation(FreeCAD.Vector(0, 0, -1), horizontalRotation)
+    rotateX = FreeCAD.Rotation(FreeCAD.Vector(-1, 0, 0), verticalRotation)
+
+    rotation = rotateZ.multiply(rotateX)
+
+    direction = rotateZ.multVec(FreeCAD.Vector(0, 1, 0))
+    direction = rotateX.multVec(direction)
+
+    return (direction, rotation)
 
 class Light():
     def __init__(self, obj):
@@ -47,22 +65,24 @@ class ViewProviderLight:
 
         # Setting properties does not work here as the pl is not filled yet :/
 
-        sceneGraph = FreeCADGui.ActiveDocument.ActiveView.getSceneGraph()
-
         self.switch = coin.SoSwitch()
         self.geometryNode = coin.SoSeparator()
         self.transform = coin.SoTransform()
         self.material = coin.SoMaterial()
-        self.coinLight = self.createLightInstance()
+        self.coinLight = self.createLightInstance(shadowsEnabled())
         actualGeometry = self.createGeometry()
 
+        # The geometry only shows where the light is and must not throw shadows itself
+        shadowStyle = noShadowStyle()
+
+        if shadowStyle is not None:
+            self.geometryNode.addChild(shadowStyle)
+
         self.geometryNode.addChild(self.transform)
         self.geometryNode.addChild(self.material)
 
         if actualGeometry is not None:
             self.geometryNode.addChild(actualGeometry)
-        
-        sceneGraph.insertChild(self.coinLight, 1)
 
         self.switch.addChild(self.geometryNode)
 
@@ -73,6 +93,9 @@ class ViewProviderLight:
         self.updateColor()
         self.updateIntensity()
         # self.updateGeometryVisibility()
+
+        # The light manager inserts the light into all views of the document and enables only the most important lights
+        getLightManager().addLight(self)
     
     def setProperties(self, vobj):
         pl = vobj.PropertiesList
@@ -81,8 +104,26 @@ class ViewProviderLight:
             vobj.addProperty("App::PropertyBool", "ShowGeometry", "Light", 
                             "Show the light as geometry in the 3D View").ShowGeometry = True
 
-    def createLightInstance(self):
+    def createLightInstance(self, shadows=False):
+        '''Creates the coin light. With shadows the variant used by a SoShadowGroup is created.'''
         raise NotImplementedError()
+
+    def updateLightInstance(self):
+        '''Recreates the coin light after the shadow mode changed'''
+        coinLight = self.createLightInstance(shadowsEnabled())
+
+        if coinLight.getTypeId() == self.coinLight.getTypeId():
+            return
+
+        self.coinLight = coinLight
+
+        self.updateLightVisibility()
+        self.updateDirection()
+        self.updateLocation()
+        self.updateColor()
+        self.updateIntensity()
+
+        getLightManager().replaceLight(self)
     
     def createGeometry(self):
         raise NotImplementedError()
@@ -106,13 +147,22 @@ class ViewProviderLight:
             self.updateIntensity()
         elif prop == 'Location':
             self.updateLocation()
+
+        if prop in ['Intensity', 'Location', 'Range']:
+            getLightManager().scheduleUpdate()
  
     def onChanged(self, vp, prop):
         if prop == 'Visibility':
             self.updateLightVisibility()
+            getLightManager().scheduleUpdate()
         elif prop == 'ShowGeometry':
             self.updateGeometryVisibility()
 
+    def onDelete(self, vobj, subelements):
+        getLightManager().removeLight(self)
+
+        return True
+
     def __getstate__(self):
         return None
 
@@ -128,24 +178,16 @@ class ViewProviderLight:
 
             self.updateGeometryLocation(coinVector)
     
-    def updateDirection(self):
+    def updateDirection(self, horizontalRotation=None, verticalRotation=None):
+        '''The only place writing the direction into coin. Without arguments the rotations of the object are used.'''
         if hasattr(self.Object, 'HorizontalRotation') and hasattr(self.Object, 'VerticalRotation'):
-            horizontalRotation = self.Object.HorizontalRotation
-            verticalRotation = self.Object.VerticalRotation
-
-            # Defaults to south to north
-            direction = FreeCAD.Vector(0, 1, 0)
-
-            # Negative Z because we want the light to follow the real sun path from East to west.
-            rotateZ = FreeCAD.Rotation(FreeCAD.Vector(0, 0, -1), horizontalRotation)
-
-            # Negative X because a positive rotation should let the light point downwards
-            rotateX = FreeCAD.Rotation(FreeCAD.Vector(-1, 0, 0), verticalRotation)
+            if horizontalRotation is None:
+                horizontalRotation = self.Object.HorizontalRotation
 
-            rotation = rotateZ.multiply(rotateX)
+            if verticalRotation is None:
+                verticalRotation = self.Object.VerticalRotation
 
-            direction = rotateZ.multVec(direction)
-            direction = rotateX.multVec(direction)
+            direction, rotation = lightDirection(horizontalRotation, verticalRotation)
 
             coinVector = coin.SbVec3f(direction.x, direction.y, direction.z)
 
@@ -4,6 +4,10 @@ import FreeCAD
 import FreeCADGui
 import Part
 
+# When enabled all selected faces end up in a single compound object instead of one object per face.
+# The compound carries a FaceMaterials list and a FaceMaterialIndices map (face index -> index into FaceMaterials)
+BATCH_MODE = False
+
 def getSelectedFaces():
 	sel = FreeCADGui.Selection.getSelectionEx()
 	
@@ -33,15 +37,38 @@ def showFace(face):
 
 	obj.addProperty('App::PropertyLink', 'Material', 'Base', 'Material for the object')
 
+def showCompound(solids):
+	# Like the single face copies, the faces start without a material. Faces pointing to -1 stay untextured.
+	# Add materials to FaceMaterials and set the index of every face to texture the faces individually
+	faceMaterialIndices = []
+
+	for solid in solids:
+		faceMaterialIndices.extend([-1] * len(solid.Faces))
+
+	obj = FreeCAD.ActiveDocument.addObject("Part::Feature", "FaceCompound")
+	obj.Shape = Part.makeCompound(solids)
+	obj.ViewObject.ShapeColor = (0.667,0.000,0.000)
+
+	obj.addProperty('App::PropertyLinkList', 'FaceMaterials', 'Base', 'Materials used by the faces of the compound')
+	obj.addProperty('App::PropertyIntegerList', 'FaceMaterialIndices', 'Base', 'Index into FaceMaterials for every face of the compound')
+
+	obj.FaceMaterials = []
+	obj.FaceMaterialIndices = faceMaterialIndices
+
 
 # main
 faces = getSelectedFaces()
 
 if faces is None or len(faces) == 0:
 	print('Select at least one face')
+elif BATCH_MODE and len(faces) > 1:
+	solids = [cloneFace(face, face.normalAt(0.5, 0.5)) for face in faces]
+	showCompound(solids)
+
+	FreeCAD.ActiveDocument.recompute()
 else:
 	for face in faces:
 		newFace = cloneFace(face, face.normalAt(0.5, 0.5))
 		showFace(newFace)
 		
-	FreeCAD.ActiveDocument.recompute()
\ No newline at end of file
+	FreeCAD.ActiveDocument.recompute()
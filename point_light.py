@@ -1,3 +1,5 @@
+import math
+
 import FreeCAD
 import FreeCADGui
 from pivy import coin
@@ -5,6 +7,9 @@ from pivy import coin
 import light
 from arch_texture_utils.resource_utils import iconPath
 
+# Half of the opening angle of the spot light that replaces the point light in shadow mode
+SHADOW_CUT_OFF_ANGLE = 75
+
 class PointLight(light.Light):
     def __init__(self, obj):
         super().__init__(obj)
@@ -17,6 +22,10 @@ class PointLight(light.Light):
         if not 'Location' in pl:
             obj.addProperty("App::PropertyVector", "Location", "Light",
                             "The position of the light in the scene.").Location = FreeCAD.Vector(0, -1, 0)
+
+        if not 'Range' in pl:
+            obj.addProperty("App::PropertyLength", "Range", "Light",
+                            "The light is switched off when nothing in this distance is visible. 0 means unlimited.").Range = 0
             
         
         self.type = 'PointLight'
@@ -30,7 +39,16 @@ class ViewProviderPointLight(light.ViewProviderLight):
 
         self.updateLocation()
 
-    def createLightInstance(self):
+    def createLightInstance(self, shadows=False):
+        if shadows:
+            # Coin has no shadows for point lights. A wide spot light pointing down is the closest match
+            spotLight = coin.SoShadowSpotLight()
+            spotLight.direction.setValue(coin.SbVec3f(0, 0, -1))
+            spotLight.cutOffAngle = math.radians(SHADOW_CUT_OFF_ANGLE)
+            spotLight.dropOffRate = 0
+
+            return spotLight
+
         return coin.SoPointLight()
     
     def createGeometry(self):
@@ -1,19 +1,40 @@
 import FreeCAD, FreeCADGui
-import re
+from collections import OrderedDict
 from pivy import coin
-from texture_manager import TextureManager
-from arch_texture_utils.resource_utils import uiPath
-from arch_texture_utils.qtutils import QComboBox, QTableWidgetItem, QDoubleSpinBox, userSelectedFile, IMAGE_FILES, showInfo
-
-from PySide2.QtWidgets import QGroupBox
-from PySide2.QtWidgets import QLineEdit
-from PySide2.QtWidgets import QPushButton
-from PySide2.QtWidgets import QFormLayout
-from PySide2.QtWidgets import QHBoxLayout
-from PySide2.QtWidgets import QWidget
-
-
-MAT_NAME_REGEX = re.compile(r'.* \((.*)\)')
+import copy
+from texture_manager import TextureManager, DEFAULT_RENDER_PROFILES, RENDER_PROFILE_INTERACTIVE, RENDER_PROFILE_STILL
+import texture_library
+from texture_observer import TextureObserver
+from texture_scheduler import TextureScheduler
+import arch_texture_utils.camera_utils as camera_utils
+from arch_texture_utils.ui_utils import loadUi
+from arch_texture_utils.qtutils import QtCore, QtWidgets, QDoubleSpinBox, userSelectedFile, IMAGE_FILES, showInfo
+from arch_texture_utils.thumbnail_utils import ThumbnailCache, THUMBNAIL_SIZE
+
+
+COLUMN_MATERIAL = 0
+COLUMN_TEXTURE = 1
+COLUMN_BUMPMAP = 2
+COLUMN_LENGTH = 3
+COLUMN_HEIGHT = 4
+COLUMN_OFFSET_S = 5
+COLUMN_OFFSET_T = 6
+COLUMN_ROTATION = 7
+
+COLUMN_HEADERS = ['Material', 'Texture', 'BumpMap', 'Length', 'Height', 'Offset S', 'Offset T', 'Rotation']
+FILE_COLUMNS = {
+    COLUMN_TEXTURE: 'file',
+    COLUMN_BUMPMAP: 'bumpMap'
+}
+# column: (entry key, axis)
+SIZE_COLUMNS = {
+    COLUMN_LENGTH: ('realSize', 's'),
+    COLUMN_HEIGHT: ('realSize', 't'),
+    COLUMN_OFFSET_S: ('offset', 's'),
+    COLUMN_OFFSET_T: ('offset', 't')
+}
+# Changes in this columns are previewed through the texture transform of the material
+TRANSFORM_COLUMNS = list(SIZE_COLUMNS.keys()) + [COLUMN_ROTATION]
 
 def noneWhenEmpty(value):
     if value == None or value.strip() == '':
@@ -21,127 +42,231 @@ def noneWhenEmpty(value):
     
     return value
 
-    
-class MaterialConfigWidget(QGroupBox):
-    def __init__(self, panel, index, materialName, textureFile, bumpMapFile, realSize):
+def findMaterials():
+    '''Returns an OrderedDict of material name -> display text for all materials in the active document'''
+    materials = FreeCAD.ActiveDocument.findObjects('App::MaterialObjectPython')
+
+    return OrderedDict((mat.Name, '%s (%s)' % (mat.Label, mat.Name)) for mat in materials)
+
+
+class MaterialTableModel(QtCore.QAbstractTableModel):
+    '''
+    Table model for the material configuration. Each row is a dict with the keys
+    materialName, file, bumpMap and realSize like stored in the TextureManager.
+    The view only asks for the visible rows, so large configs stay responsive.
+    entryChanged is emitted with row and column whenever the user edits a value.
+    '''
+    entryChanged = QtCore.Signal(int, int)
+
+    def __init__(self, materials, thumbnails):
         super().__init__()
 
-        self.panel = panel
-        self.index = index
+        self.materials = materials
+        self.thumbnails = thumbnails
+        self.entries = []
+
+        self.thumbnails.thumbnailLoaded.connect(self.onThumbnailLoaded)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
 
-        self.materialBox = self.createMaterialBox(materialName)
-        self.textureFileEdit, self.textureFileWidget = self.createFileSelect(textureFile)
-        self.bumpMapFileEdit, self.bumpMapFileWidget = self.createFileSelect(bumpMapFile)
-        self.lengthEdit, self.heightEdit = self.createSizeEdit(realSize)
-        self.removeButton = QPushButton('Remove')
+        return len(self.entries)
 
-        self.removeButton.clicked.connect(self.remove)
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
 
-        self.initUi()
+        return len(COLUMN_HEADERS)
 
-    def initUi(self):
-        self.layout = QFormLayout()
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return COLUMN_HEADERS[section]
 
-        self.layout.addRow('Material', self.materialBox)
-        self.layout.addRow('Texture', self.textureFileWidget)
-        self.layout.addRow('BumpMap', self.bumpMapFileWidget)
-        self.layout.addRow('Length', self.lengthEdit)
-        self.layout.addRow('Height', self.heightEdit)
-        self.layout.addRow(' ', self.removeButton)
+        return None
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEditable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        entry = self.entries[index.row()]
+        column = index.column()
+
+        if column == COLUMN_MATERIAL:
+            if role == QtCore.Qt.DisplayRole:
+                return self.materials.get(entry['materialName'], entry['materialName'])
+            elif role == QtCore.Qt.EditRole:
+                return entry['materialName']
+        elif column in FILE_COLUMNS:
+            value = entry[FILE_COLUMNS[column]]
+
+            if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole, QtCore.Qt.ToolTipRole):
+                return value
+            elif role == QtCore.Qt.DecorationRole:
+                return self.thumbnails.thumbnail(value)
+        elif column in SIZE_COLUMNS:
+            key, axis = SIZE_COLUMNS[column]
+            value = entry[key][axis]
+
+            if role == QtCore.Qt.DisplayRole:
+                return '%s mm' % (value,)
+            elif role == QtCore.Qt.EditRole:
+                return value
+        elif column == COLUMN_ROTATION:
+            if role == QtCore.Qt.DisplayRole:
+                return '%s °' % (entry['rotation'],)
+            elif role == QtCore.Qt.EditRole:
+                return entry['rotation']
 
-        self.setLayout(self.layout)
+        return None
 
-    def getMaterialName(self):
-        comboBox = self.materialBox
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.EditRole:
+            return False
+
+        entry = self.entries[index.row()]
+        column = index.column()
+
+        if column == COLUMN_MATERIAL:
+            entry['materialName'] = value
+        elif column in FILE_COLUMNS:
+            entry[FILE_COLUMNS[column]] = noneWhenEmpty(value)
+        elif column in SIZE_COLUMNS:
+            key, axis = SIZE_COLUMNS[column]
+            entry[key][axis] = value
+        elif column == COLUMN_ROTATION:
+            entry['rotation'] = value
+        else:
+            return False
 
-        return MAT_NAME_REGEX.findall(comboBox.currentText())[0]
+        self.dataChanged.emit(index, index)
+        self.entryChanged.emit(index.row(), column)
 
-    def getTextureFile(self):
-        return noneWhenEmpty(self.textureFileEdit.text())
+        return True
 
-    def getBumpMapFile(self):
-        return noneWhenEmpty(self.bumpMapFileEdit.text())
+    def addEntry(self, materialName=None, textureFile=None, bumpMapFile=None, realSize=None, offset=None, rotation=None):
+        if materialName is None and len(self.materials) > 0:
+            materialName = next(iter(self.materials))
 
-    def getLength(self):
-        return self.lengthEdit.value()
+        if realSize is None:
+            realSize = {'s': 0, 't': 0}
 
-    def getHeight(self):
-        return self.heightEdit.value()
+        if offset is None:
+            offset = {'s': 0, 't': 0}
 
-    def remove(self):
-        self.panel.removeRow(self)
-    
-    def createMaterialBox(self, materialName=None):
-        materialBox = QComboBox()
+        row = len(self.entries)
 
-        materials = self.findMaterials()
-        materialBox.addItems(materials)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.entries.append({
+            'materialName': materialName,
+            'file': textureFile,
+            'bumpMap': bumpMapFile,
+            'realSize': dict(realSize),
+            'offset': dict(offset),
+            'rotation': rotation or 0
+        })
+        self.endInsertRows()
 
-        if materialName is not None:
-            boxEntry = [mat for mat in materials if mat.find('(%s)' % (materialName, )) > -1]
+    def removeEntry(self, row):
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        self.entries.pop(row)
+        self.endRemoveRows()
 
-            if len(boxEntry) == 1:
-                index = materialBox.findText(boxEntry[0])
-            else:
-                index = -1
+    def onThumbnailLoaded(self, imagePath):
+        for row, entry in enumerate(self.entries):
+            for column, key in FILE_COLUMNS.items():
+                if entry[key] == imagePath:
+                    index = self.index(row, column)
+                    self.dataChanged.emit(index, index)
 
-            if index != -1:
-                FreeCAD.Console.PrintMessage('Found Matname: %s\n' % (materialName,))
-                materialBox.setCurrentIndex(index)
+
+class MaterialDelegate(QtWidgets.QStyledItemDelegate):
+    def __init__(self, materials, parent=None):
+        super().__init__(parent)
+
+        self.materials = materials
+        self.materialNames = list(materials.keys())
+
+    def createEditor(self, parent, option, index):
+        materialBox = QtWidgets.QComboBox(parent)
+        materialBox.addItems(list(self.materials.values()))
 
         return materialBox
-    
-    def createSizeEdit(self, realSize=None):
-        lengthEdit = QDoubleSpinBox()
-        heightEdit = QDoubleSpinBox()
 
-        lengthEdit.setSuffix('mm')
-        heightEdit.setSuffix('mm')
+    def setEditorData(self, editor, index):
+        materialName = index.data(QtCore.Qt.EditRole)
 
-        lengthEdit.setMinimum(0)
-        heightEdit.setMinimum(0)
+        if materialName in self.materials:
+            editor.setCurrentIndex(self.materialNames.index(materialName))
 
-        lengthEdit.setMaximum(100000)
-        heightEdit.setMaximum(100000)
+    def setModelData(self, editor, model, index):
+        if editor.currentIndex() >= 0:
+            model.setData(index, self.materialNames[editor.currentIndex()])
 
-        if realSize is not None:
-            lengthEdit.setValue(realSize['s'])
-        
-        if realSize is not None:
-            heightEdit.setValue(realSize['t'])
 
-        return (lengthEdit, heightEdit)
-    
-    def createFileSelect(self, file):
-        edit = QLineEdit(file)
-        button = QPushButton('...')
-        button.setMaximumWidth(30)
+class FileDelegate(QtWidgets.QStyledItemDelegate):
+    '''
+    Double click opens a file dialog. Typing into the cell allows to edit the path directly.
+    While typing, the files of the texture library are suggested.
+    '''
+    def __init__(self, parent=None):
+        super().__init__(parent)
 
-        widget = QWidget()
-        layout = QHBoxLayout()
+        self.libraryFiles = None
 
-        layout.addWidget(edit)
-        layout.addWidget(button)
+    def createEditor(self, parent, option, index):
+        edit = QtWidgets.QLineEdit(parent)
 
-        widget.setLayout(layout)
+        if self.libraryFiles is None:
+            self.libraryFiles = sorted(texture_library.getTextureLibrary().entries.keys())
 
-        button.clicked.connect(lambda: self.chooseFile(edit))
+        completer = QtWidgets.QCompleter(self.libraryFiles, edit)
+        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        completer.setFilterMode(QtCore.Qt.MatchContains)
+        edit.setCompleter(completer)
 
+        return edit
 
-        return (edit, widget)
-    
-    def findMaterials(self):
-        materials = FreeCAD.ActiveDocument.findObjects('App::MaterialObjectPython')
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.MouseButtonDblClick:
+            selectedFile = userSelectedFile('Select texture', IMAGE_FILES)
 
-        return ['%s (%s)' % (mat.Label, mat.Name) for mat in materials]
-    
-    def chooseFile(self, edit):
-        selectedFile = userSelectedFile('Select texture', IMAGE_FILES)
+            if selectedFile is not None and selectedFile != '':
+                model.setData(index, selectedFile)
 
-        if selectedFile is None or selectedFile == '':
-            return
-        
-        edit.setText(selectedFile)
+            return True
+
+        return super().editorEvent(event, model, option, index)
+
+
+class SizeDelegate(QtWidgets.QStyledItemDelegate):
+    def __init__(self, parent=None, minimum=0, maximum=100000, suffix='mm'):
+        super().__init__(parent)
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.suffix = suffix
+
+    def createEditor(self, parent, option, index):
+        edit = QDoubleSpinBox(parent)
+
+        edit.setSuffix(self.suffix)
+        edit.setMinimum(self.minimum)
+        edit.setMaximum(self.maximum)
+        # Preview every step in the 3D view, not only when the editor is closed
+        edit.valueChanged.connect(lambda value: self.commitData.emit(edit))
+
+        return edit
+
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(QtCore.Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value())
 
 
 class TextureConfigPanel():
@@ -149,14 +274,45 @@ class TextureConfigPanel():
         self.textureConfig = textureConfig
         self.freecadObject = freecadObject
         self.textureManager = textureConfig.textureManager
-        self.entries = []
 
-        self.form = FreeCADGui.PySideUic.loadUi(uiPath('texture_config.ui'))
+        self.form = loadUi('texture_config.ui')
 
         self.form.Title.setText('%s Config' % (freecadObject.Label))
-        self.scrollAreaWidget = self.form.ScrollArea.widget()
 
-        self.form.AddMaterialButton.clicked.connect(self.addRow)
+        # Query the materials only once for the whole panel
+        self.materials = findMaterials()
+        self.thumbnails = ThumbnailCache()
+        self.model = MaterialTableModel(self.materials, self.thumbnails)
+
+        self.table = self.form.MaterialTable
+        self.table.setModel(self.model)
+        self.table.setIconSize(QtCore.QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.table.verticalHeader().setDefaultSectionSize(THUMBNAIL_SIZE + 4)
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        self.delegates = [
+            MaterialDelegate(self.materials, self.table),
+            FileDelegate(self.table),
+            SizeDelegate(self.table),
+            SizeDelegate(self.table, -100000, 100000),
+            SizeDelegate(self.table, -360, 360, '°')
+        ]
+        self.table.setItemDelegateForColumn(COLUMN_MATERIAL, self.delegates[0])
+        self.table.setItemDelegateForColumn(COLUMN_TEXTURE, self.delegates[1])
+        self.table.setItemDelegateForColumn(COLUMN_BUMPMAP, self.delegates[1])
+        self.table.setItemDelegateForColumn(COLUMN_LENGTH, self.delegates[2])
+        self.table.setItemDelegateForColumn(COLUMN_HEIGHT, self.delegates[2])
+        self.table.setItemDelegateForColumn(COLUMN_OFFSET_S, self.delegates[3])
+        self.table.setItemDelegateForColumn(COLUMN_OFFSET_T, self.delegates[3])
+        self.table.setItemDelegateForColumn(COLUMN_ROTATION, self.delegates[4])
+
+        # Only changes that can't be previewed through the texture transforms need a full retexture
+        self.requiresRetexture = False
+        self.model.entryChanged.connect(self.onEntryChanged)
+        self.model.rowsRemoved.connect(self.onRowsChanged)
+
+        self.form.AddMaterialButton.clicked.connect(lambda: self.addRow())
+        self.form.RemoveMaterialButton.clicked.connect(self.removeSelectedRows)
 
         self.setupRows()
 
@@ -167,47 +323,78 @@ class TextureConfigPanel():
             if 'bumpMap' in entryConfig:
                 bumpMap = entryConfig['bumpMap']
 
-            self.addRow(materialName, entryConfig['file'], bumpMap, entryConfig['realSize'])
+            self.addRow(materialName, entryConfig['file'], bumpMap, entryConfig['realSize'], entryConfig.get('offset'), entryConfig.get('rotation'))
 
-    def addRow(self, materialName = None, textureFile = None, bumpMapFile = None, realSize = None):
-        widget = MaterialConfigWidget(self, len(self.entries), materialName, textureFile, bumpMapFile, realSize)
+        self.requiresRetexture = False
+        self.model.rowsInserted.connect(self.onRowsChanged)
 
-        self.entries.append(widget)
-
-        self.scrollAreaWidget.layout().addWidget(widget)
+    def addRow(self, materialName = None, textureFile = None, bumpMapFile = None, realSize = None, offset = None, rotation = None):
+        self.model.addEntry(materialName, textureFile, bumpMapFile, realSize, offset, rotation)
     
-    def removeRow(self, widget):
-        self.entries.pop(widget.index)
-        layoutItem = self.scrollAreaWidget.layout().takeAt(widget.index)
+    def removeRow(self, row):
+        self.model.removeEntry(row)
+
+    def removeSelectedRows(self):
+        rows = sorted(set(index.row() for index in self.table.selectionModel().selectedRows()), reverse=True)
+
+        for row in rows:
+            self.removeRow(row)
 
-        layoutItem.widget().deleteLater()
+    def onEntryChanged(self, row, column):
+        if column not in TRANSFORM_COLUMNS:
+            self.requiresRetexture = True
+
+            return
+
+        entry = self.model.entries[row]
+
+        if not self.textureManager.updateTextureTransform(entry['materialName'], self.entryAsConfig(entry)):
+            self.requiresRetexture = True
+
+    def onRowsChanged(self, *args):
+        self.requiresRetexture = True
 
     def accept(self):
         self.saveIntoConfig()
 
         FreeCADGui.Control.closeDialog()
 
-        self.textureConfig.execute(self.freecadObject)
+        if self.requiresRetexture:
+            self.textureConfig.execute(self.freecadObject)
 
     def reject(self):
+        # Undo the live preview
+        self.textureManager.resetTextureTransforms()
+
         FreeCADGui.Control.closeDialog()
+
+    def entryAsConfig(self, entry):
+        return {
+            'file': entry['file'],
+            'bumpMap': entry['bumpMap'],
+            'realSize': {
+                's': entry['realSize']['s'],
+                't': entry['realSize']['t']
+            },
+            'offset': {
+                's': entry['offset']['s'],
+                't': entry['offset']['t']
+            },
+            'rotation': entry['rotation']
+        }
     
     def saveIntoConfig(self):
         config = self.textureManager.textureData['materials']
 
         config.clear()
 
-        for entry in self.entries:
-            materialName = entry.getMaterialName()
+        for entry in self.model.entries:
+            materialName = entry['materialName']
 
-            config[materialName] = {
-                'file': entry.getTextureFile(),
-                'bumpMap': entry.getBumpMapFile(),
-                'realSize': {
-                    's': entry.getLength(),
-                    't': entry.getHeight()
-                }
-            }
+            if materialName is None:
+                continue
+
+            config[materialName] = self.entryAsConfig(entry)
 
 class TextureConfig():
     def __init__(self, obj, fileObject=None):
@@ -216,15 +403,202 @@ class TextureConfig():
         self.textureManager = TextureManager(fileObject)
         self.showTextures = True
 
+        self.setProperties(obj)
+
+        if fileObject is not None:
+            # Imported configs might reference textures that were moved since the export
+            self.textureManager.resolveMovedTextures(texture_library.getTextureLibrary())
+
         self.execute(obj)
 
         self.isTextureConfig = True
     
+    def setProperties(self, obj):
+        pl = obj.PropertiesList
+
+        if not 'Scope' in pl:
+            # Hidden links do not make the config depend on the scope. Otherwise every change inside the scope
+            # would recompute the config and retexture everything. The observer handles scope changes instead
+            scopeDescription = "Only texture these objects and the content of these groups and BuildingParts. Empty textures the whole document"
+
+            try:
+                obj.addProperty("App::PropertyLinkListHidden", "Scope", "TextureConfig", scopeDescription)
+            except Exception:
+                obj.addProperty("App::PropertyLinkList", "Scope", "TextureConfig", scopeDescription)
+
+        if not 'LazyTexturing' in pl:
+            obj.addProperty("App::PropertyBool", "LazyTexturing", "Performance",
+                            "Only texture objects inside the view. The others are textured when the camera moves towards them").LazyTexturing = False
+
+        if not 'LevelOfDetail' in pl:
+            obj.addProperty("App::PropertyBool", "LevelOfDetail", "Performance",
+                            "Use smaller textures and finally plain colors for objects far away from the camera").LevelOfDetail = False
+
+        if not 'ReducedTextureDistance' in pl:
+            obj.addProperty("App::PropertyLength", "ReducedTextureDistance", "Performance",
+                            "Objects further away from the camera use a downscaled texture without bump map").ReducedTextureDistance = 30000
+
+        if not 'FlatColorDistance' in pl:
+            obj.addProperty("App::PropertyLength", "FlatColorDistance", "Performance",
+                            "Objects further away from the camera show the average color of the texture").FlatColorDistance = 150000
+
+        if not 'ReducedTextureSize' in pl:
+            obj.addProperty("App::PropertyInteger", "ReducedTextureSize", "Performance",
+                            "The maximum width and height of downscaled textures in pixels").ReducedTextureSize = 256
+
+        if not 'AdaptiveQuality' in pl:
+            obj.addProperty("App::PropertyBool", "AdaptiveQuality", "Performance",
+                            "Lower the texture quality while the camera moves").AdaptiveQuality = False
+
+        if not 'InteractiveTextureQuality' in pl:
+            obj.addProperty("App::PropertyFloatConstraint", "InteractiveTextureQuality", "Performance",
+                            "The texture quality while the camera moves").InteractiveTextureQuality = (0.1, 0.0, 1.0, 0.1)
+
+        if not 'InteractiveTextureSize' in pl:
+            obj.addProperty("App::PropertyInteger", "InteractiveTextureSize", "Performance",
+                            "The maximum texture size in pixels while the camera moves. 0 uses the full textures").InteractiveTextureSize = 128
+
+        if not 'InteractiveBumpMaps' in pl:
+            obj.addProperty("App::PropertyBool", "InteractiveBumpMaps", "Performance",
+                            "Show bump maps while the camera moves").InteractiveBumpMaps = False
+
+        if not 'TimeSlice' in pl:
+            obj.addProperty("App::PropertyInteger", "TimeSlice", "Performance",
+                            "Milliseconds spent texturing before the user interface gets updated").TimeSlice = 50
+
+    def onDocumentRestored(self, obj):
+        self.setProperties(obj)
+
+    def updateRenderProfiles(self, fp):
+        if getattr(fp, 'AdaptiveQuality', False):
+            renderProfiles = copy.deepcopy(DEFAULT_RENDER_PROFILES)
+            renderProfiles[RENDER_PROFILE_INTERACTIVE] = {
+                'textureQuality': fp.InteractiveTextureQuality,
+                'textureSize': fp.InteractiveTextureSize,
+                'bumpMaps': fp.InteractiveBumpMaps
+            }
+
+            self.textureManager.setRenderProfiles(renderProfiles)
+            self.textureManager.applyRenderProfile(RENDER_PROFILE_STILL)
+        else:
+            self.textureManager.setRenderProfiles(None)
+
+    def startAdaptingQuality(self, fp):
+        '''The textures are shared by all views, so moving the camera of any view of the document lowers the quality'''
+        if getattr(self, 'qualityWatcher', None) is None:
+            self.qualityWatcher = camera_utils.DocumentCameraWatcher(
+                lambda view: self.textureManager.applyRenderProfile(RENDER_PROFILE_STILL), 300,
+                lambda view: self.textureManager.applyRenderProfile(RENDER_PROFILE_INTERACTIVE))
+
+        self.qualityWatcher.attach(FreeCADGui.getDocument(fp.Document.Name))
+
+    def stopAdaptingQuality(self):
+        if getattr(self, 'qualityWatcher', None) is not None:
+            self.qualityWatcher.detach()
+
+    def updateLodSettings(self, fp):
+        if getattr(fp, 'LevelOfDetail', False):
+            self.textureManager.lodSettings = {
+                'reducedDistance': fp.ReducedTextureDistance.Value,
+                'flatDistance': fp.FlatColorDistance.Value,
+                'reducedSize': fp.ReducedTextureSize
+            }
+        else:
+            self.textureManager.lodSettings = None
+
     def execute(self, fp):
+        # Never texture the same objects twice at the same time
+        self.cancelTexturing()
+
+        self.updateLodSettings(fp)
+        self.updateRenderProfiles(fp)
+        self.textureManager.setScope(getattr(fp, 'Scope', None))
+
         if self.showTextures:
-            self.textureManager.textureObjects()
+            if getattr(fp, 'LazyTexturing', False):
+                objectNames = self.textureManager.prepareTexturing(isDeferred=self.outsideOfView(camera_utils.activeView()))
+                self.startWatchingCamera()
+            else:
+                self.stopWatchingCamera()
+                objectNames = self.textureManager.prepareTexturing()
+
+            self.scheduleTexturing(objectNames, getattr(fp, 'TimeSlice', 50))
+
+            self.startObserving(fp)
+
+            if self.textureManager.renderProfiles is not None:
+                self.startAdaptingQuality(fp)
+            else:
+                self.stopAdaptingQuality()
         else:
+            self.stopObserving()
+            self.stopWatchingCamera()
+            self.stopAdaptingQuality()
             self.textureManager.removeTextures()
+
+    def scheduleTexturing(self, objectNames, timeSlice):
+        '''Textures the objects step by step, so the user interface stays responsive'''
+        self.scheduler = TextureScheduler(objectNames, self.textureManager.textureObjectByName,
+                                          timeSlice=timeSlice / 1000.0,
+                                          onCancel=self.textureManager.deferObjects)
+        self.scheduler.start()
+
+    def cancelTexturing(self):
+        '''Cancels a running texturing run. Objects that are not textured yet are deferred.'''
+        if getattr(self, 'scheduler', None) is not None:
+            self.scheduler.cancel()
+
+    def waitForTextures(self, timeout=None):
+        '''Blocks until the current texturing run is done. Returns False when it was cancelled or timed out.'''
+        if getattr(self, 'scheduler', None) is None:
+            return True
+
+        return self.scheduler.wait(timeout)
+
+    def outsideOfView(self, view):
+        if view is None:
+            return None
+
+        viewVolume = camera_utils.getViewVolume(view)
+
+        return lambda o: not camera_utils.isInViewVolume(viewVolume, o.Shape.BoundBox)
+
+    def startWatchingCamera(self):
+        if getattr(self, 'cameraWatcher', None) is None:
+            self.cameraWatcher = camera_utils.CameraWatcher(self.onCameraChanged)
+
+        self.cameraWatcher.attach()
+
+    def stopWatchingCamera(self):
+        if getattr(self, 'cameraWatcher', None) is not None:
+            self.cameraWatcher.detach()
+
+    def onCameraChanged(self, view):
+        if self.showTextures:
+            self.textureManager.texturePending(isDeferred=self.outsideOfView(view))
+
+    def startObserving(self, fp):
+        '''Retexture changed objects while the textures are shown'''
+        if getattr(self, 'observer', None) is None:
+            self.observer = TextureObserver(self, fp)
+
+        self.observer.register()
+
+    def stopObserving(self):
+        if getattr(self, 'observer', None) is not None:
+            self.observer.unregister()
+
+    def updateScope(self, fp):
+        '''Called when the content of a group inside the scope changed. Only the added and removed objects are retextured.'''
+        changedObjects = self.textureManager.setScope(fp.Scope)
+
+        if changedObjects is not None:
+            self.retextureObjects(changedObjects)
+
+    def retextureObjects(self, objectNames):
+        '''Retexture only the given objects, e.g. after their face overrides changed'''
+        if self.showTextures:
+            self.textureManager.retextureObjects(objectNames)
     
     def export(self, fileObject):
         self.textureManager.export(fileObject)
@@ -287,6 +661,14 @@ class ViewProviderTextureConfig():
         FreeCADGui.Control.closeDialog()
         return False
 
+    def onDelete(self, vobj, subelements):
+        self.textureConfig.cancelTexturing()
+        self.textureConfig.stopObserving()
+        self.textureConfig.stopWatchingCamera()
+        self.textureConfig.stopAdaptingQuality()
+
+        return True
+
     def getDisplayModes(self,obj):
         return ["Standard"]
 
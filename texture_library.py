@@ -0,0 +1,284 @@
+import FreeCAD
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from arch_texture_utils.resource_utils import cachePath
+
+PARAMETER_PATH = 'User parameter:BaseApp/Preferences/Mod/ArchTextures'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+SIDECAR_EXTENSION = '.json'
+INDEX_VERSION = 1
+
+# Textures bigger than this are likely to be downscaled or rejected by the graphics driver
+MAX_TEXTURE_SIZE = 8192
+
+
+def configuredRoots():
+    '''The library roots are stored as semicolon separated list in the FreeCAD parameters'''
+    roots = FreeCAD.ParamGet(PARAMETER_PATH).GetString('TextureLibraryRoots', '')
+
+    return [root for root in roots.split(';') if root.strip() != '']
+
+
+def fileHash(filePath, blockSize=1024 * 1024):
+    sha = hashlib.sha1()
+
+    with open(filePath, 'rb') as f:
+        block = f.read(blockSize)
+
+        while block:
+            sha.update(block)
+            block = f.read(blockSize)
+
+    return sha.hexdigest()
+
+
+def imageDimensions(filePath):
+    '''
+    Reads the pixel dimensions from the image header without decoding the image.
+    Returns None when the format is not known.
+    '''
+    with open(filePath, 'rb') as f:
+        header = f.read(26)
+
+        if header.startswith(b'\x89PNG\r\n\x1a\n'):
+            return struct.unpack('>II', header[16:24])
+
+        if header.startswith(b'BM'):
+            width, height = struct.unpack('<ii', header[18:26])
+
+            return (width, abs(height))
+
+        if header.startswith(b'\xff\xd8'):
+            return jpegDimensions(f)
+
+    return None
+
+
+def jpegDimensions(f):
+    f.seek(2)
+
+    while True:
+        marker = f.read(2)
+
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+
+        # Start of frame markers contain the dimensions
+        if marker[1] in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            f.read(3)
+            height, width = struct.unpack('>HH', f.read(4))
+
+            return (width, height)
+
+        segmentLength = struct.unpack('>H', f.read(2))[0]
+        f.seek(segmentLength - 2, 1)
+
+
+def readSidecar(filePath):
+    '''A <image>.json file next to the image can define the realSize of the texture'''
+    sidecarPath = filePath + SIDECAR_EXTENSION
+
+    if not os.path.isfile(sidecarPath):
+        return None
+
+    try:
+        with open(sidecarPath, 'r', encoding='utf-8') as f:
+            return json.load(f).get('realSize')
+    except (ValueError, OSError):
+        return None
+
+
+def indexFile(filePath, previousEntry=None):
+    '''Builds the index entry for a single file. The hash and dimensions are reused when size and mtime did not change.'''
+    stat = os.stat(filePath)
+
+    if previousEntry is not None and previousEntry['size'] == stat.st_size and previousEntry['mtime'] == stat.st_mtime:
+        entry = dict(previousEntry)
+    else:
+        try:
+            dimensions = imageDimensions(filePath)
+        except (OSError, struct.error):
+            dimensions = None
+
+        entry = {
+            'path': filePath,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': fileHash(filePath),
+            'dimensions': dimensions
+        }
+
+    entry['realSize'] = readSidecar(filePath)
+
+    return entry
+
+
+class TextureLibrary():
+    def __init__(self, roots=None, indexPath=None):
+        self.roots = roots if roots is not None else configuredRoots()
+        self.indexPath = indexPath if indexPath is not None else os.path.join(cachePath('library'), 'index.json')
+
+        self.entries = {
+            # '<path>': {
+            #     'path': '<path>',
+            #     'size': <bytes>,
+            #     'mtime': <modification_time>,
+            #     'hash': '<sha1>',
+            #     'dimensions': None | [<width>, <height>],
+            #     'realSize': None | {'s': <length_in_mm>, 't': <height_in_mm>}
+            # }
+        }
+        self.byHash = {}
+        self.byName = {}
+
+        self.removedHashes = {
+            # '<path>': '<sha1>' of files that were removed by a rescan. Used to find them again after a move
+        }
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.indexPath):
+            return
+
+        try:
+            with open(self.indexPath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (ValueError, OSError):
+            FreeCAD.Console.PrintWarning('Texture library index %s is broken. It will be rebuilt on the next rescan\n' % (self.indexPath,))
+            return
+
+        if data.get('version') == INDEX_VERSION:
+            self.setEntries(data['entries'])
+            self.removedHashes = data.get('removedHashes', {})
+
+    def save(self):
+        with open(self.indexPath, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries, 'removedHashes': self.removedHashes}, f, ensure_ascii=False)
+
+    def setEntries(self, entries):
+        self.entries = entries
+        self.byHash = {}
+        self.byName = {}
+
+        for entry in entries.values():
+            self.byHash.setdefault(entry['hash'], []).append(entry)
+            self.byName.setdefault(os.path.basename(entry['path']).lower(), []).append(entry)
+
+    def findFiles(self):
+        for root in self.roots:
+            for directory, directories, files in os.walk(root):
+                for fileName in files:
+                    if fileName.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(directory, fileName)
+
+    def rescan(self, workers=None):
+        '''
+        Incremental rescan of all roots. Only new or changed files are hashed.
+        The stat and hash work runs on a thread pool as hashing releases the GIL.
+        Returns a tuple of (added, changed, removed) counts.
+        '''
+        files = list(self.findFiles())
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            newEntries = list(executor.map(lambda filePath: indexFile(filePath, self.entries.get(filePath)), files))
+
+        entries = dict((entry['path'], entry) for entry in newEntries)
+
+        added = len([path for path in entries if path not in self.entries])
+        changed = len([path for path, entry in entries.items() if path in self.entries and self.entries[path]['hash'] != entry['hash']])
+        removedPaths = [path for path in self.entries if path not in entries]
+        removed = len(removedPaths)
+
+        # Remember the content of removed files, so configs still pointing to them can be resolved by hash
+        for path in removedPaths:
+            self.removedHashes[path] = self.entries[path]['hash']
+
+        for path in entries:
+            self.removedHashes.pop(path, None)
+
+        self.setEntries(entries)
+        self.save()
+
+        return (added, changed, removed)
+
+    def search(self, text):
+        text = text.lower()
+
+        return [entry for entry in self.entries.values() if text in entry['path'].lower()]
+
+    def findEntry(self, filePath):
+        return self.entries.get(filePath)
+
+    def resolve(self, filePath):
+        '''
+        Returns the path to use for the given texture file.
+        When the file does not exist anymore we look for a file with the same name in the library.
+        A file with the hash recorded for the old path wins, otherwise a unique name match. Returns None when nothing matches.
+        The hash is taken from the index or, when a rescan already removed the old path, from the removed files.
+        '''
+        if filePath is None or os.path.isfile(filePath):
+            return filePath
+
+        candidates = self.byName.get(os.path.basename(filePath).lower(), [])
+        oldEntry = self.entries.get(filePath)
+        oldHash = oldEntry['hash'] if oldEntry is not None else self.removedHashes.get(filePath)
+
+        if oldHash is not None:
+            sameContent = [entry for entry in self.byHash.get(oldHash, []) if os.path.isfile(entry['path'])]
+
+            if len(sameContent) > 0:
+                return sameContent[0]['path']
+
+        candidates = [entry for entry in candidates if os.path.isfile(entry['path'])]
+
+        if len(candidates) == 1:
+            return candidates[0]['path']
+
+        return None
+
+
+textureLibrary = None
+
+def getTextureLibrary():
+    '''Returns the shared library. The index is loaded from disk but not rescanned.'''
+    global textureLibrary
+
+    if textureLibrary is None:
+        textureLibrary = TextureLibrary()
+
+    return textureLibrary
+
+
+def addConfiguredRoot(directory):
+    '''Adds a directory to the library roots in the FreeCAD parameters. The shared library uses it on the next rescan.'''
+    roots = configuredRoots()
+
+    if directory not in roots:
+        roots.append(directory)
+
+        FreeCAD.ParamGet(PARAMETER_PATH).SetString('TextureLibraryRoots', ';'.join(roots))
+
+    if textureLibrary is not None:
+        textureLibrary.roots = roots
+
+    return roots
+
+def rescanLibrary():
+    '''Rescans the shared library. Returns a summary of the changes for the user.'''
+    library = getTextureLibrary()
+
+    if len(library.roots) == 0:
+        return 'No texture library roots configured. Set TextureLibraryRoots in %s' % (PARAMETER_PATH,)
+
+    added, changed, removed = library.rescan()
+
+    return 'Texture library: %s files, %s added, %s changed, %s removed' % (len(library.entries), added, changed, removed)
+
+
+if __name__ == "__main__":
+    FreeCAD.Console.PrintMessage(rescanLibrary() + '\n')
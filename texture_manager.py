@@ -1,9 +1,12 @@
 import FreeCAD
 import math
+import os
 import json
 from pivy import coin
 import arch_texture_utils.faceset_utils as faceset_utils
 import arch_texture_utils.py2_utils as py2_utils
+import texture_library
+import arch_texture_utils.thumbnail_utils as thumbnail_utils
 
 
 class TextureConfigEncoder(json.JSONEncoder):
@@ -29,6 +32,24 @@ class TextureConfigDecoder(json.JSONDecoder):
         return dct
 
 
+RENDER_PROFILE_INTERACTIVE = 'interactive'
+RENDER_PROFILE_STILL = 'still'
+
+DEFAULT_RENDER_PROFILES = {
+    # textureSize 0 means the full texture is used
+    RENDER_PROFILE_INTERACTIVE: {
+        'textureQuality': 0.1,
+        'textureSize': 128,
+        'bumpMaps': False
+    },
+    RENDER_PROFILE_STILL: {
+        'textureQuality': 0.5,
+        'textureSize': 0,
+        'bumpMaps': True
+    }
+}
+
+
 class TextureManager():
     def __init__(self, fileObject=None):
         if fileObject is None:
@@ -40,7 +61,12 @@ class TextureManager():
                     #         'realSize': None | {
                     #              's': <length_in_mm>,
                     #              't': <height_in_mm>
-                    #          }
+                    #          },
+                    #         'offset': None | {
+                    #              's': <offset_in_mm>,
+                    #              't': <offset_in_mm>
+                    #          },
+                    #         'rotation': None | <rotation_in_degrees>
                     #     }
                 },
                 'faceOverrides': [
@@ -66,9 +92,48 @@ class TextureManager():
             # '<file_name>': bumpmap
         }
 
-        self.texturedObjects = [
-            #(object, shadedNode, (textureUnit, texture, transform), (material, originalDiffuseColor))
-        ]
+        self.textureTransformCache = {
+            # '<mat_name>': SoTexture2Transform shared by all objects with this material
+        }
+
+        self.textureTransformModes = {
+            # '<mat_name>': (<s_has_real_size>, <t_has_real_size>) the texture coordinates were calculated with
+        }
+
+        self.texturedObjects = {
+            # '<object_name>': (object, shadedNode, (textureUnit, texture, textureCoords, bumpMap, textureTransform), (material, originalDiffuseColor))
+        }
+
+        self.reducedTextureCache = {
+            # ('<file_name>', <size>): texture
+        }
+
+        self.flatColorCache = {
+            # '<file_name>': SoMaterial with the average color of the texture
+        }
+
+        self.textureCoordinateCache = {
+            # (<tessellation_fingerprint>, <s_has_real_size>, <t_has_real_size>): SoTextureCoordinate2 shared by identical objects
+        }
+
+        # None or dict with the keys reducedDistance, flatDistance and reducedSize. See buildLodNode
+        self.lodSettings = None
+
+        # None or dict of profile name -> profile like DEFAULT_RENDER_PROFILES. See applyRenderProfile
+        self.renderProfiles = None
+        self.setupRenderProfileNodes()
+
+        # Names of objects that should be textured but are not yet. E.g. because they are hidden
+        self.deferredObjects = set()
+
+        # objectName -> FaceOverrideIndex. Built lazily from textureData['faceOverrides']
+        self.faceOverrideIndex = None
+        self.faceOverrideIndexSource = None
+
+        # None textures the whole document. Otherwise the names of all objects inside the scope. See setScope
+        self.scope = None
+        # Names of the groups inside the scope. Changing their content changes the scope
+        self.scopeContainers = set()
 
     def export(self, fileObject):
         try:
@@ -84,66 +149,668 @@ class TextureManager():
         self.textureData = json.loads(
             textureDataAsString, encoding='utf-8', cls=TextureConfigDecoder)
 
-    def textureObjects(self, debug=False):
+    def textureObjects(self, debug=False, isDeferred=None):
+        '''
+        Textures all objects of the active document.
+        Hidden objects are registered as deferred and textured once they get visible (see texturePending).
+        isDeferred is an optional callable to defer visible objects as well, e.g. objects outside of the view.
+        '''
+        for objectName in self.prepareTexturing(isDeferred):
+            self.textureObjectByName(objectName, debug)
+
+    def prepareTexturing(self, isDeferred=None):
+        '''
+        Removes all textures and returns the names of the objects to texture now.
+        Used by textureObjects and by the TextureScheduler to texture the objects step by step.
+        '''
+        objectNames = []
+
         # Make sure that no old textures are left. Otherwise we could end up with duplicate textures
         self.removeTextures()
 
         FreeCAD.Console.PrintMessage('Texturing objects\n')
 
-        for o in FreeCAD.ActiveDocument.Objects:
-            if self.isTexturable(o):
-                # Test Script for bump mapping is here: https://forum.freecadweb.org/viewtopic.php?f=10&t=37255&p=319329#p319329
-                texture, bumpMap, textureConfig = self.getTextureForMaterial(
-                    o.Material)
+        for problem in self.validateTextures(texture_library.getTextureLibrary()):
+            FreeCAD.Console.PrintWarning(problem + '\n')
+
+        for o in self.scopeObjects():
+            if not self.isTexturable(o, ignoreVisibility=True):
+                continue
+
+            if not o.ViewObject.Visibility or (isDeferred is not None and isDeferred(o)):
+                self.deferredObjects.add(o.Name)
+            else:
+                objectNames.append(o.Name)
+
+        if len(self.deferredObjects) > 0:
+            FreeCAD.Console.PrintMessage('Deferred texturing of %s objects\n' % (len(self.deferredObjects),))
+
+        return objectNames
+
+    def textureObjectByName(self, objectName, debug=False):
+        '''
+        Used by the TextureScheduler. While an object waits in the scheduler it might already have been
+        textured by the observer or by texturePending. Such objects are skipped.
+        '''
+        if self.isTextured(objectName):
+            return
+
+        o = FreeCAD.ActiveDocument.getObject(objectName)
+
+        if o is not None and self.isTexturable(o):
+            self.textureObject(o, debug)
+
+    def deferObjects(self, objectNames):
+        '''Defers the objects that are not textured yet, e.g. the remaining objects of a cancelled TextureScheduler'''
+        self.deferredObjects.update(objectName for objectName in objectNames if not self.isTextured(objectName))
+
+    def setScope(self, objects):
+        '''
+        Restricts texturing to the given objects and everything they contain, e.g. groups or BuildingParts.
+        An empty list textures the whole document.
+        Returns the names of the objects that entered or left the scope.
+        '''
+        previousScope = self.scope
+
+        if objects is None or len(objects) == 0:
+            self.scope = None
+            self.scopeContainers = set()
+        else:
+            scope = set()
+            containers = set()
+            pending = list(objects)
+
+            while len(pending) > 0:
+                o = pending.pop()
+
+                if o is None or o.Name in scope:
+                    continue
+
+                scope.add(o.Name)
+
+                group = getattr(o, 'Group', None)
+
+                if group is not None:
+                    containers.add(o.Name)
+                    pending.extend(group)
+
+            self.scope = scope
+            self.scopeContainers = containers
+
+        if previousScope is None or self.scope is None:
+            # Compared to the whole document every object could have changed
+            return None
+
+        return previousScope.symmetric_difference(self.scope)
+
+    def inScope(self, objectName):
+        return self.scope is None or objectName in self.scope
+
+    def isScopeContainer(self, objectName):
+        return objectName in self.scopeContainers
+
+    def scopeObjects(self):
+        if self.scope is None:
+            return FreeCAD.ActiveDocument.Objects
+
+        objects = [FreeCAD.ActiveDocument.getObject(objectName) for objectName in self.scope]
+
+        return [o for o in objects if o is not None]
+
+    def isDeferred(self, objectName):
+        return objectName in self.deferredObjects
+
+    def texturePending(self, isDeferred=None, debug=False):
+        '''Textures the deferred objects that are visible now and not deferred by isDeferred anymore'''
+        objectNames = []
+
+        for objectName in list(self.deferredObjects):
+            o = FreeCAD.ActiveDocument.getObject(objectName)
+
+            if o is None:
+                self.deferredObjects.discard(objectName)
+            elif self.isTexturable(o) and (isDeferred is None or not isDeferred(o)):
+                objectNames.append(objectName)
+
+        self.retextureObjects(objectNames, debug)
+
+        return objectNames
+
+    def textureFiles(self):
+        '''Yields (materialName, key, file) for every texture and bump map file in the config'''
+        for materialName, materialConfig in self.textureData['materials'].items():
+            for key in ('file', 'bumpMap'):
+                if materialConfig.get(key) is not None:
+                    yield (materialName, key, materialConfig[key])
+
+    def validateTextures(self, library=None):
+        '''
+        Checks the texture files of the config without decoding them.
+        Dimensions are taken from the library index when available and from the image header otherwise.
+        Returns a list of problem descriptions.
+        '''
+        problems = []
+
+        for materialName, key, textureFile in self.textureFiles():
+            if not os.path.isfile(textureFile):
+                problems.append('%s: %s %s does not exist' % (materialName, key, textureFile))
+                continue
+
+            entry = library.findEntry(textureFile) if library is not None else None
+
+            if entry is not None and entry['mtime'] == os.path.getmtime(textureFile):
+                dimensions = entry['dimensions']
+            else:
+                try:
+                    dimensions = texture_library.imageDimensions(textureFile)
+                except Exception:
+                    dimensions = None
+
+            if dimensions is not None and max(dimensions) > texture_library.MAX_TEXTURE_SIZE:
+                problems.append('%s: %s %s is %sx%s pixels. This exceeds the maximum texture size of most graphics cards' % (
+                    materialName, key, textureFile, dimensions[0], dimensions[1]))
+
+        return problems
+
+    def resolveMovedTextures(self, library):
+        '''Replaces missing texture files with the files found in the library. Returns the number of replaced files.'''
+        resolved = 0
+
+        for materialName, key, textureFile in list(self.textureFiles()):
+            if os.path.isfile(textureFile):
+                continue
+
+            newFile = library.resolve(textureFile)
+
+            if newFile is not None:
+                FreeCAD.Console.PrintMessage('%s: %s moved to %s\n' % (materialName, textureFile, newFile))
+
+                self.textureData['materials'][materialName][key] = newFile
+                resolved += 1
+
+        return resolved
+
+    def retextureObjects(self, objectNames, debug=False):
+        '''Only retexture the given objects. All other textured objects stay untouched.'''
+        objectNames = set(objectNames)
+
+        if len(objectNames) == 0:
+            return
+
+        FreeCAD.Console.PrintMessage('Retexturing %s objects\n' % (len(objectNames),))
+
+        for objectName in objectNames:
+            texturedObject = self.texturedObjects.pop(objectName, None)
+
+            if texturedObject is not None:
+                self.removeTexture(texturedObject)
+
+        for objectName in objectNames:
+            o = FreeCAD.ActiveDocument.getObject(objectName)
+
+            if o is None or not self.inScope(objectName):
+                self.deferredObjects.discard(objectName)
+            elif self.isTexturable(o):
+                self.textureObject(o, debug)
+            elif self.isTexturable(o, ignoreVisibility=True):
+                # Texture it as soon as it gets visible
+                self.deferredObjects.add(objectName)
+
+    def setupRenderProfileNodes(self):
+        '''
+        All textured objects share this nodes. Switching the render profile only changes the master nodes,
+        the switches of every object are connected to them.
+        '''
+        self.complexity = coin.SoComplexity()
+        # Only the texture quality should be changed by this node
+        self.complexity.value.setIgnored(True)
+        self.complexity.type.setIgnored(True)
+
+        self.textureSizeMaster = coin.SoSwitch()
+        self.textureSizeMaster.whichChild.setValue(0)
+
+        self.bumpMapMaster = coin.SoSwitch()
+        self.bumpMapMaster.whichChild.setValue(0)
+
+        self.adaptiveTextureCache = {
+            # '<file_name>': SoSwitch with full and reduced texture
+        }
+
+        self.adaptiveBumpMapCache = {
+            # '<file_name>': SoSwitch with the bump map
+        }
+
+    def setRenderProfiles(self, renderProfiles):
+        if renderProfiles != self.renderProfiles:
+            # The switches are built for the old profiles
+            self.adaptiveTextureCache.clear()
+            self.adaptiveBumpMapCache.clear()
+
+        self.renderProfiles = renderProfiles
+
+    def applyRenderProfile(self, profileName):
+        '''Switches all textured objects to the given profile. Only touches the shared master nodes.'''
+        if self.renderProfiles is None:
+            return
+
+        profile = self.renderProfiles[profileName]
+
+        self.complexity.textureQuality.setValue(profile['textureQuality'])
+        self.textureSizeMaster.whichChild.setValue(1 if profile['textureSize'] > 0 else 0)
+        self.bumpMapMaster.whichChild.setValue(0 if profile['bumpMaps'] else coin.SO_SWITCH_NONE)
+
+    def adaptiveTexture(self, texture, imageFile):
+        '''Wraps the texture in a switch between the full and the reduced texture of the interactive profile'''
+        if self.renderProfiles is None:
+            return texture
+
+        if imageFile not in self.adaptiveTextureCache:
+            textureSize = self.renderProfiles[RENDER_PROFILE_INTERACTIVE]['textureSize']
+
+            switch = coin.SoSwitch()
+            switch.addChild(texture)
+
+            if textureSize > 0:
+                switch.addChild(self.getReducedTexture(imageFile, textureSize, texture))
+            else:
+                switch.addChild(texture)
+
+            switch.whichChild.connectFrom(self.textureSizeMaster.whichChild)
+
+            self.adaptiveTextureCache[imageFile] = switch
+
+        return self.adaptiveTextureCache[imageFile]
+
+    def adaptiveBumpMap(self, bumpMap, bumpMapFile):
+        if self.renderProfiles is None or bumpMap is None:
+            return bumpMap
+
+        if bumpMapFile not in self.adaptiveBumpMapCache:
+            switch = coin.SoSwitch()
+            switch.addChild(bumpMap)
+            switch.whichChild.connectFrom(self.bumpMapMaster.whichChild)
+
+            self.adaptiveBumpMapCache[bumpMapFile] = switch
+
+        return self.adaptiveBumpMapCache[bumpMapFile]
+
+    def textureObject(self, o, debug=False):
+        self.deferredObjects.discard(o.Name)
+
+        if self.isTextured(o.Name):
+            # Never stack a second set of texture nodes onto the object
+            self.removeTexture(self.texturedObjects.pop(o.Name))
+
+        if self.isFaceMaterialCompound(o):
+            self.textureCompound(o, debug)
+
+            return
+
+        # Test Script for bump mapping is here: https://forum.freecadweb.org/viewtopic.php?f=10&t=37255&p=319329#p319329
+        texture, bumpMap, textureConfig = self.getTextureForMaterial(
+            o.Material)
+
+        if texture is None:
+            return
+
+        texture = self.adaptiveTexture(texture, py2_utils.textureFileString(textureConfig['file']))
+
+        if bumpMap is not None:
+            bumpMap = self.adaptiveBumpMap(bumpMap, py2_utils.textureFileString(textureConfig['bumpMap']))
+
+        print('Texturing %s' % (o.Label,))
+
+        textureUnit = None
+        rootnode = o.ViewObject.RootNode
+        switch = faceset_utils.findSwitch(rootnode)
+        shadedNode = faceset_utils.findShadedNode(switch)
+
+        if shadedNode is None:
+            print('Object %s has no shaded node. Skipping...' % (o.Label,))
+            return
+
+        brep = faceset_utils.findBrepFaceset(shadedNode)
+        material = faceset_utils.findMaterial(shadedNode)
+        vertexCoordinates = faceset_utils.findVertexCoordinates(
+            rootnode)
+        transform = faceset_utils.findTransform(rootnode)
+
+        originalDiffuseColor = self.updateMaterialColors(material)
+
+        textureCoords = self.getTextureCoordinates(o, brep, vertexCoordinates, transform, textureConfig['realSize'], debug)
+        textureTransform = self.getTextureTransform(o.Material.Name)
+
+        self.setupTextureCoordinateIndex(brep)
+
+        if self.lodSettings is not None:
+            lodNode = self.buildLodNode(o, texture, bumpMap, textureCoords, textureTransform, textureConfig)
+
+            shadedNode.insertChild(lodNode, 1)
+            shadedNode.insertChild(textureCoords, 1)
+            self.insertComplexity(shadedNode)
+
+            self.texturedObjects[o.Name] = (o, shadedNode, (None, lodNode, textureCoords, None, None, self.renderProfileNodes()), (material, originalDiffuseColor))
 
-                if texture is not None:
-                    print('Texturing %s' % (o.Label,))
+            return
 
-                    textureUnit = None
-                    rootnode = o.ViewObject.RootNode
-                    switch = faceset_utils.findSwitch(rootnode)
-                    shadedNode = faceset_utils.findShadedNode(switch)
+        shadedNode.insertChild(texture, 1)
+        shadedNode.insertChild(textureTransform, 1)
+        shadedNode.insertChild(textureCoords, 1)
 
-                    if shadedNode is None:
-                        print('Object %s has no shaded node. Skipping...' % (o.Label,))
-                        continue
+        # Only add the texture unit when the bump map is set
+        # Otherwise the default is OK
+        if bumpMap is not None:
+            textureUnit = coin.SoTextureUnit()
+            textureUnit.unit.setValue(1)
+            shadedNode.insertChild(textureUnit, 1)
 
-                    brep = faceset_utils.findBrepFaceset(shadedNode)
-                    material = faceset_utils.findMaterial(shadedNode)
-                    vertexCoordinates = faceset_utils.findVertexCoordinates(
-                        rootnode)
-                    transform = faceset_utils.findTransform(rootnode)
+        if bumpMap is not None:
+            # Bump map coordinates do not work, we have to use texture coordinates
+            # Skipping the coordinates also ends in an access violation
+            shadedNode.insertChild(textureCoords, 1)
+            shadedNode.insertChild(bumpMap, 1)
+            # The bump map lives in another texture unit and needs the same transform as the texture
+            shadedNode.insertChild(textureTransform, 1)
 
-                    originalDiffuseColor = self.updateMaterialColors(material)
+        self.insertComplexity(shadedNode)
 
-                    faceSet = faceset_utils.buildFaceSet(
-                        brep, vertexCoordinates, self.getFaceOverrides(), transform)
-                    textureCoords = faceSet.calculateTextureCoordinates(
-                        textureConfig['realSize'])
+        self.texturedObjects[o.Name] = (o, shadedNode, (textureUnit, texture, textureCoords, bumpMap, textureTransform, self.renderProfileNodes()), (material, originalDiffuseColor))
 
-                    if debug:
-                        faceSet.printData(textureConfig['realSize'], 4)
+    def getTextureCoordinates(self, o, brep, vertexCoordinates, transform, realSize, debug=False):
+        '''
+        Calculates the size normalized texture coordinates of an object.
+        The coordinates only depend on the local tessellation and on which axes have a real size, as the real size
+        itself, offset and rotation are applied by the shared texture transform. So geometrically identical objects
+        share one coordinate node.
+        Face overrides are matched against the placed vertices, so objects with overrides always get their own coordinates.
+        '''
+        faceOverrides = self.getFaceOverridesForObject(o.Name)
 
-                    self.setupTextureCoordinateIndex(brep)
+        cacheKey = None
 
-                    shadedNode.insertChild(texture, 1)
-                    shadedNode.insertChild(textureCoords, 1)
+        if not faceOverrides and not debug:
+            normalizedRealSize = faceset_utils.sizeNormalizedRealSize(realSize)
+            axesWithRealSize = (normalizedRealSize['s'], normalizedRealSize['t']) if normalizedRealSize is not None else (0, 0)
+            cacheKey = (faceset_utils.tessellationFingerprint(brep, vertexCoordinates),) + axesWithRealSize
 
-                    # Only add the texture unit when the bump map is set
-                    # Otherwise the default is OK
-                    if bumpMap is not None:
-                        textureUnit = coin.SoTextureUnit()
-                        textureUnit.unit.setValue(1)
-                        shadedNode.insertChild(textureUnit, 1)
+            if cacheKey in self.textureCoordinateCache:
+                return self.textureCoordinateCache[cacheKey]
 
-                    if bumpMap is not None:
-                        # Bump map coordinates do not work, we have to use texture coordinates
-                        # Skipping the coordinates also ends in an access violation
-                        shadedNode.insertChild(textureCoords, 1)
-                        shadedNode.insertChild(bumpMap, 1)
+        faceSet = faceset_utils.buildFaceSet(brep, vertexCoordinates, faceOverrides, transform)
+        textureCoords = faceSet.calculateTextureCoordinates(realSize, sizeNormalized=True)
 
-                    self.texturedObjects.append(
-                        (o, shadedNode, (textureUnit, texture, textureCoords, bumpMap), (material, originalDiffuseColor)))
+        if debug:
+            faceSet.printData(realSize, 4)
+
+        if cacheKey is not None:
+            self.textureCoordinateCache[cacheKey] = textureCoords
+
+        return textureCoords
+
+    def insertComplexity(self, shadedNode):
+        if self.renderProfiles is not None:
+            shadedNode.insertChild(self.complexity, 1)
+
+    def renderProfileNodes(self):
+        '''Additional nodes inserted into the shaded node that have to be removed with the texture'''
+        if self.renderProfiles is None:
+            return []
+
+        return [self.complexity]
+
+    def buildLodNode(self, o, texture, bumpMap, textureCoords, textureTransform, textureConfig):
+        '''
+        Builds a level of detail node that switches the texture based on the distance to the camera:
+        full texture (with bump map) near by, a downscaled texture without bump map at medium distance and
+        the average color of the texture far away.
+        The LOD node is no separator, so the selected texture applies to the faces after it.
+        Face material compounds (see textureCompound) get no LOD node.
+        '''
+        imageFile = py2_utils.textureFileString(textureConfig['file'])
+
+        fullNode = coin.SoGroup()
+
+        if bumpMap is not None:
+            textureUnit = coin.SoTextureUnit()
+            textureUnit.unit.setValue(1)
+
+            fullNode.addChild(textureTransform)
+            fullNode.addChild(bumpMap)
+            fullNode.addChild(textureUnit)
+            fullNode.addChild(textureCoords)
+
+        fullNode.addChild(textureTransform)
+        fullNode.addChild(texture)
+
+        reducedNode = coin.SoGroup()
+        reducedNode.addChild(textureTransform)
+        reducedNode.addChild(self.getReducedTexture(imageFile, self.lodSettings['reducedSize'], texture))
+
+        flatNode = coin.SoGroup()
+        flatNode.addChild(self.getFlatColor(imageFile))
+
+        # The LOD node is inside the placement of the object. So use the local center of the object
+        center = o.Placement.inverse().multVec(o.Shape.BoundBox.Center)
+
+        lodNode = coin.SoLOD()
+        lodNode.center.setValue(center.x, center.y, center.z)
+        lodNode.range.setValues(0, 2, [self.lodSettings['reducedDistance'], self.lodSettings['flatDistance']])
+        lodNode.addChild(fullNode)
+        lodNode.addChild(reducedNode)
+        lodNode.addChild(flatNode)
+
+        return lodNode
+
+    def getFlatColor(self, imageFile):
+        '''
+        The material of the far level. The LOD node is inserted before the material of the object,
+        which is white for textured objects. So the average color overrides the diffuse color of that material.
+        '''
+        if imageFile not in self.flatColorCache:
+            try:
+                averageColor = thumbnail_utils.averageColor(imageFile)
+            except OSError:
+                # Missing or unreadable texture. Use a neutral color and try again next time
+                return self.createFlatColor((1.0, 1.0, 1.0))
+
+            self.flatColorCache[imageFile] = self.createFlatColor(averageColor)
+
+        return self.flatColorCache[imageFile]
+
+    def createFlatColor(self, color):
+        flatColor = coin.SoMaterial()
+        flatColor.diffuseColor.setValue(*color)
+        flatColor.setOverride(True)
+
+        # Only the diffuse color should be changed by this node
+        for field in (flatColor.ambientColor, flatColor.specularColor, flatColor.emissiveColor, flatColor.shininess, flatColor.transparency):
+            field.setIgnored(True)
+
+        return flatColor
+
+    def getReducedTexture(self, imageFile, size, fallback):
+        key = (imageFile, size)
+
+        if key not in self.reducedTextureCache:
+            reducedFile = None
+
+            try:
+                reducedFile = thumbnail_utils.reducedImageFile(imageFile, size)
+            except OSError:
+                pass
+
+            if reducedFile is None:
+                # Use the full texture when the image can't be downscaled
+                return fallback
+
+            reducedTexture = coin.SoTexture2()
+            reducedTexture.filename = py2_utils.textureFileString(reducedFile)
+
+            self.reducedTextureCache[key] = reducedTexture
+
+        return self.reducedTextureCache[key]
+
+    def textureCompound(self, o, debug=False):
+        '''
+        Textures a compound created by the FaceBuilder macro in batch mode.
+        FaceMaterialIndices maps every face of the compound to an entry in FaceMaterials.
+        All faces share one texture coordinate node. Every material gets its own IndexedFaceSet and the faces
+        without texture get one with the material of the object. They replace the drawing of the original faceset,
+        which is kept invisible in the scene graph so picking and selection still work.
+        '''
+        faceMaterials = o.FaceMaterials
+        faceGroups = {
+            # materialIndex: [faceIndex]
+        }
+
+        for faceIndex, materialIndex in enumerate(o.FaceMaterialIndices):
+            if materialIndex >= 0 and materialIndex < len(faceMaterials):
+                faceGroups.setdefault(materialIndex, []).append(faceIndex)
+
+        textures = {}
+
+        for materialIndex in faceGroups:
+            texture, bumpMap, textureConfig = self.getTextureForMaterial(faceMaterials[materialIndex])
+
+            if texture is not None:
+                textures[materialIndex] = (texture, bumpMap, textureConfig)
+
+        if len(textures) == 0:
+            return
+
+        print('Texturing %s (%s face groups)' % (o.Label, len(textures)))
+
+        rootnode = o.ViewObject.RootNode
+        switch = faceset_utils.findSwitch(rootnode)
+        shadedNode = faceset_utils.findShadedNode(switch)
+
+        if shadedNode is None:
+            print('Object %s has no shaded node. Skipping...' % (o.Label,))
+            return
+
+        brep = faceset_utils.findBrepFaceset(shadedNode)
+        vertexCoordinates = faceset_utils.findVertexCoordinates(
+            rootnode)
+        transform = faceset_utils.findTransform(rootnode)
+
+        faceSet = faceset_utils.buildFaceSet(
+            brep, vertexCoordinates, self.getFaceOverridesForObject(o.Name), transform)
+
+        realSizes = [None] * len(faceSet.faces)
+
+        for materialIndex, textureData in textures.items():
+            for faceIndex in faceGroups[materialIndex]:
+                if faceIndex < len(realSizes):
+                    realSizes[faceIndex] = textureData[2]['realSize']
+
+        textureCoords = faceSet.calculateTextureCoordinatesPerFace(realSizes, sizeNormalized=True)
+        faceCoordinateList = faceset_utils.buildFaceCoordinates(brep)
+
+        groupNode = coin.SoSeparator()
+        groupNode.addChild(textureCoords)
+
+        texturedFaces = set(faceIndex for materialIndex in textures for faceIndex in faceGroups[materialIndex])
+        untexturedFaces = [faceIndex for faceIndex in range(len(faceCoordinateList)) if faceIndex not in texturedFaces]
+
+        if len(untexturedFaces) > 0:
+            groupNode.addChild(faceset_utils.buildIndexedFaceSet(faceCoordinateList, untexturedFaces))
+
+        whiteMaterial = coin.SoMaterial()
+        whiteMaterial.diffuseColor.setValue(1.0, 1.0, 1.0)
+        groupNode.addChild(whiteMaterial)
+
+        for materialIndex, (texture, bumpMap, textureConfig) in textures.items():
+            faceGroupNode = coin.SoSeparator()
+            textureTransform = self.getTextureTransform(faceMaterials[materialIndex].Name)
+
+            if bumpMap is not None:
+                textureUnit = coin.SoTextureUnit()
+                textureUnit.unit.setValue(1)
+
+                faceGroupNode.addChild(textureTransform)
+                faceGroupNode.addChild(bumpMap)
+                faceGroupNode.addChild(textureUnit)
+                # Texture coordinates are set per texture unit
+                faceGroupNode.addChild(textureCoords)
+
+            faceGroupNode.addChild(textureTransform)
+            faceGroupNode.addChild(texture)
+            faceGroupNode.addChild(faceset_utils.buildIndexedFaceSet(faceCoordinateList, faceGroups[materialIndex]))
+
+            groupNode.addChild(faceGroupNode)
+
+        # Every face is drawn by the group. The original faceset is only kept for picking
+        hideOriginal = coin.SoDrawStyle()
+        hideOriginal.style = coin.SoDrawStyle.INVISIBLE
+
+        brepIndex = shadedNode.findChild(brep)
+        shadedNode.insertChild(hideOriginal, brepIndex)
+        shadedNode.insertChild(groupNode, brepIndex)
+
+        self.texturedObjects[o.Name] = (o, shadedNode, (None, groupNode, None, None, None, [hideOriginal]), None)
+
+    def getTextureTransform(self, materialName):
+        '''
+        Returns the transform shared by all objects with the given material.
+        Texture coordinates are calculated in millimeters (see faceset_utils.sizeNormalizedRealSize).
+        The transform applies the real size, offset and rotation of the material on top of that.
+        '''
+        if materialName not in self.textureTransformCache:
+            self.textureTransformCache[materialName] = coin.SoTexture2Transform()
+
+        materialConfig = self.textureData['materials'].get(materialName)
+        self.textureTransformModes[materialName] = self.textureTransformMode(materialConfig)
+
+        self.applyTextureTransform(self.textureTransformCache[materialName], materialConfig)
+
+        return self.textureTransformCache[materialName]
+
+    def textureTransformMode(self, materialConfig):
+        realSize = materialConfig.get('realSize') if materialConfig is not None else None
+
+        if realSize is None:
+            return (False, False)
+
+        return (realSize['s'] > 0, realSize['t'] > 0)
+
+    def applyTextureTransform(self, textureTransform, materialConfig):
+        if materialConfig is None:
+            return
+
+        realSize = materialConfig.get('realSize') or {'s': 0, 't': 0}
+        offset = materialConfig.get('offset') or {'s': 0, 't': 0}
+        rotation = materialConfig.get('rotation') or 0
+
+        # Offsets are given in millimeters. So they only work when the real size is known
+        scaleS = 1 / realSize['s'] if realSize['s'] > 0 else 1
+        scaleT = 1 / realSize['t'] if realSize['t'] > 0 else 1
+        offsetS = offset['s'] * scaleS if realSize['s'] > 0 else 0
+        offsetT = offset['t'] * scaleT if realSize['t'] > 0 else 0
+
+        textureTransform.scaleFactor.setValue(scaleS, scaleT)
+        textureTransform.translation.setValue(offsetS, offsetT)
+        # Same as the face overrides. We rotate the coordinates, so reverse the rotation to rotate the image
+        textureTransform.rotation.setValue(math.radians(rotation * -1))
+
+    def updateTextureTransform(self, materialName, materialConfig):
+        '''
+        Updates the transform of a material without touching any texture coordinates.
+        Returns False when the texture coordinates have to be recalculated, because a real size was set or cleared.
+        '''
+        if materialName not in self.textureTransformCache:
+            return True
+
+        if self.textureTransformModes.get(materialName) != self.textureTransformMode(materialConfig):
+            return False
+
+        self.applyTextureTransform(self.textureTransformCache[materialName], materialConfig)
+
+        return True
+
+    def resetTextureTransforms(self):
+        '''Applies the stored config to all transforms again. Used to undo live previews.'''
+        for materialName, textureTransform in self.textureTransformCache.items():
+            self.applyTextureTransform(textureTransform, self.textureData['materials'].get(materialName))
 
     def updateMaterialColors(self, material):
         originalDiffuseColor = coin.SoMFColor()
@@ -165,36 +832,177 @@ class TextureManager():
         else:
             return None
 
+    def getFaceOverrideIndex(self):
+        '''
+        Returns a dict of objectName -> FaceOverrideIndex.
+        The index is rebuilt whenever the textureData got replaced, e.g. after deserializing a config.
+        '''
+        faceOverrides = self.ensureFaceOverrides()
+
+        if self.faceOverrideIndex is None or self.faceOverrideIndexSource is not faceOverrides:
+            index = {}
+
+            for faceOverride in faceOverrides:
+                index.setdefault(faceOverride['objectName'], faceset_utils.FaceOverrideIndex()).add(faceOverride)
+
+            self.faceOverrideIndex = index
+            self.faceOverrideIndexSource = faceOverrides
+
+        return self.faceOverrideIndex
+
+    def getFaceOverridesForObject(self, objectName):
+        if self.getFaceOverrides() is None:
+            return None
+
+        return self.getFaceOverrideIndex().get(objectName)
+
+    def findFaceOverride(self, objectName, vectors):
+        objectIndex = self.getFaceOverridesForObject(objectName)
+
+        if objectIndex is None:
+            return None
+
+        return objectIndex.find(vectors)
+
+    def ensureFaceOverride(self, objectName, vectors):
+        existingOverride = self.findFaceOverride(objectName, vectors)
+
+        if existingOverride is None:
+            existingOverride = {
+                'vertices': vectors,
+                'objectName': objectName
+            }
+
+            self.ensureFaceOverrides().append(existingOverride)
+            self.getFaceOverrideIndex().setdefault(objectName, faceset_utils.FaceOverrideIndex()).add(existingOverride)
+
+        return existingOverride
+
+    def updateFaceOverrides(self, faces, rotation=None, rotationOffset=None):
+        '''
+        Applies the configuration to all faces in one go.
+        faces is a list of (objectName, vectors) tuples like returned by findSelectedFacesAsVectors.
+        rotation sets the absolute rotation, rotationOffset is added to the existing rotation.
+        Returns the names of the objects that own the faces.
+        '''
+        objectNames = set()
+
+        for objectName, vectors in faces:
+            faceOverride = self.ensureFaceOverride(objectName, vectors)
+
+            if rotation is not None:
+                faceOverride['rotation'] = rotation
+
+            if rotationOffset is not None:
+                faceOverride['rotation'] = faceOverride.get('rotation', 0) + rotationOffset
+
+            objectNames.add(objectName)
+
+        return objectNames
+
+    def clearFaceOverrides(self, faces):
+        '''Removes the overrides of all given faces. Returns the names of the objects that owned an override.'''
+        faceOverrides = self.getFaceOverrides()
+        objectNames = set()
+
+        if faceOverrides is None:
+            return objectNames
+
+        removed = []
+
+        for objectName, vectors in faces:
+            faceOverride = self.findFaceOverride(objectName, vectors)
+
+            if faceOverride is not None:
+                self.getFaceOverrideIndex()[objectName].remove(faceOverride)
+                removed.append(faceOverride)
+                objectNames.add(objectName)
+
+        if len(removed) > 0:
+            removedIds = set(id(faceOverride) for faceOverride in removed)
+            faceOverrides[:] = [faceOverride for faceOverride in faceOverrides if id(faceOverride) not in removedIds]
+
+        return objectNames
+
+    def isTextured(self, objectName):
+        return objectName in self.texturedObjects
+
+    def usesConfiguredMaterial(self, o):
+        '''True when the object has a material with a texture in this config'''
+        materials = self.textureData['materials']
+
+        if self.isFaceMaterialCompound(o):
+            return any(material.Name in materials for material in o.FaceMaterials)
+
+        material = getattr(o, 'Material', None)
+
+        return material is not None and hasattr(material, 'Name') and material.Name in materials
+
+    def forgetObjects(self, objectNames):
+        '''Drops the bookkeeping for deleted objects. Their scene graph is gone, so nothing has to be removed.'''
+        for objectName in objectNames:
+            self.texturedObjects.pop(objectName, None)
+
+        self.deferredObjects.difference_update(objectNames)
+
     def removeTextures(self):
         FreeCAD.Console.PrintMessage('Removing Textures\n')
 
-        for o, shadedNode, coinData, materialData in self.texturedObjects:
-            if coinData[0] is not None:
-                shadedNode.removeChild(coinData[0])
+        for texturedObject in self.texturedObjects.values():
+            self.removeTexture(texturedObject)
+
+        self.texturedObjects = {}
+        self.deferredObjects = set()
+        self.textureCoordinateCache = {}
+
+    def removeTexture(self, texturedObject):
+        o, shadedNode, coinData, materialData = texturedObject
+
+        if coinData[0] is not None:
+            shadedNode.removeChild(coinData[0])
 
-            if coinData[1] is not None:
-                shadedNode.removeChild(coinData[1])
+        if coinData[1] is not None:
+            shadedNode.removeChild(coinData[1])
+
+        if coinData[2] is not None:
+            shadedNode.removeChild(coinData[2])
+        
+        if coinData[3] is not None:
+            shadedNode.removeChild(coinData[3])
+            # When a bump map is set, the texture coordinate is added twice. So remove it again
+            shadedNode.removeChild(coinData[2])
+
+        if len(coinData) > 4 and coinData[4] is not None:
+            shadedNode.removeChild(coinData[4])
 
-            if coinData[2] is not None:
-                shadedNode.removeChild(coinData[2])
-            
             if coinData[3] is not None:
-                shadedNode.removeChild(coinData[3])
-                # When a bump map is set, the texture coordinate is added twice. So remove it again
-                shadedNode.removeChild(coinData[2])
+                # Same for the transform
+                shadedNode.removeChild(coinData[4])
 
+        if len(coinData) > 5:
+            for node in coinData[5]:
+                shadedNode.removeChild(node)
 
-            material = materialData[0]
 
-            material.diffuseColor.deleteValues(0)
-            material.diffuseColor.setValues(
-                0, len(materialData[1]), materialData[1])
+        if materialData is None:
+            # Compounds do not change the material of the object
+            return
 
-        self.texturedObjects = []
+        material = materialData[0]
 
-    def isTexturable(self, o):
+        material.diffuseColor.deleteValues(0)
+        material.diffuseColor.setValues(
+            0, len(materialData[1]), materialData[1])
+
+    def isFaceMaterialCompound(self, o):
+        return hasattr(o, 'FaceMaterials') and hasattr(o, 'FaceMaterialIndices')
+
+    def isTexturable(self, o, ignoreVisibility=False):
         if not hasattr(o, 'Shape') or o.Shape is None or o.Shape.isNull():
             return False
+
+        if self.isFaceMaterialCompound(o):
+            return len(o.FaceMaterials) > 0 and (ignoreVisibility or o.ViewObject.Visibility)
         
         if not hasattr(o, 'Material') or o.Material is None or o.Material == '':
             return False
@@ -202,7 +1010,7 @@ class TextureManager():
         if not hasattr(o.Material, 'Name') or o.Material.Name is None or o.Material.Name == '':
             return False
 
-        return o.ViewObject.Visibility
+        return ignoreVisibility or o.ViewObject.Visibility
 
     def setupTextureCoordinateIndex(self, brep):
         coordinateIndex = brep.coordIndex.getValues()
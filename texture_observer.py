@@ -0,0 +1,123 @@
+import FreeCAD, FreeCADGui
+
+from arch_texture_utils.qtutils import QtCore
+
+# Changes of this properties invalidate the texture coordinates of an object
+WATCHED_PROPERTIES = ['Shape', 'Placement', 'Material', 'FaceMaterials', 'FaceMaterialIndices']
+# Changes of this view provider properties let FreeCAD rebuild the scene graph of an object
+WATCHED_VIEW_PROPERTIES = ['DisplayMode']
+
+# Time in milliseconds to wait for more changes before retexturing
+DEFAULT_DELAY = 200
+
+
+class TextureObserver():
+    '''
+    Watches the document for changes of textured objects and retextures only the changed objects.
+    Changes are collected until no new change arrived for the given delay. This way a recompute
+    touching many properties of many objects results in a single retexture run.
+    '''
+    def __init__(self, textureConfig, configObject, delay=DEFAULT_DELAY):
+        self.textureConfig = textureConfig
+        self.configObject = configObject
+        self.document = configObject.Document
+        self.pending = set()
+
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.flush)
+
+        # View providers have a Document attribute as well, so their events go to a separate observer
+        self.viewObserver = ViewProviderObserver(self)
+        self.registered = False
+
+    def register(self):
+        if not self.registered:
+            FreeCAD.addDocumentObserver(self)
+            FreeCADGui.addDocumentObserver(self.viewObserver)
+
+            self.registered = True
+
+    def unregister(self):
+        if self.registered:
+            FreeCAD.removeDocumentObserver(self)
+            FreeCADGui.removeDocumentObserver(self.viewObserver)
+
+            self.registered = False
+
+        self.timer.stop()
+        self.pending.clear()
+
+    def isRelevant(self, obj):
+        textureManager = self.textureConfig.textureManager
+
+        return (textureManager.usesConfiguredMaterial(obj) and textureManager.inScope(obj.Name)) or textureManager.isTextured(obj.Name)
+
+    def queue(self, obj):
+        self.pending.add(obj.Name)
+
+        # Restart the timer, so bursts of changes are coalesced
+        self.timer.start()
+
+    def slotChangedObject(self, obj, prop):
+        if obj.Document.Name != self.document.Name:
+            return
+
+        if prop == 'Group' and self.textureConfig.textureManager.isScopeContainer(obj.Name):
+            self.textureConfig.updateScope(self.configObject)
+
+            return
+
+        if prop in WATCHED_PROPERTIES and self.isRelevant(obj):
+            self.queue(obj)
+
+    def viewProviderChanged(self, vobj, prop):
+        obj = vobj.Object
+
+        if obj.Document.Name != self.document.Name:
+            return
+
+        if prop == 'Visibility':
+            self.visibilityChanged(vobj)
+        elif prop in WATCHED_VIEW_PROPERTIES and self.isRelevant(obj):
+            self.queue(obj)
+
+    def visibilityChanged(self, vobj):
+        '''Objects that were hidden when texturing are textured as soon as they get visible'''
+        obj = vobj.Object
+
+        if vobj.Visibility and self.textureConfig.textureManager.isDeferred(obj.Name):
+            self.queue(obj)
+
+    def slotRecomputedDocument(self, doc):
+        if doc.Name == self.document.Name and len(self.pending) > 0:
+            self.timer.start()
+
+    def slotDeletedObject(self, obj):
+        if obj.Document.Name == self.document.Name:
+            self.pending.discard(obj.Name)
+            self.textureConfig.textureManager.forgetObjects([obj.Name])
+
+    def slotDeletedDocument(self, doc):
+        if doc.Name == self.document.Name:
+            self.unregister()
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+
+        objectNames = self.pending
+        self.pending = set()
+
+        self.textureConfig.retextureObjects(objectNames)
+
+
+class ViewProviderObserver():
+    '''Gui document observer forwarding the view provider changes to a TextureObserver'''
+    def __init__(self, textureObserver):
+        self.textureObserver = textureObserver
+
+    def slotChangedObject(self, vobj, prop):
+        if prop == 'Visibility' or prop in WATCHED_VIEW_PROPERTIES:
+            self.textureObserver.viewProviderChanged(vobj, prop)
@@ -0,0 +1,183 @@
+import FreeCAD, FreeCADGui
+import time
+
+from arch_texture_utils.qtutils import QtCore, QtWidgets
+
+# Time in seconds the scheduler works per event loop iteration
+DEFAULT_TIME_SLICE = 0.05
+# Print the progress to the console every n items
+CONSOLE_PROGRESS_STEP = 500
+
+
+class ProgressWidget():
+    '''
+    Progress bar with a cancel button in the status bar of the main window.
+    FreeCAD.Base.ProgressIndicator is only used without GUI: its progress bar filters the user input
+    of the main window while it runs, which would block the GUI between the time slices of the scheduler.
+    '''
+    def __init__(self, description, total, cancelCallback):
+        self.statusBar = FreeCADGui.getMainWindow().statusBar()
+
+        self.widget = QtWidgets.QWidget()
+        layout = QtWidgets.QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.label = QtWidgets.QLabel(description)
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setRange(0, total)
+        self.progressBar.setMaximumWidth(200)
+        self.cancelButton = QtWidgets.QPushButton('Cancel')
+        self.cancelButton.clicked.connect(cancelCallback)
+
+        layout.addWidget(self.label)
+        layout.addWidget(self.progressBar)
+        layout.addWidget(self.cancelButton)
+        self.widget.setLayout(layout)
+
+        self.statusBar.addPermanentWidget(self.widget)
+
+    def update(self, done):
+        self.progressBar.setValue(done)
+
+    def close(self):
+        self.statusBar.removeWidget(self.widget)
+        self.widget.deleteLater()
+
+
+class TextureScheduler():
+    '''
+    Processes a list of items on the GUI thread without blocking it.
+    Every event loop iteration the scheduler works for timeSlice seconds and then gives control back to Qt.
+    Each item is processed completely or not at all, so cancelling leaves the already processed items consistent.
+    The items that were not processed are passed to onCancel.
+    '''
+    def __init__(self, items, processItem, description='Texturing', timeSlice=DEFAULT_TIME_SLICE, onFinish=None, onCancel=None):
+        self.items = list(items)
+        self.processItem = processItem
+        self.description = description
+        self.timeSlice = timeSlice
+        self.onFinish = onFinish
+        self.onCancel = onCancel
+
+        self.position = 0
+        self.running = False
+        self.completed = False
+        self.progressWidget = None
+        self.startTime = None
+
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.running = True
+        self.startTime = time.time()
+
+        FreeCAD.Console.PrintMessage('%s %s objects\n' % (self.description, len(self.items)))
+
+        if QtWidgets.QApplication.instance() is None or not FreeCAD.GuiUp:
+            # No event loop to hand control back to. Simply do all the work now
+            self.processAllItems()
+
+            return
+
+        if len(self.items) > 0:
+            self.progressWidget = ProgressWidget(self.description, len(self.items), self.cancel)
+
+        self.timer.start()
+
+    def tick(self):
+        self.processItems(time.time() + self.timeSlice)
+
+        if self.position >= len(self.items):
+            self.finish()
+        elif self.progressWidget is not None:
+            self.progressWidget.update(self.position)
+
+    def processAllItems(self):
+        '''Processes all items at once, reporting the progress through the FreeCAD progress indicator'''
+        progress = FreeCAD.Base.ProgressIndicator()
+        progress.start(self.description, len(self.items))
+
+        aborted = False
+
+        try:
+            while self.position < len(self.items):
+                self.processItems(None, 1)
+
+                # Raises when the user aborted
+                progress.next(True)
+        except Exception as e:
+            aborted = self.position < len(self.items)
+
+            FreeCAD.Console.PrintLog('%s aborted: %s\n' % (self.description, e))
+        finally:
+            progress.stop()
+
+        if aborted:
+            self.cancel()
+        else:
+            self.finish()
+
+    def processItems(self, deadline, count=None):
+        end = len(self.items) if count is None else min(len(self.items), self.position + count)
+
+        while self.position < end and (deadline is None or time.time() < deadline):
+            item = self.items[self.position]
+            self.position += 1
+
+            try:
+                self.processItem(item)
+            except Exception as e:
+                FreeCAD.Console.PrintError('%s %s failed: %s\n' % (self.description, item, e))
+
+            if self.position % CONSOLE_PROGRESS_STEP == 0:
+                FreeCAD.Console.PrintMessage('%s: %s of %s\n' % (self.description, self.position, len(self.items)))
+
+    def finish(self):
+        self.stop()
+        self.completed = True
+
+        FreeCAD.Console.PrintMessage('%s finished in %.2fs\n' % (self.description, time.time() - self.startTime))
+
+        if self.onFinish is not None:
+            self.onFinish()
+
+    def cancel(self):
+        if not self.running:
+            return
+
+        self.stop()
+
+        remaining = self.items[self.position:]
+
+        FreeCAD.Console.PrintMessage('%s cancelled. %s of %s objects done\n' % (self.description, self.position, len(self.items)))
+
+        if self.onCancel is not None:
+            self.onCancel(remaining)
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+        if self.progressWidget is not None:
+            self.progressWidget.close()
+            self.progressWidget = None
+
+    def isRunning(self):
+        return self.running
+
+    def wait(self, timeout=None):
+        '''
+        Processes Qt events until the scheduler is done. Returns True when all items were processed,
+        False when the scheduler was cancelled or the timeout (in seconds) expired.
+        '''
+        end = time.time() + timeout if timeout is not None else None
+
+        while self.running:
+            if end is not None and time.time() > end:
+                return False
+
+            QtWidgets.QApplication.processEvents(QtCore.QEventLoop.AllEvents, 50)
+
+        return self.completed